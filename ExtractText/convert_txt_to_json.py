@@ -1,14 +1,27 @@
 import os
 import json
 import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 
-def parse_subtitle_block(lines, start_idx):
-    """Parses a block of subtitle lines into a dictionary."""
-    block = {"id": "", "jp": "", "en": "", "ru": ""}
-    i = start_idx
-    while i < len(lines) and lines[i].strip():
-        line = lines[i].strip()
-        if line.startswith("ID:"):
+# How many leading lines are looked at to detect the file format
+FORMAT_PROBE_LINES = 5
+
+def iter_subtitle_blocks(lines):
+    """Yields subtitle blocks (ID/JP/EN/RU lines up to a blank line) as dictionaries in one pass."""
+    block = None
+    for line in lines:
+        line = line.strip()
+        if block is None:
+            if not line.startswith("ID:"):
+                continue
+            block = {"id": "", "jp": "", "en": "", "ru": ""}
+        if not line:
+            if block["id"]:
+                yield block
+            block = None
+        elif line.startswith("ID:"):
             block["id"] = line[3:].strip()
         elif line.startswith("JP:"):
             block["jp"] = line[3:].strip()
@@ -16,32 +29,51 @@ def parse_subtitle_block(lines, start_idx):
             block["en"] = line[3:].strip()
         elif line.startswith("RU:"):
             block["ru"] = line[3:].strip()
-        i += 1
-    return block, i
-
-def parse_audio_text_lines(lines, start_idx):
-    """Parses audio text lines, handling cases where text follows .wav on next line."""
-    result = []
-    i = start_idx
-    while i < len(lines):
-        line = lines[i].strip()
+    if block is not None and block["id"]:
+        yield block
+
+def iter_audio_entries(lines):
+    """Yields audio entries in one pass, handling cases where text follows .wav on next line.
+
+    The text of an entry is every line up to the next .wav line, joined with spaces.
+    """
+    entry = None
+    text_lines = []
+    for line in lines:
+        line = line.strip()
         if line.endswith(".wav"):
+            if entry is not None:
+                entry["text"] = " ".join(text_lines).strip()
+                yield entry
             entry = {"wav": line}
-            i += 1
-            # Collect text from the next non-empty line
             text_lines = []
-            while i < len(lines) and not lines[i].strip().endswith(".wav"):
-                text_lines.append(lines[i].strip())
-                i += 1
-            entry["text"] = " ".join(text_lines).strip() if text_lines else ""
-            result.append(entry)
-        else:
-            i += 1
-    return result, i
+        elif entry is not None:
+            text_lines.append(line)
+    if entry is not None:
+        entry["text"] = " ".join(text_lines).strip()
+        yield entry
+
+def valid_audio_entries(entries, txt_path, verbose=False):
+    """Drops audio entries without text; the last entry is accepted even without text."""
+    previous = None
+    number = 0
+    for number, entry in enumerate(entries, 1):
+        if previous is not None:
+            if previous["text"]:
+                if verbose:
+                    print(f"Processing entry {number - 1}: {previous['wav']} -> {previous['text']}")
+                yield previous
+            else:
+                print(f"Skipping invalid entry {number - 1} in {txt_path}: {previous}")
+        previous = entry
+    if previous is not None:
+        if verbose:
+            print(f"Processing entry {number}: {previous['wav']} -> {previous['text']}")
+        yield previous
 
 def detect_file_format(lines):
     """Detects if file is subtitle or audio text format based on first few lines."""
-    for line in lines[:5]:  # Check first 5 lines
+    for line in lines[:FORMAT_PROBE_LINES]:
         line = line.strip()
         if line.startswith("ID:"):
             return "subtitle"
@@ -49,65 +81,94 @@ def detect_file_format(lines):
             return "audio"
     return "audio"  # Default to audio if unsure
 
-def convert_txt_to_json(txt_path, json_path):
-    """Converts a TXT file to a JSON file based on detected format."""
+def parse_txt_lines(lines, txt_path, verbose=False):
+    """Detects the format from the first lines of a line stream and returns (format, entry generator)."""
+    lines = iter(lines)
+    head = list(islice(lines, FORMAT_PROBE_LINES))
+    format_type = detect_file_format(head)
+    lines = chain(head, lines)
+    if format_type == "subtitle":
+        return format_type, iter_subtitle_blocks(lines)
+    return format_type, valid_audio_entries(iter_audio_entries(lines), txt_path, verbose)
+
+def convert_txt_to_json(txt_path, json_path, verbose=False):
+    """Converts a TXT file to a JSON file based on detected format; returns the number of entries written."""
     try:
         with open(txt_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        format_type = detect_file_format(lines)
-        result = []
-
-        if format_type == "subtitle":
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                if line.startswith("ID:"):
-                    block, next_i = parse_subtitle_block(lines, i)
-                    if block["id"]:
-                        result.append(block)
-                    i = next_i
-                else:
-                    i += 1
-        else:  # audio format
-            entries, _ = parse_audio_text_lines(lines, 0)
-            for i, entry in enumerate(entries):
-                if entry.get("wav") and (entry.get("text") or i == len(entries) - 1):  # Accept last entry even without text
-                    print(f"Processing entry {i + 1}: {entry['wav']} -> {entry['text']}")
-                    result.append(entry)
-                else:
-                    print(f"Skipping invalid entry {i + 1} in {txt_path}: {entry}")
+            _, entries = parse_txt_lines(f, txt_path, verbose)
+            result = list(entries)
 
         if not result:
             print(f"No valid entries found in {txt_path}")
-        else:
-            os.makedirs(os.path.dirname(json_path), exist_ok=True)
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=4)
-            print(f"Converted {txt_path} to {json_path} with {len(result)} entries")
+            return 0
+        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False, indent=4))
+        print(f"Converted {txt_path} to {json_path} with {len(result)} entries")
+        return len(result)
     except Exception as e:
         print(f"Error converting {txt_path}: {str(e)}")
+        return 0
+
+def is_up_to_date(txt_path, json_path):
+    """Checks whether the output JSON exists and is newer than the source TXT."""
+    try:
+        return os.stat(json_path).st_mtime_ns > os.stat(txt_path).st_mtime_ns
+    except OSError:
+        return False
+
+def collect_conversions(input_dir, output_dir, force=False):
+    """Returns (txt_path, json_path) pairs to convert and the number of up-to-date files skipped."""
+    conversions = []
+    skipped = 0
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        relative_path = os.path.relpath(root, input_dir)
+        for file in sorted(files):
+            if file.endswith('.txt'):
+                txt_path = os.path.join(root, file)
+                json_path = os.path.join(output_dir, relative_path, os.path.splitext(file)[0] + '.json')
+                if not force and is_up_to_date(txt_path, json_path):
+                    skipped += 1
+                else:
+                    conversions.append((txt_path, json_path))
+    return conversions, skipped
+
+def convert_tree(input_dir, output_dir, jobs=None, force=False, verbose=False):
+    """Converts every .txt under input_dir into output_dir, skipping files whose JSON is newer.
+
+    With jobs > 1 the files are converted in a process pool; returns (converted, skipped).
+    """
+    conversions, skipped = collect_conversions(input_dir, output_dir, force)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(conversions) <= 1:
+        counts = [convert_txt_to_json(txt_path, json_path, verbose) for txt_path, json_path in conversions]
+    else:
+        txt_paths, json_paths = zip(*conversions)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            counts = list(executor.map(convert_txt_to_json, txt_paths, json_paths, [verbose] * len(conversions),
+                                       chunksize=max(1, len(conversions) // (jobs * 8))))
+    return sum(1 for count in counts if count), skipped
 
 def main():
+    parser = argparse.ArgumentParser(description="Converts att text exports (.txt) into JSON.")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="number of worker processes (default: CPU count, 1 converts in this process)")
+    parser.add_argument("--force", action="store_true",
+                        help="convert every file, even if its JSON is newer than the .txt")
+    parser.add_argument("--verbose", action="store_true", help="print every audio entry")
+    args = parser.parse_args()
+
     input_dir = "nier_unpacked_extracted_result"
     output_dir = "nier_text_json"
     if not os.path.exists(input_dir):
         print(f"Error: {input_dir} not found.")
         return
 
-    for root, _, files in os.walk(input_dir):
-        for file in files:
-            if file.endswith('.txt'):
-                txt_path = os.path.join(root, file)
-                relative_path = os.path.relpath(root, input_dir)
-                json_output_dir = os.path.join(output_dir, relative_path)
-                os.makedirs(json_output_dir, exist_ok=True)
-                json_file = os.path.splitext(file)[0] + '.json'
-                json_path = os.path.join(json_output_dir, json_file)
-                convert_txt_to_json(txt_path, json_path)
-
-    print(f"\nConversion completed. Check {os.path.abspath(output_dir)} for .json files.")
+    converted, skipped = convert_tree(input_dir, output_dir, args.jobs, args.force, args.verbose)
+    print(f"\nConverted {converted} files, {skipped} up-to-date files skipped.")
+    print(f"Conversion completed. Check {os.path.abspath(output_dir)} for .json files.")
     input("\nPress Enter to exit...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
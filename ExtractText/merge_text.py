@@ -1,5 +1,7 @@
 import os
 import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 def parse_text_file(file_path):
     """Parses a text file and returns a dictionary with ID and corresponding lines."""
@@ -22,60 +24,126 @@ def parse_text_file(file_path):
         print(f"Error reading {file_path}: {str(e)}")
     return result
 
-def merge_texts(source_dir, ru_dir, result_dir):
-    """Merges text files by copying source files and adding RU text from RU files."""
-    # Copy all contents from source_dir to result_dir
-    if os.path.exists(result_dir):
-        shutil.rmtree(result_dir)
-    shutil.copytree(source_dir, result_dir)
+def merge_lines(lines, ru_data):
+    """Yields the stripped source lines with RU lines replaced by the EN text of the matching RU entry."""
+    current_id = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('ID:'):
+            current_id = line
+        elif line.startswith('RU:') and current_id:
+            ru_text = ru_data.get(current_id, {}).get('EN', '')
+            if ru_text:
+                line = f"RU: {ru_text[4:]}"  # Remove 'EN: ' prefix; keep original RU if no match
+        yield f"{line}\n"
 
-    # Process each file in result_dir
-    for root, _, files in os.walk(result_dir):
+def write_if_changed(path, data):
+    """Writes bytes to path unless the file already holds exactly these bytes; returns True if written."""
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+def copy_if_changed(source_path, result_path):
+    """Copies a file with its timestamps unless the target already has the same size and mtime."""
+    try:
+        source_stat = os.stat(source_path)
+        result_stat = os.stat(result_path)
+        if source_stat.st_size == result_stat.st_size and source_stat.st_mtime_ns == result_stat.st_mtime_ns:
+            return False
+    except OSError:
+        pass
+    shutil.copy2(source_path, result_path)
+    return True
+
+def merge_file(source_path, ru_path, result_path):
+    """Merges one source file with its RU file straight into result_path; returns True if the target was rewritten."""
+    ru_data = parse_text_file(ru_path) if ru_path else {}
+    try:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            merged = "".join(merge_lines(f, ru_data))
+        # Same bytes a text-mode write would produce on this platform
+        data = merged.replace("\n", os.linesep).encode('utf-8')
+    except Exception as e:
+        print(f"Error updating {result_path}: {str(e)}")
+        # Keep the source file as is
+        with open(source_path, 'rb') as f:
+            data = f.read()
+    return write_if_changed(result_path, data)
+
+def list_relative_files(root_dir):
+    """Returns the normalized relative paths of all files under root_dir, for case-aware lookups."""
+    paths = set()
+    for root, _, files in os.walk(root_dir):
+        for file in files:
+            paths.add(os.path.normcase(os.path.relpath(os.path.join(root, file), root_dir)))
+    return paths
+
+def remove_stale(result_dir, expected_files, expected_dirs):
+    """Removes files and empty folders from result_dir that no longer exist in the source tree."""
+    for root, dirs, files in os.walk(result_dir, topdown=False):
+        relative_root = os.path.relpath(root, result_dir)
         for file in files:
-            if file.endswith('.txt'):
-                result_path = os.path.join(root, file)
-                # Calculate relative path to find corresponding RU file
-                relative_path = os.path.relpath(result_path, result_dir)
-                ru_path = os.path.join(ru_dir, relative_path)
+            if os.path.normcase(os.path.normpath(os.path.join(relative_root, file))) not in expected_files:
+                os.remove(os.path.join(root, file))
+        if os.path.normcase(relative_root) not in expected_dirs and not os.listdir(root):
+            os.rmdir(root)
 
-                # Parse source (result) file
-                result_data = parse_text_file(result_path)
+def merge_texts(source_dir, ru_dir, result_dir, jobs=None):
+    """Merges text files into result_dir, adding RU text from RU files.
 
-                # Parse RU file if it exists
-                ru_data = {}
-                if os.path.exists(ru_path):
-                    ru_data = parse_text_file(ru_path)
+    Each source file is streamed once and the merged text is written straight to
+    result_dir; targets whose contents did not change are left untouched, other
+    files are copied only when their size or mtime differ, and files that are no
+    longer in source_dir are removed. With jobs > 1 text files are merged in a
+    process pool. Returns (rewritten, unchanged) counts of text files.
+    """
+    ru_files = list_relative_files(ru_dir) if ru_dir else set()
+    expected_files = set()
+    expected_dirs = set()
+    merges = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        relative_root = os.path.relpath(root, source_dir)
+        expected_dirs.add(os.path.normcase(relative_root))
+        os.makedirs(os.path.join(result_dir, relative_root), exist_ok=True)
+        for file in sorted(files):
+            relative_path = os.path.normpath(os.path.join(relative_root, file))
+            expected_files.add(os.path.normcase(relative_path))
+            source_path = os.path.join(source_dir, relative_path)
+            result_path = os.path.join(result_dir, relative_path)
+            if not file.endswith('.txt'):
+                copy_if_changed(source_path, result_path)
+                continue
+            ru_path = None
+            if ru_dir:
+                if os.path.normcase(relative_path) in ru_files:
+                    ru_path = os.path.join(ru_dir, relative_path)
                 else:
                     print(f"Warning: No matching RU file found for {result_path}")
+            merges.append((source_path, ru_path, result_path))
+    remove_stale(result_dir, expected_files, expected_dirs)
 
-                # Update RU in result file
-                try:
-                    with open(result_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-
-                    with open(result_path, 'w', encoding='utf-8') as f:
-                        current_id = None
-                        for line in lines:
-                            line = line.strip()
-                            if line.startswith('ID:'):
-                                current_id = line
-                                f.write(f"{line}\n")
-                            elif line.startswith('JP:') and current_id:
-                                f.write(f"{line}\n")
-                            elif line.startswith('EN:') and current_id:
-                                f.write(f"{line}\n")
-                            elif line.startswith('RU:') and current_id:
-                                ru_text = ru_data.get(current_id, {}).get('EN', '')
-                                if ru_text:
-                                    f.write(f"RU: {ru_text[4:]}\n")  # Remove 'EN: ' prefix
-                                else:
-                                    f.write(f"{line}\n")  # Keep original RU if no match
-                            else:
-                                f.write(f"{line}\n")
-                except Exception as e:
-                    print(f"Error updating {result_path}: {str(e)}")
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(merges) <= 1:
+        rewritten = [merge_file(*merge) for merge in merges]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            rewritten = list(executor.map(merge_file, *zip(*merges), chunksize=max(1, len(merges) // (jobs * 8))))
+    return sum(rewritten), len(rewritten) - sum(rewritten)
 
 def main():
+    parser = argparse.ArgumentParser(description="Merges RU text into the extracted text dump.")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="number of worker processes (default: CPU count, 1 merges in this process)")
+    args = parser.parse_args()
+
     # Define directory paths
     source_dir = "nier_unpacked_extracted"
     ru_dir = "nier_unpacked_extracted_ru"
@@ -90,8 +158,9 @@ def main():
         ru_dir = None
 
     # Perform merge
-    merge_texts(source_dir, ru_dir, result_dir)
-    print(f"\nMerging completed. Results saved to {os.path.abspath(result_dir)}")
+    rewritten, unchanged = merge_texts(source_dir, ru_dir, result_dir, args.jobs)
+    print(f"\nRewrote {rewritten} text files, {unchanged} were already up to date.")
+    print(f"Merging completed. Results saved to {os.path.abspath(result_dir)}")
     input("\nPress Enter to exit...")
 
 if __name__ == "__main__":
@@ -0,0 +1,410 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from update_voice_from_audio import LANGUAGES
+
+DB_NAME = "nier_corpus.sqlite"
+# Текстовые поля записи, которые хранятся отдельными столбцами; остальные поля — в extra
+TEXT_FIELDS = ("id", "jp", "en", "ru")
+VOICE_SUFFIX = "_voice"
+CONFIDENCE_SUFFIX = "_voice_confidence"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    folder TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    entry_key INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (file_id),
+    position INTEGER NOT NULL,
+    id TEXT,
+    jp TEXT,
+    en TEXT,
+    ru TEXT,
+    extra TEXT NOT NULL,
+    fields TEXT,
+    UNIQUE (file_id, position)
+);
+CREATE INDEX IF NOT EXISTS entries_id ON entries (id, en);
+CREATE TABLE IF NOT EXISTS voice_links (
+    entry_key INTEGER NOT NULL REFERENCES entries (entry_key),
+    lang TEXT NOT NULL,
+    wav TEXT NOT NULL,
+    confidence REAL,
+    PRIMARY KEY (entry_key, lang)
+);
+CREATE TABLE IF NOT EXISTS audio_lines (
+    line_key INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    lang TEXT,
+    text TEXT NOT NULL,
+    norm TEXT,
+    wav TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audio_lines_norm ON audio_lines (lang, norm);
+"""
+
+def connect(db_path):
+    """Открывает базу корпуса и создаёт таблицы, если их ещё нет."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+def bytes_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def split_entry(entry):
+    """Раскладывает запись JSON на столбцы: (текстовые поля, extra, порядок полей, ссылки на озвучку).
+
+    Ссылки на озвучку — словарь {язык: [wav, confidence]}. Порядок полей нужен,
+    чтобы экспорт давал тот же JSON байт в байт. Запись, которая не является
+    объектом, целиком хранится в extra с fields = NULL.
+    """
+    if not isinstance(entry, dict):
+        return {}, entry, None, {}
+    columns = {}
+    extra = {}
+    links = {}
+    for key, value in entry.items():
+        if key in TEXT_FIELDS and isinstance(value, str):
+            columns[key] = value
+        elif key.endswith(VOICE_SUFFIX) and isinstance(value, str):
+            links.setdefault(key[:-len(VOICE_SUFFIX)], [None, None])[0] = value
+        elif key.endswith(CONFIDENCE_SUFFIX) and isinstance(value, (int, float)):
+            links.setdefault(key[:-len(CONFIDENCE_SUFFIX)], [None, None])[1] = value
+        else:
+            extra[key] = value
+    # Оценка без самой ссылки не имеет смысла как связь, сохраняем её как обычное поле
+    for lang, (wav, confidence) in list(links.items()):
+        if wav is None:
+            extra[f"{lang}{CONFIDENCE_SUFFIX}"] = confidence
+            del links[lang]
+    return columns, extra, list(entry), links
+
+def build_entry(row, links):
+    """Собирает запись JSON из строки entries и её ссылок на озвучку (язык, wav, confidence)."""
+    if row["fields"] is None:
+        return json.loads(row["extra"])
+    values = {field: row[field] for field in TEXT_FIELDS if row[field] is not None}
+    values.update(json.loads(row["extra"]))
+    for lang, wav, confidence in links:
+        values[f"{lang}{VOICE_SUFFIX}"] = wav
+        if confidence is not None:
+            values[f"{lang}{CONFIDENCE_SUFFIX}"] = confidence
+    # Сначала поля в исходном порядке, затем новые (например, добавленная ссылка) — как при правке JSON
+    entry = {key: values.pop(key) for key in json.loads(row["fields"]) if key in values}
+    entry.update(values)
+    return entry
+
+def insert_entries(conn, file_id, data):
+    for position, item in enumerate(data):
+        columns, extra, fields, links = split_entry(item)
+        entry_key = conn.execute(
+            "INSERT INTO entries (file_id, position, id, jp, en, ru, extra, fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_id, position, *(columns.get(field) for field in TEXT_FIELDS),
+             json.dumps(extra, ensure_ascii=False), json.dumps(fields) if fields is not None else None)).lastrowid
+        conn.executemany("INSERT INTO voice_links (entry_key, lang, wav, confidence) VALUES (?, ?, ?, ?)",
+                         [(entry_key, lang, wav, confidence) for lang, (wav, confidence) in links.items()])
+
+def delete_file_entries(conn, file_id):
+    conn.execute("DELETE FROM voice_links WHERE entry_key IN (SELECT entry_key FROM entries WHERE file_id = ?)",
+                 (file_id,))
+    conn.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+
+def import_text(conn, text_path):
+    """Загружает nier_text_json в базу; файлы с прежними размером и mtime не перечитываются.
+
+    Возвращает (число загруженных файлов, число удалённых из базы файлов).
+    """
+    known = {row["path"]: row for row in conn.execute("SELECT file_id, path, size, mtime_ns FROM files")}
+    seen = set()
+    imported = 0
+    for json_file in sorted(Path(text_path).rglob("*.json")):
+        relative_path = os.path.relpath(json_file, text_path).replace('\\', '/')
+        stat = json_file.stat()
+        row = known.get(relative_path)
+        if row is not None and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+            seen.add(relative_path)
+            continue
+        try:
+            raw = json_file.read_bytes()
+            data = json.loads(raw)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка при чтении файла {json_file}: {e}")
+            continue
+        if not isinstance(data, list):
+            print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
+            continue
+
+        seen.add(relative_path)
+        if row is None:
+            file_id = conn.execute("INSERT INTO files (path, folder) VALUES (?, ?)",
+                                   (relative_path, relative_path.split('/', 1)[0])).lastrowid
+        else:
+            file_id = row["file_id"]
+            delete_file_entries(conn, file_id)
+        conn.execute("UPDATE files SET size = ?, mtime_ns = ?, hash = ? WHERE file_id = ?",
+                     (stat.st_size, stat.st_mtime_ns, bytes_hash(raw), file_id))
+        insert_entries(conn, file_id, data)
+        imported += 1
+
+    removed = [row["file_id"] for path, row in known.items() if path not in seen and
+               not (Path(text_path) / path).exists()]
+    for file_id in removed:
+        delete_file_entries(conn, file_id)
+        conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+    return imported, len(removed)
+
+def import_audio(conn, audio_path):
+    """Перезагружает строки nier_audio_json; язык определяется по папке из LANGUAGES.
+
+    Аудиокорпус небольшой, поэтому он загружается целиком, а нормализованный
+    текст пересчитывается текущими правилами clean_text.
+    """
+    folders = {config["folder"]: lang for lang, config in LANGUAGES.items()}
+    conn.execute("DELETE FROM audio_lines")
+    rows = []
+    for json_file in sorted(Path(audio_path).rglob("*.json")):
+        relative_path = os.path.relpath(json_file, audio_path).replace('\\', '/')
+        base_path = os.path.splitext(relative_path)[0]
+        lang = next((lang for folder, lang in folders.items() if relative_path.startswith(folder + '/')), None)
+        clean_text = LANGUAGES[lang]["clean_text"] if lang else None
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка при обработке файла {json_file}: {e}")
+            continue
+        if not isinstance(data, list):
+            print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
+            continue
+        for position, item in enumerate(data):
+            if 'text' not in item or 'wav' not in item:
+                print(f"Предупреждение: Запись в {json_file} не содержит 'text' или 'wav'. Пропускаем.")
+                continue
+            rows.append((relative_path, position, lang, item['text'],
+                         clean_text(item['text']) if clean_text else None, f"{base_path}/{item['wav']}"))
+    conn.executemany("INSERT INTO audio_lines (path, position, lang, text, norm, wav) VALUES (?, ?, ?, ?, ?, ?)",
+                     rows)
+    return len(rows)
+
+def iter_files(conn, folder=None):
+    """Выдаёт (относительный путь, список записей) для файлов базы в порядке путей."""
+    links = {}
+    for row in conn.execute("SELECT entry_key, lang, wav, confidence FROM voice_links ORDER BY entry_key, lang"):
+        links.setdefault(row["entry_key"], []).append((row["lang"], row["wav"], row["confidence"]))
+    sql = "SELECT file_id, path FROM files"
+    params = ()
+    if folder is not None:
+        sql += " WHERE folder = ?"
+        params = (folder,)
+    for file_row in conn.execute(sql + " ORDER BY path", params).fetchall():
+        entries = [build_entry(row, links.get(row["entry_key"], ())) for row in
+                   conn.execute("SELECT * FROM entries WHERE file_id = ? ORDER BY position", (file_row["file_id"],))]
+        yield file_row["path"], entries
+
+def export_text(conn, text_path):
+    """Записывает JSON только тех файлов, содержимое которых отличается от последнего импорта или экспорта.
+
+    Файлы, изменённые на диске после импорта, не перезаписываются. Возвращает число записанных файлов.
+    """
+    written = 0
+    for relative_path, entries in iter_files(conn):
+        raw = json.dumps(entries, ensure_ascii=False, indent=4).encode('utf-8')
+        digest = bytes_hash(raw)
+        row = conn.execute("SELECT file_id, size, mtime_ns, hash FROM files WHERE path = ?", (relative_path,)).fetchone()
+        if digest == row["hash"]:
+            continue
+        json_file = Path(text_path, relative_path)
+        if json_file.exists():
+            stat = json_file.stat()
+            if stat.st_size != row["size"] or stat.st_mtime_ns != row["mtime_ns"]:
+                print(f"Пропуск: {json_file} изменён на диске после импорта. Сначала выполните import.")
+                continue
+        json_file.parent.mkdir(parents=True, exist_ok=True)
+        json_file.write_bytes(raw)
+        stat = json_file.stat()
+        conn.execute("UPDATE files SET size = ?, mtime_ns = ?, hash = ? WHERE file_id = ?",
+                     (stat.st_size, stat.st_mtime_ns, digest, row["file_id"]))
+        written += 1
+        print(f"Сохранён обновлённый файл {json_file}")
+    return written
+
+def remove_duplicates(conn):
+    """Удаляет повторы записей по (id, en), как remove_duplicates.py, и возвращает сведения для лога.
+
+    Остаётся первая запись в порядке путей файлов; если у неё нет en_voice,
+    он берётся у первого повтора, где он заполнен.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.ranked")
+    conn.execute("""
+        CREATE TEMP TABLE ranked AS
+        SELECT e.entry_key, e.id, e.en, f.path, e.position,
+               FIRST_VALUE(e.entry_key) OVER w AS kept_key,
+               FIRST_VALUE(f.path) OVER w AS kept_path,
+               ROW_NUMBER() OVER w AS rank
+        FROM entries e JOIN files f USING (file_id)
+        WINDOW w AS (PARTITION BY e.id, e.en ORDER BY f.path, e.position)
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE donors AS
+        SELECT kept_key, entry_key, wav FROM (
+            SELECT d.kept_key, d.entry_key, v.wav, ROW_NUMBER() OVER (PARTITION BY d.kept_key ORDER BY d.rank) AS n
+            FROM ranked d JOIN voice_links v ON v.entry_key = d.entry_key AND v.lang = 'en' AND v.wav != ''
+            WHERE d.rank > 1)
+        WHERE n = 1 AND NOT EXISTS (
+            SELECT 1 FROM voice_links v WHERE v.entry_key = kept_key AND v.lang = 'en' AND v.wav != '')
+    """)
+    duplicates_info = [{
+        "id": row["id"],
+        "en": row["en"],
+        "kept_file": row["kept_path"],
+        "duplicate_file": row["path"],
+        "en_voice_replaced": bool(row["donated"]),
+    } for row in conn.execute("""
+        SELECT r.id, r.en, r.path, r.kept_path, d.entry_key IS NOT NULL AS donated
+        FROM ranked r LEFT JOIN donors d ON d.entry_key = r.entry_key
+        WHERE r.rank > 1 ORDER BY r.path, r.position
+    """)]
+
+    conn.execute("INSERT OR REPLACE INTO voice_links (entry_key, lang, wav, confidence) "
+                 "SELECT kept_key, 'en', wav, NULL FROM donors")
+    conn.execute("DELETE FROM voice_links WHERE entry_key IN (SELECT entry_key FROM ranked WHERE rank > 1)")
+    conn.execute("DELETE FROM entries WHERE entry_key IN (SELECT entry_key FROM ranked WHERE rank > 1)")
+    conn.execute("DROP TABLE temp.donors")
+    conn.execute("DROP TABLE temp.ranked")
+    return duplicates_info
+
+def link_voices(conn, languages=tuple(LANGUAGES)):
+    """Заполняет пустые <язык>_voice записью аудиокорпуса с тем же нормализованным текстом.
+
+    Как и update_voice_from_audio.py, связь ставится только при ровно одном
+    совпадении. Возвращает {язык: число новых связей}.
+    """
+    linked = {}
+    for lang in languages:
+        conn.create_function("clean_text", 1, LANGUAGES[lang]["clean_text"], deterministic=True)
+        text_column = lang if lang in TEXT_FIELDS else f"json_extract(e.extra, '$.{lang}')"
+        conn.execute("DROP TABLE IF EXISTS temp.unique_audio")
+        conn.execute("CREATE TEMP TABLE unique_audio (norm TEXT PRIMARY KEY, wav TEXT)")
+        conn.execute("INSERT INTO unique_audio SELECT norm, MIN(wav) FROM audio_lines "
+                     "WHERE lang = ? GROUP BY norm HAVING COUNT(*) = 1", (lang,))
+        linked[lang] = conn.execute(f"""
+            INSERT OR REPLACE INTO voice_links (entry_key, lang, wav, confidence)
+            SELECT e.entry_key, ?, a.wav, NULL
+            FROM entries e JOIN unique_audio a ON a.norm = clean_text({text_column})
+            WHERE e.fields IS NOT NULL AND {text_column} IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM voice_links v WHERE v.entry_key = e.entry_key AND v.lang = ? AND v.wav != '')
+        """, (lang, lang)).rowcount
+        conn.execute("DROP TABLE temp.unique_audio")
+    return linked
+
+def apply_excel_voices(conn, excel_data):
+    """Переносит en_voice из данных Excel {лист: {id: en_voice}} в пустые en_voice записей папки листа."""
+    conn.execute("DROP TABLE IF EXISTS temp.excel_voices")
+    conn.execute("CREATE TEMP TABLE excel_voices (folder TEXT, id TEXT, wav TEXT, PRIMARY KEY (folder, id))")
+    conn.executemany("INSERT OR REPLACE INTO excel_voices VALUES (?, ?, ?)",
+                     [(sheet, item_id, wav) for sheet, voices in excel_data.items()
+                      for item_id, wav in voices.items() if wav])
+    updated = conn.execute("""
+        INSERT OR REPLACE INTO voice_links (entry_key, lang, wav, confidence)
+        SELECT e.entry_key, 'en', x.wav, NULL
+        FROM entries e JOIN files f USING (file_id) JOIN excel_voices x ON x.folder = f.folder AND x.id = e.id
+        WHERE NOT EXISTS (SELECT 1 FROM voice_links v WHERE v.entry_key = e.entry_key AND v.lang = 'en' AND v.wav != '')
+    """).rowcount
+    conn.execute("DROP TABLE temp.excel_voices")
+    return updated
+
+def export_excel(conn, excel_file, layout="rows"):
+    """Создаёт Excel-файл в формате parse_nier_json_to_excel.py прямо из базы: по листу на папку."""
+    from parse_nier_json_to_excel import COLUMNS, write_entries, write_entry_columns
+    from xlsx_writer import XlsxWriter
+
+    with XlsxWriter(excel_file) as wb:
+        for (folder,) in conn.execute("SELECT DISTINCT folder FROM files ORDER BY folder").fetchall():
+            sheet = wb.create_sheet(title=folder)
+            if layout == "columns":
+                sheet.append(COLUMNS)
+            row_start = 1
+            for path, entries in iter_files(conn, folder):
+                if layout == "columns":
+                    write_entry_columns(sheet, entries, path)
+                else:
+                    row_start = write_entries(sheet, entries, row_start)
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Единая SQLite-база корпуса: записи nier_text_json, строки "
+                                                 "nier_audio_json и связи с озвучкой.")
+    parser.add_argument("--db", default=os.path.join(script_dir, DB_NAME),
+                        help=f"путь к базе (по умолчанию {DB_NAME} рядом со скриптом)")
+    parser.add_argument("--text-path", default=os.path.join(script_dir, "nier_text_json"))
+    parser.add_argument("--audio-path", default=os.path.join(script_dir, "nier_audio_json"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("import", help="загрузить изменившиеся JSON-файлы в базу")
+    subparsers.add_parser("export", help="записать в nier_text_json только изменившиеся файлы")
+    dedup = subparsers.add_parser("dedup", help="удалить повторы записей по (id, en)")
+    dedup.add_argument("--log", default="remove_duplicates_log.txt", help="файл лога удалённых повторов")
+    link = subparsers.add_parser("link", help="связать записи с озвучкой по точному совпадению текста")
+    link.add_argument("--lang", nargs="+", choices=sorted(LANGUAGES), default=sorted(LANGUAGES))
+    excel_export = subparsers.add_parser("excel-export", help="создать Excel-файл из базы")
+    excel_export.add_argument("--output", default=os.path.join(script_dir, "nier_subtitles.xlsx"))
+    excel_export.add_argument("--layout", choices=("rows", "columns"), default="rows",
+                              help="rows — поле на строку, columns — запись на строку")
+    excel_import = subparsers.add_parser("excel-import", help="перенести en_voice из Excel-файла в базу")
+    excel_import.add_argument("--input", default=os.path.join(script_dir, "nier_subtitles.xlsx"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = connect(args.db)
+    try:
+        # Каждая команда выполняется одной транзакцией
+        with conn:
+            if args.command == "import":
+                if not os.path.exists(args.text_path):
+                    print(f"Ошибка: Папка {args.text_path} не найдена.")
+                    return
+                imported, removed = import_text(conn, args.text_path)
+                audio_lines = import_audio(conn, args.audio_path) if os.path.exists(args.audio_path) else 0
+                print(f"Загружено файлов: {imported}, удалено из базы: {removed}, аудиострок: {audio_lines}.")
+            elif args.command == "export":
+                written = export_text(conn, args.text_path)
+                print(f"Записано файлов: {written}.")
+            elif args.command == "dedup":
+                from remove_duplicates import write_log
+
+                duplicates_info = remove_duplicates(conn)
+                write_log(duplicates_info, args.log)
+                print(f"Удалено повторов: {len(duplicates_info)}. Лог: {args.log}")
+            elif args.command == "link":
+                for lang, count in link_voices(conn, args.lang).items():
+                    print(f"Новых связей {lang}_voice: {count}")
+            elif args.command == "excel-export":
+                export_excel(conn, args.output, args.layout)
+                print(f"Сохранён Excel-файл {args.output}")
+            elif args.command == "excel-import":
+                from update_json_from_excel import load_excel_data
+
+                excel_data = load_excel_data(args.input)
+                if not excel_data:
+                    print("Не удалось загрузить данные из Excel. Прерываем выполнение.")
+                    return
+                print(f"Обновлено en_voice: {apply_excel_voices(conn, excel_data)}")
+    finally:
+        conn.close()
+    print(f"Готово за {time.perf_counter() - start:.2f} с.")
+
+if __name__ == "__main__":
+    main()
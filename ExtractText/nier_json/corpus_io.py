@@ -0,0 +1,114 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Сколько файлов читается или пишется одновременно; чтение в основном ждёт диск, поэтому потоков больше, чем ядер
+MAX_WORKERS = min(16, (os.cpu_count() or 1) * 4)
+
+def list_json_files(root_dir):
+    """Возвращает отсортированный список всех JSON-файлов в root_dir (включая подпапки)."""
+    return sorted(str(path) for path in Path(root_dir).rglob("*.json"))
+
+def loads(raw):
+    """Разбирает JSON из байтов: через orjson, если он установлен, иначе стандартным json."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def dumps(data):
+    """Сериализует данные в байты так же, как json.dump(data, f, ensure_ascii=False, indent=4).
+
+    Здесь всегда используется стандартный json: orjson умеет только отступ в 2
+    пробела, а файлы корпуса должны оставаться байт в байт прежними.
+    """
+    return json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8")
+
+def load_json_file(file_path):
+    """Читает один JSON-файл; возвращает (путь, данные) или (путь, None) с сообщением при ошибке."""
+    try:
+        with open(file_path, "rb") as f:
+            return file_path, loads(f.read())
+    except (OSError, ValueError) as e:
+        print(f"Ошибка при чтении файла {file_path}: {e}")
+        return file_path, None
+
+def iter_json_files(json_files, max_workers=MAX_WORKERS):
+    """Читает json_files в пуле потоков и выдаёт (путь, данные) в порядке json_files.
+
+    Вперёд читается не больше 2 * max_workers файлов, так что память не растёт
+    с размером корпуса. Файлы, которые не удалось прочитать, пропускаются.
+    """
+    if max_workers <= 1:
+        for file_path in json_files:
+            file_path, data = load_json_file(file_path)
+            if data is not None:
+                yield file_path, data
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for file_path in json_files:
+            pending.append(executor.submit(load_json_file, file_path))
+            if len(pending) >= 2 * max_workers:
+                file_path, data = pending.popleft().result()
+                if data is not None:
+                    yield file_path, data
+        while pending:
+            file_path, data = pending.popleft().result()
+            if data is not None:
+                yield file_path, data
+
+def write_json_file(file_path, data):
+    """Записывает данные в JSON-файл, если сериализованные байты отличаются от текущих; возвращает True при записи.
+
+    Ошибка записи (файл только для чтения, занят) выводится, и файл пропускается.
+    """
+    raw = dumps(data)
+    try:
+        with open(file_path, "rb") as f:
+            if f.read() == raw:
+                return False
+    except OSError:
+        pass
+    try:
+        with open(file_path, "wb") as f:
+            f.write(raw)
+    except OSError as e:
+        print(f"Ошибка при обработке файла {file_path}: {e}")
+        return False
+    return True
+
+def write_json_files(items, max_workers=MAX_WORKERS):
+    """Записывает пары (путь, данные) в пуле потоков и возвращает пути реально перезаписанных файлов.
+
+    Файлы с неизменившимся содержимым не трогаются, поэтому их mtime сохраняется.
+    Файлы, которые не удалось записать, пропускаются и в результат не попадают.
+    items может быть генератором: одновременно в памяти не больше 2 * max_workers файлов.
+    """
+    written = []
+    if max_workers <= 1:
+        for file_path, data in items:
+            if write_json_file(file_path, data):
+                written.append(file_path)
+        return written
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for file_path, data in items:
+            pending.append((file_path, executor.submit(write_json_file, file_path, data)))
+            if len(pending) >= 2 * max_workers:
+                file_path, future = pending.popleft()
+                if future.result():
+                    written.append(file_path)
+        while pending:
+            file_path, future = pending.popleft()
+            if future.result():
+                written.append(file_path)
+    return written
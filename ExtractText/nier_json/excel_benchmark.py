@@ -0,0 +1,112 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from parse_nier_json_to_excel import COLUMNS, write_entries, write_entry_columns
+from update_json_from_excel import excel_engine, load_excel_data, load_excel_records
+from xlsx_writer import XlsxWriter
+
+# Листы синтетической книги — как папки nier_text_json
+SHEETS = ("core", "ph1", "ph2", "ph3", "quest", "subtitle", "txtmess")
+
+def synthetic_entries(entry_count, seed=0):
+    """Генерирует записи в форме nier_text_json; примерно у половины заполнен en_voice."""
+    rng = random.Random(seed)
+    words = ("machine", "android", "pod", "bunker", "resistance", "camp", "city", "forest", "desert", "park")
+    for i in range(entry_count):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        entry = {"id": f"M{i // 100:04d}_S{i % 100:04d}_G0000_001_a2b", "jp": f"テキスト{i}", "en": text.capitalize(),
+                 "ru": f"Текст {i}: {text}"}
+        if rng.random() < 0.5:
+            entry["en_voice"] = f"stream/English(US)/vo_plffff_0_{i % 4:03d}/{i}.wav"
+        yield entry
+
+def build_workbook(excel_file, entries, layout):
+    """Записывает записи в книгу выбранного макета, распределяя их по листам SHEETS."""
+    per_sheet = {sheet: [] for sheet in SHEETS}
+    for i, entry in enumerate(entries):
+        per_sheet[SHEETS[i % len(SHEETS)]].append(entry)
+    with XlsxWriter(excel_file) as wb:
+        for sheet_name, sheet_entries in per_sheet.items():
+            sheet = wb.create_sheet(sheet_name)
+            if layout == "columns":
+                sheet.append(COLUMNS)
+                write_entry_columns(sheet, sheet_entries, f"{sheet_name}/synthetic.json")
+            else:
+                write_entries(sheet, sheet_entries)
+
+def load_excel_data_iterrows(excel_file):
+    """Прежний загрузчик для сравнения: отдельный read_excel на лист и построчный обход iterrows."""
+    xl = pd.ExcelFile(excel_file)
+    excel_data = {}
+    for sheet_name in xl.sheet_names:
+        df = pd.read_excel(excel_file, sheet_name=sheet_name, header=None)
+        id_to_en_voice = {}
+        current_id = None
+        current_record = {}
+        for index, row in df.iterrows():
+            key = str(row[0]).strip() if pd.notna(row[0]) else ""
+            value = str(row[1]).strip() if pd.notna(row[1]) else ""
+            if key == "id":
+                if current_id and current_record.get("en_voice"):
+                    id_to_en_voice[current_id] = current_record["en_voice"]
+                current_id = value
+                current_record = {"id": value}
+            elif key in ["jp", "en", "ru", "en_voice", "jp_voice"]:
+                current_record[key] = value
+        if current_id and current_record.get("en_voice"):
+            id_to_en_voice[current_id] = current_record["en_voice"]
+        if id_to_en_voice:
+            excel_data[sheet_name] = id_to_en_voice
+    return excel_data
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеряет чтение nier_subtitles.xlsx на синтетической книге.")
+    parser.add_argument("--entries", type=int, default=100000, help="число записей (по умолчанию 100000)")
+    parser.add_argument("--legacy", action="store_true",
+                        help="замерить и прежний загрузчик с iterrows (на 100000 записей — минуты)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="excel_benchmark_")
+    try:
+        entries = list(synthetic_entries(args.entries))
+        expected = {}
+        for i, entry in enumerate(entries):
+            if entry.get("en_voice"):
+                expected.setdefault(SHEETS[i % len(SHEETS)], {})[entry["id"]] = entry["en_voice"]
+
+        engines = ["openpyxl"]
+        if excel_engine() == "calamine":
+            engines.insert(0, "calamine")
+        for layout in ("rows", "columns"):
+            excel_file = os.path.join(work_dir, f"synthetic_{layout}.xlsx")
+            _, elapsed = timed(build_workbook, excel_file, entries, layout)
+            print(f"Макет {layout}: {os.path.getsize(excel_file) / (1024 * 1024):.1f} МБ, записан за {elapsed:.2f} с")
+
+            for engine in engines:
+                records, elapsed = timed(load_excel_records, excel_file, engine)
+                print(f"  load_excel_records, движок {engine}: {elapsed:.2f} с "
+                      f"({sum(map(len, records.values())) / elapsed:.0f} записей/с)")
+            if load_excel_data(excel_file) != expected:
+                print("  Ошибка: load_excel_data вернул не те en_voice.")
+
+            if args.legacy and layout == "rows":
+                legacy, elapsed = timed(load_excel_data_iterrows, excel_file)
+                print(f"  прежний загрузчик (iterrows): {elapsed:.2f} с")
+                if legacy != expected:
+                    print("  Ошибка: прежний загрузчик вернул не те en_voice.")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import pickle
+from collections import defaultdict
+
+from corpus_io import iter_json_files, list_json_files
+
+# Версия формата индекса; при несовместимых изменениях формата индекс перестраивается
+INDEX_VERSION = 1
+# Имя файла индекса по умолчанию (рядом со скриптами)
+INDEX_FILE_NAME = "id_index.pickle"
+# Поля, хеши значений которых хранятся в индексе, чтобы не открывать файлы без изменений
+INDEXED_FIELDS = ("jp", "en", "ru", "en_voice", "jp_voice")
+
+class IdIndex:
+    """Индекс nier_text_json: id -> список (относительный путь, позиция записи в файле).
+
+    Для каждой записи также хранятся хеши значений INDEXED_FIELDS, так что по
+    индексу видно, изменит ли правка запись. Индекс хранится на диске между
+    запусками; при обновлении заново читаются только файлы, у которых
+    изменились размер или mtime, а остальные даже не открываются.
+    """
+
+    def __init__(self, base_path, index_path=None):
+        self.base_path = base_path
+        self.index_path = index_path
+        self.locations = defaultdict(list)
+        # Сколько файлов пришлось прочитать заново (а не взять из индекса)
+        self.reloaded = 0
+        cached_files = load_index(index_path, base_path) if index_path else {}
+        self.files = {}
+        stale = {}
+        for json_file in list_json_files(base_path):
+            relative_path = self.relative_path(json_file)
+            stat = os.stat(json_file)
+            record = cached_files.get(relative_path)
+            if record is None or record["size"] != stat.st_size or record["mtime_ns"] != stat.st_mtime_ns:
+                stale[json_file] = (relative_path, stat)
+            else:
+                self.files[relative_path] = record
+
+        for json_file, data in iter_json_files(list(stale)):
+            relative_path, stat = stale[json_file]
+            self.reloaded += 1
+            if not isinstance(data, list):
+                print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
+                data = []
+            self.files[relative_path] = {
+                "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                "ids": [item.get("id") if isinstance(item, dict) else None for item in data],
+                "hashes": entry_hashes(data),
+            }
+
+        for relative_path in sorted(self.files):
+            for position, item_id in enumerate(self.files[relative_path]["ids"]):
+                if item_id is not None:
+                    self.locations[item_id].append((relative_path, position))
+
+        if index_path and (self.reloaded or self.files.keys() != cached_files.keys()):
+            self.save()
+
+    def relative_path(self, json_file):
+        return os.path.relpath(json_file, self.base_path).replace('\\', '/')
+
+    def full_path(self, relative_path):
+        return os.path.join(self.base_path, *relative_path.split('/'))
+
+    def lookup(self, item_id):
+        """Возвращает список (относительный путь, позиция) записей с данным id."""
+        return self.locations.get(item_id, [])
+
+    def field_hash(self, relative_path, position, field):
+        """Возвращает хеш значения поля записи (0 — поле пустое или отсутствует)."""
+        return self.files[relative_path]["hashes"][position][INDEXED_FIELDS.index(field)]
+
+    def refresh_files(self, updated):
+        """Обновляет индекс для перезаписанных файлов без их повторного чтения.
+
+        updated — {путь: entry_hashes(данные)} файлов, в которых менялись поля, но не id.
+        """
+        for json_file, hashes in updated.items():
+            record = self.files.get(self.relative_path(json_file))
+            if record is not None:
+                stat = os.stat(json_file)
+                record["size"], record["mtime_ns"], record["hashes"] = stat.st_size, stat.st_mtime_ns, hashes
+        if self.index_path:
+            self.save()
+
+    def save(self):
+        save_index(self.index_path, self.base_path, self.files)
+
+def value_hash(value):
+    """64-битный хеш значения поля без пробелов по краям; пустое или отсутствующее поле даёт 0."""
+    if value is None or value == "":
+        return 0
+    return int.from_bytes(hashlib.blake2b(str(value).strip().encode("utf-8"), digest_size=8).digest(), "little")
+
+def entry_hashes(data):
+    """Возвращает для каждой записи файла кортеж хешей полей INDEXED_FIELDS."""
+    return [tuple(value_hash(item.get(field)) if isinstance(item, dict) else 0 for field in INDEXED_FIELDS)
+            for item in data]
+
+def folder_of(relative_path):
+    """Возвращает папку верхнего уровня (core, ph1, ...) — она же имя листа в Excel."""
+    return relative_path.split('/', 1)[0]
+
+def load_index(index_path, base_path):
+    """Загружает индекс: относительный путь -> {size, mtime_ns, ids, hashes}.
+
+    Отсутствующий, повреждённый, устаревший по формату или построенный для другой
+    папки индекс считается пустым.
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return {}
+    if (not isinstance(index, dict) or index.get("version") != INDEX_VERSION
+            or index.get("base_path") != os.path.abspath(base_path)):
+        return {}
+    return index["files"]
+
+def save_index(index_path, base_path, files):
+    """Записывает индекс атомарно, чтобы прерванный запуск оставил предыдущий."""
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    temp_path = index_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump({"version": INDEX_VERSION, "base_path": os.path.abspath(base_path), "files": files},
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, index_path)
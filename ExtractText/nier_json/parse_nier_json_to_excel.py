@@ -1,57 +1,81 @@
-import json
+import argparse
 import os
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill
 from pathlib import Path
 
-def parse_json_files(folder_path, sheet, row_start=1):
-    # Определяем возможные поля
-    fields = ["id", "jp", "en", "ru", "en_voice", "jp_voice"]
-    
-    # Определяем желтую заливку
-    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-    
-    # Рекурсивно обходим все файлы в папке
-    for item in Path(folder_path).rglob("*.json"):
-        with open(item, 'r', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-                for entry in data:
-                    # Записываем каждую группу
-                    for field in fields:
-                        sheet[f"A{row_start}"] = field
-                        sheet[f"B{row_start}"] = entry.get(field, "")
-                        # Применяем желтую заливку для "en_voice" если значение в B пустое
-                        if field == "en_voice" and not entry.get(field):
-                            sheet[f"A{row_start}"].fill = yellow_fill
-                        row_start += 1
-                    # Добавляем пустую строку между группами
-                    row_start += 1
-            except json.JSONDecodeError:
-                print(f"Ошибка при чтении файла: {item}")
+from corpus_io import iter_json_files, list_json_files
+from xlsx_writer import STYLE_YELLOW, XlsxWriter
+
+# Определяем возможные поля
+FIELDS = ["id", "jp", "en", "ru", "en_voice", "jp_voice"]
+# Столбцы табличного макета: одна строка на запись и файл, из которого она взята
+COLUMNS = FIELDS + ["source_file"]
+# Макеты листа: rows — поле на строку (столбец A: поле, B: значение), columns — запись на строку
+LAYOUTS = ("rows", "columns")
+# Желтая заливка столбца A для пустого "en_voice"
+EMPTY_VOICE_STYLES = {0: STYLE_YELLOW}
+# В табличном макете заливается сама пустая ячейка en_voice
+EMPTY_VOICE_COLUMN_STYLES = {COLUMNS.index("en_voice"): STYLE_YELLOW}
+
+def write_entries(sheet, entries, row_start=1):
+    """Дописывает записи на лист группами строк (столбец A: поле, столбец B: значение) и возвращает следующую строку.
+
+    Лист — потоковый XlsxSheet: строки сразу уходят в файл и не держатся в памяти.
+    """
+    for entry in entries:
+        # Записываем каждую группу
+        for field in FIELDS:
+            value = entry.get(field, "")
+            # Применяем желтую заливку для "en_voice" если значение в B пустое
+            sheet.append([field, value], EMPTY_VOICE_STYLES if field == "en_voice" and not value else None)
+        # Добавляем пустую строку между группами
+        sheet.append([])
+        row_start += len(FIELDS) + 1
     return row_start
 
+def write_entry_columns(sheet, entries, source_file):
+    """Дописывает записи на лист табличного макета: одна строка на запись, source_file — путь исходного JSON."""
+    for entry in entries:
+        values = [entry.get(field, "") for field in FIELDS]
+        values.append(source_file)
+        sheet.append(values, EMPTY_VOICE_COLUMN_STYLES if not entry.get("en_voice") else None)
+
+def parse_json_files(folder_path, sheet, row_start=1, layout="rows", base_path=None):
+    """Записывает все JSON-файлы папки на лист в выбранном макете; source_file считается от base_path."""
+    if layout == "columns" and row_start == 1:
+        sheet.append(COLUMNS)
+        row_start += 1
+    # Рекурсивно обходим все файлы в папке (в отсортированном порядке, чтобы таблица не менялась от запуска к запуску)
+    for item, data in iter_json_files(list_json_files(folder_path)):
+        if layout == "columns":
+            source_file = os.path.relpath(item, base_path or folder_path).replace('\\', '/')
+            write_entry_columns(sheet, data, source_file)
+            row_start += len(data)
+        else:
+            row_start = write_entries(sheet, data, row_start)
+    return row_start
+
+def export_workbook(base_path, excel_file, layout="rows"):
+    """Выгружает папки base_path в Excel-файл excel_file, по листу на папку."""
+    # Создаем новый Excel-файл; листы пишутся потоком, по одному
+    with XlsxWriter(excel_file) as wb:
+        # Обрабатываем каждую папку (core, ph1, ph2 и т.д.)
+        for folder in sorted(Path(base_path).iterdir()):
+            if folder.is_dir():
+                # Создаем новый лист с именем папки
+                sheet = wb.create_sheet(title=folder.name)
+
+                # Парсим JSON-файлы и записываем в лист
+                parse_json_files(folder, sheet, layout=layout, base_path=base_path)
+
 def main():
-    # Путь к папке с JSON-файлами
-    base_path = "nier_text_json"
-    
-    # Создаем новый Excel-файл
-    wb = Workbook()
-    
-    # Удаляем дефолтный лист
-    wb.remove(wb.active)
-    
-    # Обрабатываем каждую папку (core, ph1, ph2 и т.д.)
-    for folder in Path(base_path).iterdir():
-        if folder.is_dir():
-            # Создаем новый лист с именем папки
-            sheet = wb.create_sheet(title=folder.name)
-            
-            # Парсим JSON-файлы и записываем в лист
-            parse_json_files(folder, sheet)
-    
-    # Сохраняем Excel-файл
-    wb.save("nier_subtitles.xlsx")
+    parser = argparse.ArgumentParser(description="Выгружает nier_text_json в nier_subtitles.xlsx, по листу на папку.")
+    parser.add_argument("--layout", choices=LAYOUTS, default="rows",
+                        help="rows — поле на строку (по умолчанию), columns — запись на строку со столбцами "
+                             + "/".join(COLUMNS))
+    args = parser.parse_args()
+
+    # nier_text_json выгружается в nier_subtitles.xlsx
+    export_workbook("nier_text_json", "nier_subtitles.xlsx", args.layout)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,29 +1,23 @@
-import os
+import argparse
+import hashlib
 import json
 from collections import defaultdict
 
+from corpus_io import iter_json_files, list_json_files, write_json_files
+
 ROOT_DIR = "nier_text_json"
 LOG_FILE = "remove_duplicates_log.txt"
 
 def collect_json_files(root_dir):
-    json_files = []
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".json"):
-                json_files.append(os.path.join(root, file))
-    return json_files
+    # Порядок файлов определяет, какая из повторяющихся записей останется, поэтому он отсортирован
+    return list_json_files(root_dir)
 
 def load_all_entries(json_files):
     all_entries = []
-    for file_path in json_files:
-        with open(file_path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-                for entry in data:
-                    key = (entry.get("id"), entry.get("en"))
-                    all_entries.append((key, entry, file_path))
-            except json.JSONDecodeError as e:
-                print(f"Ошибка JSON в файле: {file_path} — {e}")
+    for file_path, data in iter_json_files(json_files):
+        for entry in data:
+            key = (entry.get("id"), entry.get("en"))
+            all_entries.append((key, entry, file_path))
     return all_entries
 
 def deduplicate_entries(all_entries):
@@ -57,28 +51,113 @@ def write_back_files(unique_entries, json_files):
     for info in unique_entries.values():
         new_file_data[info["file"]].append(info["entry"])
 
-    for file_path in json_files:
-        data = new_file_data.get(file_path, [])
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+    # Файлы, содержимое которых не изменилось, не перезаписываются
+    write_json_files((file_path, new_file_data.get(file_path, [])) for file_path in json_files)
+
+def write_log_entry(log, dup):
+    log.write(f"🔁 Повтор:\n")
+    log.write(f"  ID: {dup['id']}\n")
+    log.write(f"  EN: {dup['en']}\n")
+    log.write(f"  ✅ Оставлен: {dup['kept_file']}\n")
+    log.write(f"  ❌ Удалён:   {dup['duplicate_file']}\n")
+    if dup["en_voice_replaced"]:
+        log.write(f"  ⚠️  en_voice был скопирован из удалённой записи.\n")
+    log.write("\n")
 
 def write_log(duplicates_info, log_file_path):
     with open(log_file_path, "w", encoding="utf-8") as log:
         for dup in duplicates_info:
-            log.write(f"🔁 Повтор:\n")
-            log.write(f"  ID: {dup['id']}\n")
-            log.write(f"  EN: {dup['en']}\n")
-            log.write(f"  ✅ Оставлен: {dup['kept_file']}\n")
-            log.write(f"  ❌ Удалён:   {dup['duplicate_file']}\n")
-            if dup["en_voice_replaced"]:
-                log.write(f"  ⚠️  en_voice был скопирован из удалённой записи.\n")
-            log.write("\n")
+            write_log_entry(log, dup)
+
+def entry_key_hash(entry):
+    """64-битный хеш ключа (id, en) записи; хранится вместо самих строк."""
+    key = json.dumps([entry.get("id"), entry.get("en")], ensure_ascii=False).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+def scan_duplicates(json_files, log):
+    """Первый проход потокового режима: находит повторы, не держа в памяти записи.
+
+    Файлы читаются по одному. Для каждого уникального ключа хранится только
+    64-битный хеш и, если у оставленной записи нет en_voice, её (файл, позиция).
+    Повторы сразу пишутся в лог. Возвращает (drops, donations, stats):
+    drops — {файл: множество позиций удаляемых записей}, donations —
+    {(файл, позиция): en_voice} для оставленных записей, получающих en_voice.
+    """
+    # Хеш ключа -> None, если en_voice у оставленной записи уже есть, иначе (файл, позиция)
+    seen = {}
+    kept_files = {}
+    drops = defaultdict(set)
+    donations = {}
+    stats = {"entries": 0, "duplicates": 0}
+    file_indexes = {file_path: file_index for file_index, file_path in enumerate(json_files)}
+    for file_path, data in iter_json_files(json_files):
+        file_index = file_indexes[file_path]
+        for position, entry in enumerate(data):
+            stats["entries"] += 1
+            key = entry_key_hash(entry)
+            if key not in seen:
+                seen[key] = None if entry.get("en_voice") else (file_index, position)
+                kept_files[key] = file_index
+                continue
+
+            stats["duplicates"] += 1
+            drops[file_path].add(position)
+            replaced_voice = False
+            if seen[key] is not None and entry.get("en_voice"):
+                donations[seen[key]] = entry["en_voice"]
+                seen[key] = None
+                replaced_voice = True
+            write_log_entry(log, {
+                "id": entry.get("id"),
+                "en": entry.get("en"),
+                "kept_file": json_files[kept_files[key]],
+                "duplicate_file": file_path,
+                "en_voice_replaced": replaced_voice
+            })
+    stats["unique"] = len(seen)
+    return drops, {(json_files[file_index], position): voice
+                   for (file_index, position), voice in donations.items()}, stats
+
+def apply_changes(drops, donations):
+    """Второй проход потокового режима: перезаписывает только файлы, потерявшие записи или получившие en_voice."""
+    changes = defaultdict(dict)
+    for (file_path, position), voice in donations.items():
+        changes[file_path][position] = voice
+
+    def updated_files():
+        for file_path, data in iter_json_files(sorted(set(drops) | set(changes))):
+            for position, voice in changes.get(file_path, {}).items():
+                data[position]["en_voice"] = voice
+            dropped = drops.get(file_path, ())
+            yield file_path, [entry for position, entry in enumerate(data) if position not in dropped]
+
+    return write_json_files(updated_files())
 
 def main():
+    parser = argparse.ArgumentParser(description="Удаляет повторы записей по (id, en) в nier_text_json.")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="загрузить все записи в память и перезаписать все файлы (прежний режим)")
+    args = parser.parse_args()
+
     print("🔍 Ищем JSON-файлы...")
     json_files = collect_json_files(ROOT_DIR)
     print(f"Найдено файлов: {len(json_files)}")
 
+    if not args.in_memory:
+        print("🧹 Ищем повторы (потоковый режим)...")
+        with open(LOG_FILE, "w", encoding="utf-8") as log:
+            drops, donations, stats = scan_duplicates(json_files, log)
+        print(f"Всего записей: {stats['entries']}")
+        print(f"Оставлено уникальных записей: {stats['unique']}")
+        print(f"Удалено повторов: {stats['duplicates']}")
+
+        print("💾 Перезаписываем изменённые JSON-файлы...")
+        changed_files = apply_changes(drops, donations)
+        print(f"Перезаписано файлов: {len(changed_files)}")
+        print(f"📝 Лог записан в {LOG_FILE}")
+        print("✅ Готово!")
+        return
+
     print("📥 Загружаем данные...")
     all_entries = load_all_entries(json_files)
     print(f"Всего записей: {len(all_entries)}")
@@ -1,91 +1,32 @@
+import argparse
 import os
-import json
-from pathlib import Path
-import string
 
-def clean_text(text):
-    """Очищает текст: удаляет пробелы, знаки пунктуации и приводит к нижнему регистру."""
-    translator = str.maketrans("", "", string.punctuation)
-    return text.strip().lower().translate(translator)
+from update_voice_from_audio import CACHE_DIR_NAME, clean_text_en as clean_text, link_voices
+from voice_index import VoiceIndex
 
 def search_audio_match(phrase, audio_path):
-    """Ищет фразу в JSON-файлах в audio_path, возвращает путь и wav, если найдено ровно одно совпадение."""
-    matches = []
-    for json_file in Path(audio_path).rglob("*.json"):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not isinstance(data, list):
-                print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
-                continue
-            
-            for item in data:
-                if 'text' not in item or 'wav' not in item:
-                    print(f"Предупреждение: Запись в {json_file} не содержит 'text' или 'wav'. Пропускаем.")
-                    continue
-                if clean_text(item['text']) == clean_text(phrase):
-                    # Формируем путь без audio_path
-                    relative_path = os.path.relpath(json_file, audio_path).replace('\\', '/')
-                    # Удаляем .json из имени файла
-                    base_path = os.path.splitext(relative_path)[0]
-                    # Добавляем значение wav
-                    wav_path = f"{base_path}/{item['wav']}"
-                    matches.append(wav_path)
-        
-        except Exception as e:
-            print(f"Ошибка при обработке файла {json_file}: {e}")
-    
-    return matches
+    """Ищет фразу в JSON-файлах в audio_path и возвращает список найденных путей к wav.
 
-def update_json_files(text_path, audio_path):
-    """Обновляет en_voice в JSON-файлах в text_path на основе поиска в audio_path."""
-    for json_file in Path(text_path).rglob("*.json"):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not isinstance(data, list):
-                print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
-                continue
+    Строит индекс заново при каждом вызове; для множества фраз используйте VoiceIndex.
+    """
+    return VoiceIndex(audio_path, clean_text).lookup(phrase)
 
-            modified = False
-            for item in data:
-                if 'id' not in item:
-                    print(f"Предупреждение: Запись в {json_file} не содержит 'id'. Пропускаем.")
-                    continue
-                item_id = item['id']
-                # Проверяем, пустое ли en_voice (или отсутствует)
-                if item.get('en_voice', '') == '':
-                    if 'en' not in item:
-                        print(f"Пропуск: id {item_id} в {json_file} не содержит 'en'.")
-                        continue
-                    en_phrase = item['en']
-                    # Ищем совпадения в nier_audio_json
-                    matches = search_audio_match(en_phrase, audio_path)
-                    if len(matches) == 0:
-                        print(f"Пропуск: Для id {item_id} в {json_file} не найдено совпадений для фразы '{en_phrase}'.")
-                    elif len(matches) > 1:
-                        print(f"Пропуск: Для id {item_id} в {json_file} найдено {len(matches)} совпадений для фразы '{en_phrase}'.")
-                    else:
-                        # Найдено ровно одно совпадение
-                        new_en_voice = matches[0]
-                        item['en_voice'] = new_en_voice
-                        modified = True
-                        print(f"Обновлено en_voice для id {item_id} в {json_file}: {new_en_voice}")
-                else:
-                    print(f"Пропуск: en_voice для id {item_id} в {json_file} уже заполнено.")
+def update_json_files(text_path, audio_path, fuzzy_threshold=None, cache_dir=None):
+    """Обновляет en_voice в JSON-файлах в text_path на основе поиска в audio_path.
 
-            # Сохраняем файл, если были изменения
-            if modified:
-                with open(json_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=4)
-                print(f"Сохранён обновлённый файл {json_file}")
-        
-        except Exception as e:
-            print(f"Ошибка при обработке файла {json_file}: {e}")
+    Обёртка над link_voices для одного языка; чтобы заполнить все языки за один
+    проход по файлам, используйте update_voice_from_audio.py.
+    """
+    link_voices(text_path, audio_path, ("en",), fuzzy_threshold, cache_dir)
 
 def main():
+    parser = argparse.ArgumentParser(description="Заполняет en_voice по совпадению текста с nier_audio_json.")
+    parser.add_argument("--fuzzy", type=float, nargs="?", const=0.9, metavar="ПОРОГ",
+                        help="искать фразы без точного совпадения нечётко, с порогом похожести (по умолчанию 0.9)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"не использовать кэш аудиокорпуса в папке {CACHE_DIR_NAME}")
+    args = parser.parse_args()
+
     # Путь к папкам (в той же директории, что и скрипт)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     text_path = os.path.join(script_dir, "nier_text_json")
@@ -100,7 +41,8 @@ def main():
         return
     
     # Запускаем обновление
-    update_json_files(text_path, audio_path)
+    cache_dir = None if args.no_cache else os.path.join(script_dir, CACHE_DIR_NAME)
+    update_json_files(text_path, audio_path, args.fuzzy, cache_dir)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
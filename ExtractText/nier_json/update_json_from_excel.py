@@ -1,110 +1,244 @@
+import argparse
 import os
-import json
-from pathlib import Path
+from collections import defaultdict
 import pandas as pd
 
-def load_excel_data(excel_file):
-    """Читает Excel-файл с построчной структурой (столбец A: ключи, столбец B: значения) и возвращает словарь {sheet_name: {id: en_voice}}."""
+from corpus_io import iter_json_files, write_json_files
+from id_index import INDEX_FILE_NAME, IdIndex, entry_hashes, folder_of, value_hash
+
+# Поля записи, которые читаются из Excel (кроме id)
+EXCEL_FIELDS = ["jp", "en", "ru", "en_voice", "jp_voice"]
+# Текстовые поля: для id, повторяющихся на листе, они не переносятся — это разные строки с одним id
+TEXT_FIELDS = ["jp", "en", "ru"]
+
+def excel_engine():
+    """Возвращает самый быстрый доступный движок чтения Excel: calamine, если установлен, иначе движок pandas по умолчанию."""
     try:
-        xl = pd.ExcelFile(excel_file)
-        excel_data = {}
-        for sheet_name in xl.sheet_names:
-            df = pd.read_excel(excel_file, sheet_name=sheet_name, header=None)
-            id_to_en_voice = {}
-            current_id = None
-            current_record = {}
-            
-            # Обрабатываем строки
-            for index, row in df.iterrows():
-                key = str(row[0]).strip() if pd.notna(row[0]) else ""
-                value = str(row[1]).strip() if pd.notna(row[1]) else ""
-                
-                if key == "id":
-                    if current_id and current_record.get("en_voice"):
-                        id_to_en_voice[current_id] = current_record["en_voice"]
-                    current_id = value
-                    current_record = {"id": value}
-                elif key in ["jp", "en", "ru", "en_voice", "jp_voice"]:
-                    current_record[key] = value
-            
-            # Добавляем последнюю запись, если en_voice не пустое
-            if current_id and current_record.get("en_voice"):
-                id_to_en_voice[current_id] = current_record["en_voice"]
-            
-            if id_to_en_voice:
-                excel_data[sheet_name] = id_to_en_voice
-            else:
-                print(f"Предупреждение: Лист {sheet_name} не содержит записей с непустым en_voice.")
-        
-        return excel_data
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return None
+    return "calamine"
+
+def clean_column(column):
+    """Приводит столбец к строкам без пробелов по краям; пустые ячейки становятся NaN."""
+    column = column.astype("string").str.strip()
+    return column.mask(column == "")
+
+def is_columns_layout(df):
+    """Проверяет, записан ли лист в табличном макете: первая строка — заголовок со столбцами id и en_voice."""
+    if df.empty:
+        return False
+    header = {str(value).strip() for value in df.iloc[0] if pd.notna(value)}
+    return {"id", "en_voice"} <= header
+
+def rows_sheet_table(df):
+    """Собирает лист построчного макета (столбец A: ключи, столбец B: значения) в таблицу записей.
+
+    Строки группируются по номеру группы — накопленной сумме строк с ключом id,
+    после чего группы разворачиваются в столбцы через pivot. Повтор ключа внутри
+    группы перекрывает предыдущее значение, как в прежнем построчном разборе.
+    """
+    df = df.reindex(columns=[0, 1])
+    keys = clean_column(df[0]).fillna("")
+    group = keys.eq("id").cumsum()
+    cells = pd.DataFrame({"group": group, "key": keys, "value": clean_column(df[1])})
+    cells = cells[(cells["group"] > 0) & cells["key"].isin(["id"] + EXCEL_FIELDS)]
+    cells = cells.drop_duplicates(["group", "key"], keep="last")
+    return cells.pivot(index="group", columns="key", values="value")
+
+def columns_sheet_table(df):
+    """Собирает лист табличного макета (заголовок в первой строке, одна строка на запись) в таблицу записей."""
+    header = [str(value).strip() if pd.notna(value) else "" for value in df.iloc[0]]
+    table = df.iloc[1:].set_axis(header, axis=1)
+    table = table.loc[:, ~table.columns.duplicated()]
+    return table.reindex(columns=["id"] + EXCEL_FIELDS).apply(clean_column)
+
+def sheet_records(df, sheet_name=""):
+    """Возвращает {id: {поле: значение}} листа любого макета; пустые поля — пустые строки.
+
+    Записи без id пропускаются. Если id встречается на листе несколько раз, для
+    en_voice и jp_voice берётся последнее непустое значение, а текстовые поля
+    остаются пустыми: по одному id нельзя понять, к какой из строк относится правка.
+    """
+    table = columns_sheet_table(df) if is_columns_layout(df) else rows_sheet_table(df)
+    table = table.reindex(columns=["id"] + EXCEL_FIELDS)
+    table = table[table["id"].notna()]
+    grouped = table.groupby("id", sort=False)
+    counts = grouped.size()
+    table = grouped.last()
+    repeated = counts[counts > 1].index
+    if len(repeated):
+        table.loc[repeated, TEXT_FIELDS] = pd.NA
+        print(f"Предупреждение: На листе {sheet_name} {len(repeated)} id встречаются несколько раз; "
+              f"их поля {', '.join(TEXT_FIELDS)} не переносятся.")
+    return table.astype(object).where(table.notna(), "").to_dict(orient="index")
+
+def load_excel_records(excel_file, engine=None):
+    """Читает все листы Excel-файла за один разбор и возвращает {sheet_name: {id: {поле: значение}}}.
+
+    engine — движок pandas.read_excel; по умолчанию выбирается excel_engine().
+
+    Макет каждого листа определяется автоматически: построчный (столбец A: ключи,
+    столбец B: значения) или табличный (заголовок id/jp/en/ru/en_voice/jp_voice/source_file).
+    """
+    try:
+        sheets = pd.read_excel(excel_file, sheet_name=None, header=None, dtype=str, engine=engine or excel_engine())
     except Exception as e:
         print(f"Ошибка при чтении Excel-файла {excel_file}: {e}")
         return {}
+    return {sheet_name: sheet_records(df, sheet_name) for sheet_name, df in sheets.items()}
 
-def update_json_files(excel_file, base_path):
-    """Обновляет JSON-файлы в base_path на основе данных из Excel."""
+def load_excel_data(excel_file):
+    """Читает Excel-файл и возвращает словарь {sheet_name: {id: en_voice}} с непустыми en_voice."""
+    excel_data = {}
+    for sheet_name, records in load_excel_records(excel_file).items():
+        id_to_en_voice = {item_id: record["en_voice"] for item_id, record in records.items() if record["en_voice"]}
+        if id_to_en_voice:
+            excel_data[sheet_name] = id_to_en_voice
+        else:
+            print(f"Предупреждение: Лист {sheet_name} не содержит записей с непустым en_voice.")
+    return excel_data
+
+def update_json_files(excel_file, base_path, fields=("en_voice",), index_path=None):
+    """Обновляет JSON-файлы в base_path на основе данных из Excel.
+
+    en_voice заполняется только там, где он пуст; остальные поля из fields
+    перезаписываются, если в таблице значение непустое и отличается от JSON.
+    Файлы находятся через индекс id (см. id_index.py), поэтому открываются
+    только те, в которых есть правки; index_path — файл индекса между запусками.
+    """
     # Загружаем данные из Excel
-    excel_data = load_excel_data(excel_file)
+    excel_data = load_excel_records(excel_file)
     if not excel_data:
         print("Не удалось загрузить данные из Excel. Прерываем выполнение.")
         return
 
-    # Обходим все подпапки (core, ph1, ph2 и т.д.)
-    for folder in Path(base_path).iterdir():
-        if not folder.is_dir():
-            continue
-        folder_name = folder.name
-        # Проверяем, есть ли соответствующий лист в Excel
-        if folder_name not in excel_data:
-            print(f"Предупреждение: Лист {folder_name} не найден в Excel. Пропускаем папку {folder}.")
+    id_index = IdIndex(base_path, index_path)
+    print(f"Индекс id: {len(id_index.files)} файлов, прочитано заново {id_index.reloaded}.")
+    edits, conflicts = plan_edits(excel_data, id_index, fields)
+    if conflicts:
+        print(f"Предупреждение: {conflicts} id встречаются на нескольких листах с разными значениями.")
+
+    # Изменённые файлы записываются пакетом; их новые хеши полей сразу попадают в индекс
+    updated = {}
+    written = write_json_files(apply_edits(id_index, edits, fields, updated))
+    for json_file in written:
+        print(f"Сохранён обновлённый файл {json_file}")
+    # Файлы, которые не удалось записать, остаются в индексе со старыми хешами
+    id_index.refresh_files({json_file: updated[json_file] for json_file in written})
+
+def merge_sheet_records(sheet_records, fields):
+    """Объединяет непустые значения полей fields с нескольких листов; при расхождении значений возвращает None."""
+    merged = {}
+    for record in sheet_records.values():
+        for field in fields:
+            value = record.get(field, "")
+            if value and merged.setdefault(field, value) != value:
+                return None
+    return merged
+
+def changes_entry(id_index, relative_path, position, record, fields):
+    """По хешам полей в индексе определяет, изменит ли update_item запись, не открывая файл."""
+    for field in fields:
+        new_value = record.get(field, "")
+        if not new_value:
             continue
+        current = id_index.field_hash(relative_path, position, field)
+        if field == "en_voice":
+            # en_voice заполняется только там, где он пуст
+            if current == 0:
+                return True
+        elif current != value_hash(new_value):
+            return True
+    return False
+
+def plan_edits(excel_data, id_index, fields):
+    """Сопоставляет записи листов с записями nier_text_json по индексу id.
 
-        # Получаем словарь {id: en_voice} для текущего листа
-        id_to_en_voice = excel_data[folder_name]
-
-        # Обходим все JSON-файлы в папке (включая подпапки)
-        for json_file in folder.rglob("*.json"):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                if not isinstance(data, list):
-                    print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
+    Возвращает ({относительный путь: [(позиция, id, запись таблицы)]}, число конфликтов).
+    Запись JSON берёт значения с листа своей папки, а если там этого id нет
+    (запись переехала в другую папку) — с остальных листов, где он есть. Если
+    id есть на нескольких листах с разными значениями, это конфликт: о нём
+    сообщается, и записи без своего листа не обновляются.
+    """
+    sheets_by_id = defaultdict(dict)
+    for sheet_name, records in excel_data.items():
+        for item_id, record in records.items():
+            sheets_by_id[item_id][sheet_name] = record
+
+    edits = defaultdict(list)
+    conflicts = 0
+    for item_id, sheet_records in sheets_by_id.items():
+        merged = merge_sheet_records(sheet_records, fields)
+        if merged is None:
+            conflicts += 1
+            print(f"Конфликт: id {item_id} встречается на листах {', '.join(sheet_records)} с разными значениями.")
+        locations = id_index.lookup(item_id)
+        if not locations and merged:
+            print(f"Пропуск: id {item_id} с листа {', '.join(sheet_records)} не найден в {id_index.base_path}.")
+        for relative_path, position in locations:
+            record = sheet_records.get(folder_of(relative_path), merged)
+            if record is None:
+                print(f"Пропуск: id {item_id} в {relative_path} — конфликт листов, а листа {folder_of(relative_path)} нет.")
+            elif changes_entry(id_index, relative_path, position, record, fields):
+                edits[relative_path].append((position, item_id, record))
+    return edits, conflicts
+
+def apply_edits(id_index, edits, fields, updated):
+    """Открывает только файлы с правками, переносит в них поля и выдаёт (путь, данные) изменённых файлов.
+
+    В updated записываются хеши полей изменённых файлов для обновления индекса.
+    """
+    paths = {id_index.full_path(relative_path): relative_path for relative_path in sorted(edits)}
+    for json_file, data in iter_json_files(list(paths)):
+        try:
+            modified = False
+            for position, item_id, record in edits[paths[json_file]]:
+                item = data[position] if isinstance(data, list) and position < len(data) else None
+                if not isinstance(item, dict) or item.get('id') != item_id:
+                    print(f"Предупреждение: Индекс устарел — в {json_file} нет id {item_id} на позиции {position}. Пропускаем.")
                     continue
+                if update_item(item, record, json_file, fields):
+                    modified = True
+
+            # Сохраняем файл, если были изменения
+            if modified:
+                updated[json_file] = entry_hashes(data)
+                yield json_file, data
 
-                modified = False
-                # Обновляем каждую запись
-                for item in data:
-                    if 'id' not in item:
-                        print(f"Предупреждение: Запись в {json_file} не содержит 'id'. Пропускаем.")
-                        continue
-                    item_id = item['id']
-                    # Проверяем, пустое ли en_voice (или отсутствует)
-                    if item.get('en_voice', '') == '':
-                        # Ищем id в таблице
-                        if item_id in id_to_en_voice:
-                            new_en_voice = id_to_en_voice[item_id]
-                            if new_en_voice:  # Убедимся, что en_voice не пустое
-                                item['en_voice'] = new_en_voice
-                                modified = True
-                                print(f"Обновлено en_voice для id {item_id} в {json_file}: {new_en_voice}")
-                            else:
-                                print(f"Пропуск: en_voice для id {item_id} в таблице пустое.")
-                        else:
-                            print(f"Пропуск: id {item_id} не найден в листе {folder_name}.")
-                    else:
-                        print(f"Пропуск: en_voice для id {item_id} в {json_file} уже заполнено.")
-
-                # Сохраняем файл, если были изменения
-                if modified:
-                    with open(json_file, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=4)
-                    print(f"Сохранён обновлённый файл {json_file}")
-            
-            except Exception as e:
-                print(f"Ошибка при обработке файла {json_file}: {e}")
+        except Exception as e:
+            print(f"Ошибка при обработке файла {json_file}: {e}")
+
+def update_item(item, record, json_file, fields):
+    """Переносит поля fields из записи таблицы в запись JSON; возвращает True, если запись изменена."""
+    item_id = item['id']
+    modified = False
+    for field in fields:
+        new_value = record.get(field, "")
+        if field == "en_voice":
+            # Проверяем, пустое ли en_voice (или отсутствует)
+            if item.get('en_voice', '') != '':
+                print(f"Пропуск: en_voice для id {item_id} в {json_file} уже заполнено.")
+            elif not new_value:  # Убедимся, что en_voice не пустое
+                print(f"Пропуск: en_voice для id {item_id} в таблице пустое.")
+            else:
+                item['en_voice'] = new_value
+                modified = True
+                print(f"Обновлено en_voice для id {item_id} в {json_file}: {new_value}")
+        elif new_value and new_value != str(item.get(field, "")).strip():
+            item[field] = new_value
+            modified = True
+            print(f"Обновлено {field} для id {item_id} в {json_file}: {new_value}")
+    return modified
 
 def main():
+    parser = argparse.ArgumentParser(description="Переносит правки из nier_subtitles.xlsx в nier_text_json.")
+    parser.add_argument("--fields", nargs="+", choices=EXCEL_FIELDS, default=["en_voice"],
+                        help="какие поля переносить (по умолчанию только en_voice)")
+    parser.add_argument("--no-index", action="store_true",
+                        help=f"не сохранять индекс id в {INDEX_FILE_NAME}, а строить его заново")
+    args = parser.parse_args()
+
     # Путь к Excel-файлу (в той же директории, что и скрипт)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     excel_file = os.path.join(script_dir, "nier_subtitles.xlsx")
@@ -122,7 +256,8 @@ def main():
         return
     
     # Запускаем обновление
-    update_json_files(excel_file, base_path)
+    index_path = None if args.no_index else os.path.join(script_dir, INDEX_FILE_NAME)
+    update_json_files(excel_file, base_path, args.fields, index_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,142 @@
+import argparse
+import os
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from corpus_io import iter_json_files, list_json_files, write_json_files
+from voice_index import VoiceIndex
+
+# Папка кэша нормализованного аудиокорпуса, рядом с nier_audio_json
+CACHE_DIR_NAME = "voice_index_cache"
+# Японские знаки препинания, которые не входят в string.punctuation
+JAPANESE_PUNCTUATION = "。、！？…「」『』（）［］｛｝〈〉《》【】・"
+
+def clean_text_en(text):
+    """Очищает текст: удаляет пробелы, знаки пунктуации и приводит к нижнему регистру."""
+    translator = str.maketrans("", "", string.punctuation)
+    return text.strip().lower().translate(translator)
+
+def clean_text_jp(text):
+    """Очищает текст: удаляет пробелы, знаки пунктуации (включая японские) и приводит к нижнему регистру."""
+    translator = str.maketrans("", "", string.punctuation + JAPANESE_PUNCTUATION)
+    return text.strip().lower().translate(translator)
+
+# Языки озвучки: поле с текстом в nier_text_json -> папка в nier_audio_json и нормализация текста.
+# Чтобы связывать ещё один язык, достаточно добавить сюда запись; поле озвучки называется <язык>_voice.
+LANGUAGES = {
+    "en": {"folder": "stream/English(US)", "clean_text": clean_text_en},
+    "jp": {"folder": "stream/Japanese", "clean_text": clean_text_jp},
+}
+
+def build_voice_indexes(audio_path, languages, cache_dir=None):
+    """Строит VoiceIndex для каждого языка по его папке в audio_path, параллельно.
+
+    С cache_dir у каждого языка свой файл кэша, и заново читаются только
+    изменившиеся аудио-JSON.
+    """
+    with ThreadPoolExecutor(max_workers=len(languages) or 1) as executor:
+        futures = {lang: executor.submit(VoiceIndex, audio_path, LANGUAGES[lang]["clean_text"],
+                                         LANGUAGES[lang]["folder"],
+                                         os.path.join(cache_dir, f"{lang}.pickle") if cache_dir else None)
+                   for lang in languages}
+        return {lang: future.result() for lang, future in futures.items()}
+
+def link_item(item, json_file, lang, voice_index, fuzzy_threshold=None):
+    """Заполняет <lang>_voice одной записи, если оно пустое; возвращает True, если запись изменена."""
+    item_id = item['id']
+    voice_field = f"{lang}_voice"
+    # Проверяем, пустое ли поле озвучки (или отсутствует)
+    if item.get(voice_field, '') != '':
+        print(f"Пропуск: {voice_field} для id {item_id} в {json_file} уже заполнено.")
+        return False
+    if lang not in item:
+        print(f"Пропуск: id {item_id} в {json_file} не содержит '{lang}'.")
+        return False
+
+    phrase = item[lang]
+    # Ищем совпадения в nier_audio_json
+    matches = voice_index.lookup(phrase)
+    if len(matches) == 0 and fuzzy_threshold is not None:
+        fuzzy_matches, score = voice_index.fuzzy_lookup(phrase, fuzzy_threshold)
+        if len(fuzzy_matches) == 1:
+            item[voice_field] = fuzzy_matches[0]
+            item[f"{voice_field}_confidence"] = round(score, 3)
+            print(f"Обновлено {voice_field} (нечётко, {score:.2f}) для id {item_id} в {json_file}: {fuzzy_matches[0]}")
+            return True
+    if len(matches) == 0:
+        print(f"Пропуск: Для id {item_id} в {json_file} не найдено совпадений для фразы '{phrase}'.")
+    elif len(matches) > 1:
+        print(f"Пропуск: Для id {item_id} в {json_file} найдено {len(matches)} совпадений для фразы '{phrase}'.")
+    else:
+        # Найдено ровно одно совпадение
+        item[voice_field] = matches[0]
+        print(f"Обновлено {voice_field} для id {item_id} в {json_file}: {matches[0]}")
+        return True
+    return False
+
+def link_voices(text_path, audio_path, languages=tuple(LANGUAGES), fuzzy_threshold=None, cache_dir=None):
+    """Заполняет <lang>_voice для всех languages в JSON-файлах text_path за один проход.
+
+    Каждый файл читается и (при изменениях) записывается один раз, сколько бы
+    языков ни связывалось. Возвращает количество перезаписанных файлов.
+    """
+    voice_indexes = build_voice_indexes(audio_path, languages, cache_dir)
+
+    def linked_files():
+        for json_file, data in iter_json_files(list_json_files(text_path)):
+            try:
+                if not isinstance(data, list):
+                    print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
+                    continue
+
+                modified = False
+                for item in data:
+                    if 'id' not in item:
+                        print(f"Предупреждение: Запись в {json_file} не содержит 'id'. Пропускаем.")
+                        continue
+                    for lang in languages:
+                        if link_item(item, json_file, lang, voice_indexes[lang], fuzzy_threshold):
+                            modified = True
+
+                # Сохраняем файл, если были изменения
+                if modified:
+                    yield json_file, data
+
+            except Exception as e:
+                print(f"Ошибка при обработке файла {json_file}: {e}")
+
+    saved = write_json_files(linked_files())
+    for json_file in saved:
+        print(f"Сохранён обновлённый файл {json_file}")
+    return len(saved)
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполняет <язык>_voice по совпадению текста с nier_audio_json "
+                                                 "для всех языков за один проход.")
+    parser.add_argument("--lang", nargs="+", choices=sorted(LANGUAGES), default=sorted(LANGUAGES),
+                        help="языки для связывания (по умолчанию все)")
+    parser.add_argument("--fuzzy", type=float, nargs="?", const=0.9, metavar="ПОРОГ",
+                        help="искать фразы без точного совпадения нечётко, с порогом похожести (по умолчанию 0.9)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"не использовать кэш аудиокорпуса в папке {CACHE_DIR_NAME}")
+    args = parser.parse_args()
+
+    # Путь к папкам (в той же директории, что и скрипт)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    text_path = os.path.join(script_dir, "nier_text_json")
+    audio_path = os.path.join(script_dir, "nier_audio_json")
+
+    # Проверяем существование папок
+    if not os.path.exists(text_path):
+        print(f"Ошибка: Папка {text_path} не найдена.")
+        return
+    if not os.path.exists(audio_path):
+        print(f"Ошибка: Папка {audio_path} не найдена.")
+        return
+
+    cache_dir = None if args.no_cache else os.path.join(script_dir, CACHE_DIR_NAME)
+    saved = link_voices(text_path, audio_path, args.lang, args.fuzzy, cache_dir)
+    print(f"Готово: обновлено файлов: {saved}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import string
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+
+# Версия формата кэша; при несовместимых изменениях формата кэш перестраивается
+CACHE_VERSION = 1
+# Строка для проверки правил нормализации: если clean_text меняет результат на ней, кэш устаревает
+RULES_PROBE = string.printable + "ÀÉßàéœ «»“”‘’—–…。、！？「」『』（）［］｛｝〈〉《》【】・ＡＺａｚ０９　"
+
+# Длина символьных n-грамм для нечёткого поиска
+NGRAM_SIZE = 3
+# Сколько кандидатов отбирается по n-граммам перед точной оценкой похожести
+FUZZY_CANDIDATES = 30
+# n-граммы, встречающиеся чаще, чем в этой доле строк, не используются для отбора кандидатов
+COMMON_NGRAM_SHARE = 0.05
+
+class VoiceIndex:
+    """Индекс аудиокорпуса: нормализованный текст -> список путей к wav.
+
+    Строится один раз за запуск, после чего поиск фразы — одно обращение к словарю
+    вместо повторного чтения всех JSON-файлов в audio_path.
+    """
+
+    def __init__(self, audio_path, clean_text, subdir=None, cache_path=None):
+        self.audio_path = audio_path
+        self.clean_text = clean_text
+        self.phrases = defaultdict(list)
+        # Сколько файлов пришлось прочитать заново (а не взять из кэша)
+        self.reloaded = 0
+        # subdir ограничивает индекс одной папкой (например, языком), пути к wav остаются относительно audio_path
+        root = Path(audio_path, subdir) if subdir else Path(audio_path)
+        rules = rules_fingerprint(clean_text)
+        cached_files = load_cache(cache_path, rules) if cache_path else {}
+        files = {}
+        for json_file in sorted(root.rglob("*.json")):
+            relative_path = os.path.relpath(json_file, self.audio_path).replace('\\', '/')
+            stat = json_file.stat()
+            record = cached_files.get(relative_path)
+            if record is None or record["size"] != stat.st_size or record["mtime_ns"] != stat.st_mtime_ns:
+                lines = self.read_file(json_file)
+                self.reloaded += 1
+                if lines is None:
+                    continue
+                record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "lines": lines}
+            files[relative_path] = record
+            for text, wav_path in record["lines"]:
+                self.phrases[text].append(wav_path)
+
+        if cache_path and (self.reloaded or files.keys() != cached_files.keys()):
+            save_cache(cache_path, rules, files)
+
+    def read_file(self, json_file):
+        """Читает JSON-файл с аудиотекстом и возвращает список пар (нормализованный текст, путь к wav).
+
+        При ошибке чтения возвращает None, чтобы файл не попал в кэш и был прочитан снова.
+        """
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if not isinstance(data, list):
+                print(f"Предупреждение: Файл {json_file} не содержит список. Пропускаем.")
+                return []
+
+            # Формируем путь без audio_path и без .json в имени файла
+            relative_path = os.path.relpath(json_file, self.audio_path).replace('\\', '/')
+            base_path = os.path.splitext(relative_path)[0]
+            lines = []
+            for item in data:
+                if 'text' not in item or 'wav' not in item:
+                    print(f"Предупреждение: Запись в {json_file} не содержит 'text' или 'wav'. Пропускаем.")
+                    continue
+                lines.append((self.clean_text(item['text']), f"{base_path}/{item['wav']}"))
+            return lines
+
+        except Exception as e:
+            print(f"Ошибка при обработке файла {json_file}: {e}")
+            return None
+
+    def add_file(self, json_file):
+        """Добавляет в индекс все записи одного JSON-файла с аудиотекстом."""
+        for text, wav_path in self.read_file(json_file) or []:
+            self.phrases[text].append(wav_path)
+
+    def lookup(self, phrase):
+        """Возвращает список путей к wav, текст которых совпадает с фразой после нормализации."""
+        return self.phrases.get(self.clean_text(phrase), [])
+
+    def build_ngram_index(self):
+        """Строит индекс n-грамм -> номера нормализованных строк корпуса (один раз, при первом нечётком поиске)."""
+        self.texts = list(self.phrases)
+        self.ngrams = defaultdict(list)
+        for text_id, text in enumerate(self.texts):
+            for gram in set(ngrams(text)):
+                self.ngrams[gram].append(text_id)
+        self.common_limit = max(FUZZY_CANDIDATES, int(len(self.texts) * COMMON_NGRAM_SHARE))
+
+    def fuzzy_lookup(self, phrase, threshold):
+        """Ищет самую похожую строку корпуса и возвращает (пути к wav, оценка) или ([], оценка).
+
+        Кандидаты отбираются по общим редким n-граммам, поэтому оценивается лишь
+        несколько десятков строк, а не весь корпус. Совпадение засчитывается, если
+        оценка не ниже threshold и лучший кандидат однозначен.
+        """
+        if not hasattr(self, 'ngrams'):
+            self.build_ngram_index()
+        text = self.clean_text(phrase)
+        grams = set(ngrams(text))
+        postings = sorted((self.ngrams[gram] for gram in grams if gram in self.ngrams), key=len)
+        # Частые n-граммы почти ничего не говорят о строке; если редких нет, берём самые редкие из частых
+        rare = [ids for ids in postings if len(ids) <= self.common_limit] or postings[:3]
+        hits = Counter()
+        for ids in rare:
+            hits.update(ids)
+
+        # Индекс символов SequenceMatcher строится по seq2, поэтому фраза ставится туда один раз
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(text)
+        scored = []
+        for text_id, _ in hits.most_common(FUZZY_CANDIDATES):
+            candidate = self.texts[text_id]
+            if 2 * min(len(text), len(candidate)) < threshold * (len(text) + len(candidate)):
+                continue
+            matcher.set_seq1(candidate)
+            if matcher.quick_ratio() >= threshold:
+                scored.append((matcher.ratio(), text_id))
+        if not scored:
+            return [], 0.0
+        scored.sort(reverse=True)
+        best_score, best_id = scored[0]
+        if best_score < threshold or (len(scored) > 1 and scored[1][0] == best_score):
+            return [], best_score
+        return self.phrases[self.texts[best_id]], best_score
+
+def ngrams(text, size=NGRAM_SIZE):
+    """Возвращает символьные n-граммы текста; короткий текст — одна n-грамма целиком."""
+    if len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(len(text) - size + 1)]
+
+def rules_fingerprint(clean_text):
+    """Возвращает отпечаток правил нормализации: хеш исходного кода clean_text и её результата на RULES_PROBE."""
+    try:
+        source = inspect.getsource(clean_text)
+    except (OSError, TypeError):
+        source = getattr(clean_text, '__qualname__', repr(clean_text))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(source.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(clean_text(RULES_PROBE).encode('utf-8'))
+    return digest.hexdigest()
+
+def load_cache(cache_path, rules):
+    """Загружает кэш нормализованного корпуса: относительный путь -> {size, mtime_ns, lines}.
+
+    Отсутствующий, повреждённый, устаревший по формату или построенный с другими
+    правилами нормализации кэш считается пустым.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION or cache.get("rules") != rules:
+        return {}
+    return cache["files"]
+
+def save_cache(cache_path, rules, files):
+    """Записывает кэш атомарно, чтобы прерванный запуск оставил предыдущий."""
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump({"version": CACHE_VERSION, "rules": rules, "files": files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
@@ -0,0 +1,164 @@
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+# Индексы стилей ячеек в styles.xml
+STYLE_DEFAULT = 0
+STYLE_YELLOW = 1
+# Экранирование текста ячейки одним translate: спецсимволы XML заменяются сущностями,
+# а управляющие символы, запрещённые в XML 1.0 (их не принимают ни Excel, ни openpyxl), удаляются
+XML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;",
+                             **{chr(code): None for code in range(0x20) if code not in (0x09, 0x0A, 0x0D)}})
+
+CONTENT_TYPES_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+# Заливки: две обязательные (none и gray125) и жёлтая; стиль 1 — ячейка с жёлтой заливкой
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="3"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="00FFFF00"/><bgColor rgb="00FFFF00"/></patternFill></fill>'
+    '</fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="0" fillId="2" borderId="0" xfId="0" applyFill="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+# Сколько строк собирается в один блок перед записью в zip
+ROWS_PER_WRITE = 1000
+
+def column_letter(index):
+    """Возвращает буквенное имя столбца по индексу с нуля: 0 -> A, 26 -> AA."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+class XlsxSheet:
+    """Лист, который пишется потоком: строки копятся блоками и сразу уходят в zip."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.row = 0
+        self.buffer = []
+        self.columns = []
+        self.stream.write(SHEET_HEAD.encode('utf-8'))
+
+    def append(self, values, styles=None):
+        """Добавляет строку значений; styles — необязательный словарь {индекс столбца: индекс стиля}."""
+        self.row += 1
+        row = self.row
+        if len(values) > len(self.columns):
+            self.columns.extend(column_letter(i) for i in range(len(self.columns), len(values)))
+        cells = []
+        for index, value in enumerate(values):
+            style = f' s="{styles[index]}"' if styles and index in styles else ''
+            if value is None or value == "":
+                # Пустая ячейка пишется только ради стиля
+                if style:
+                    cells.append(f'<c r="{self.columns[index]}{row}"{style}/>')
+            elif isinstance(value, str):
+                cells.append(f'<c r="{self.columns[index]}{row}"{style} t="inlineStr"><is><t xml:space="preserve">'
+                             f'{value.translate(XML_ESCAPES)}</t></is></c>')
+            elif isinstance(value, bool):
+                cells.append(f'<c r="{self.columns[index]}{row}"{style} t="b"><v>{int(value)}</v></c>')
+            elif isinstance(value, (int, float)):
+                cells.append(f'<c r="{self.columns[index]}{row}"{style}><v>{value!r}</v></c>')
+            else:
+                cells.append(f'<c r="{self.columns[index]}{row}"{style} t="inlineStr"><is><t xml:space="preserve">'
+                             f'{str(value).translate(XML_ESCAPES)}</t></is></c>')
+        self.buffer.append(f'<row r="{row}">{"".join(cells)}</row>')
+        if len(self.buffer) >= ROWS_PER_WRITE:
+            self.flush()
+
+    def flush(self):
+        self.stream.write("".join(self.buffer).encode('utf-8'))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.stream.write(SHEET_TAIL.encode('utf-8'))
+        self.stream.close()
+
+class XlsxWriter:
+    """Минимальный потоковый писатель .xlsx без зависимостей.
+
+    Листы пишутся по одному прямо в zip-архив (открытие следующего листа
+    закрывает предыдущий), поэтому память не зависит от числа строк.
+    Поддерживаются строки, числа и одна жёлтая заливка (STYLE_YELLOW).
+    """
+
+    def __init__(self, path, compresslevel=1):
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self.titles = []
+        self.sheet = None
+
+    def create_sheet(self, title):
+        if self.sheet is not None:
+            self.sheet.close()
+        self.titles.append(title)
+        self.sheet = XlsxSheet(self.zip.open(f'xl/worksheets/sheet{len(self.titles)}.xml', 'w'))
+        return self.sheet
+
+    def close(self):
+        if self.sheet is not None:
+            self.sheet.close()
+            self.sheet = None
+        sheets = "".join(f'<sheet name={quoteattr(title)} sheetId="{i}" r:id="rId{i}"/>'
+                         for i, title in enumerate(self.titles, 1))
+        self.zip.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>'))
+        relationships = "".join(
+            f'<Relationship Id="rId{i}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(self.titles) + 1))
+        styles_id = len(self.titles) + 1
+        self.zip.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relationships}<Relationship Id="rId{styles_id}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/></Relationships>'))
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(self.titles) + 1))
+        self.zip.writestr('[Content_Types].xml', CONTENT_TYPES_HEAD + overrides + '</Types>')
+        self.zip.writestr('_rels/.rels', ROOT_RELS)
+        self.zip.writestr('xl/styles.xml', STYLES)
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
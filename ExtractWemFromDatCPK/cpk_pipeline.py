@@ -0,0 +1,136 @@
+import argparse
+import glob
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from extract_wem_from_dat import extract_wem_data, peak_rss_mb, print_summary
+
+# cpk_archive lives in UnPacker; main() puts it on the import path, library callers do it themselves
+UNPACKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "UnPacker")
+# Marks the end of the stream of unpacked files
+END_OF_STREAM = None
+
+def read_entry_job(job):
+    """Process pool entry point: reads and decompresses one (cpk_path, entry) job."""
+    from cpk_archive import read_entry
+    cpk_path, entry = job
+    return entry, read_entry(cpk_path, entry)
+
+def produce_entries(jobs, buffers, depth, executor, stop):
+    """Unpacks CPK entries in order and puts (entry, data) on the bounded buffers queue.
+
+    With an executor, at most depth entries are being decompressed at a time,
+    so together with the queue no more than 2 * depth unpacked files are held
+    in memory. Errors are passed to the consumer instead of being raised here;
+    setting stop ends production early.
+    """
+    try:
+        pending = deque()
+        for job in jobs:
+            if stop.is_set():
+                break
+            if executor is None:
+                buffers.put(read_entry_job(job))
+                continue
+            pending.append(executor.submit(read_entry_job, job))
+            if len(pending) >= depth:
+                buffers.put(pending.popleft().result())
+        while pending and not stop.is_set():
+            buffers.put(pending.popleft().result())
+    except Exception as e:
+        buffers.put(e)
+    buffers.put(END_OF_STREAM)
+
+def run_pipeline(cpk_paths, output_dir, keep_dir=None, depth=4, max_workers=1, scan_only=False, verbose=True):
+    """Streams CPK entries straight into the WEM extractor and returns the per-file results.
+
+    Each unpacked .dat is handed to the extractor in memory through a queue of
+    at most depth buffers, so WEMs are written once and the intermediate tree
+    is only written when keep_dir is given. cpk_archive (UnPacker) must be importable.
+    """
+    from cpk_archive import CpkArchive
+    jobs = []
+    for cpk_path in cpk_paths:
+        archive = CpkArchive(cpk_path)
+        if verbose:
+            print(f"Processing {cpk_path} ({len(archive.entries)} files)...")
+        jobs.extend((cpk_path, entry) for entry in archive.entries)
+
+    buffers = queue.Queue(maxsize=depth)
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_entries, args=(jobs, buffers, depth, executor, stop), daemon=True)
+    producer.start()
+
+    results = []
+    try:
+        while True:
+            item = buffers.get()
+            if item is END_OF_STREAM:
+                break
+            if isinstance(item, Exception):
+                raise item
+            entry, data = item
+            relative_dir, _, _ = entry["name"].rpartition('/')
+            if keep_dir is not None:
+                keep_path = os.path.join(keep_dir, *entry["name"].split('/'))
+                os.makedirs(os.path.dirname(keep_path), exist_ok=True)
+                with open(keep_path, 'wb') as out_f:
+                    out_f.write(data)
+            output_base_dir = os.path.join(output_dir, *relative_dir.split('/')) if relative_dir else output_dir
+            results.append(extract_wem_data(entry["name"], data, output_base_dir, verbose=False,
+                                            scan_only=scan_only))
+            if verbose:
+                print(f"Extracted {results[-1]['wem_count']} WEM files from {entry['name']}")
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        while producer.is_alive():
+            try:
+                buffers.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracts WEM files straight from CPK archives, "
+                                                 "without writing the unpacked .dat files.")
+    parser.add_argument("cpk", nargs="*", help="CPK files to process (default: all *.cpk in the current folder)")
+    parser.add_argument("--output", default="nier_unpacked_result",
+                        help="output folder for .wem files (default: nier_unpacked_result)")
+    parser.add_argument("--keep-unpacked", metavar="DIR",
+                        help="also write the unpacked .dat files to DIR, e.g. nier_unpacked")
+    parser.add_argument("--depth", type=int, default=4,
+                        help="unpacked files buffered between stages; caps peak memory (default: 4)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for CRILAYLA decompression (default: 1)")
+    parser.add_argument("--scan-only", action="store_true",
+                        help="ignore DAT file tables and only scan for RIFF signatures")
+    args = parser.parse_args()
+
+    # Process pool workers inherit the import path, so this also covers read_entry_job
+    sys.path.insert(0, UNPACKER_DIR)
+    cpk_paths = args.cpk or sorted(glob.glob("*.cpk"))
+    if not cpk_paths:
+        print("Error: no .cpk files found.")
+        return
+
+    start = time.perf_counter()
+    results = run_pipeline(cpk_paths, args.output, args.keep_unpacked, max(args.depth, 1), args.jobs,
+                           args.scan_only)
+    print_summary(results)
+    print(f"\nExtraction completed in {time.perf_counter() - start:.2f} s. "
+          f"Check {os.path.abspath(args.output)} for .wem files.")
+    peak_rss = peak_rss_mb()
+    if peak_rss is not None:
+        print(f"Peak memory usage: {peak_rss:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import struct
+
+DAT_MAGIC = b'DAT\x00'
+# magic, file count and the offsets of the file, extension, name, size and hash tables
+DAT_HEADER = struct.Struct('<4s6I')
+
+class DatArchive:
+    """Reader for NieR DAT/DTT archives based on their file table.
+
+    Layout: a header with table offsets, then a table of entry offsets, a table
+    of 4-byte extensions, a name table (name length followed by fixed-size
+    names) and a table of entry sizes. Parsing touches only the header and the
+    tables, so it is O(entries) regardless of payload size.
+
+    Raises ValueError if data does not look like a DAT archive.
+    """
+
+    def __init__(self, data, path=""):
+        self.data = data
+        self.path = path
+        self.entries = self.parse_entries(data)
+        self.by_name = {entry["name"]: entry for entry in self.entries}
+
+    @staticmethod
+    def parse_entries(data):
+        """Parses the header and file tables into a list of entry dicts."""
+        data_len = len(data)
+        if data_len < DAT_HEADER.size:
+            raise ValueError("file is too small for a DAT header")
+        (magic, file_count, offsets_pos, extensions_pos,
+         names_pos, sizes_pos, _hashes_pos) = DAT_HEADER.unpack_from(data, 0)
+        if magic != DAT_MAGIC:
+            raise ValueError("missing DAT magic")
+
+        def check_table(pos, length):
+            if pos + length > data_len:
+                raise ValueError("file table points past the end of the file")
+
+        check_table(offsets_pos, 4 * file_count)
+        check_table(extensions_pos, 4 * file_count)
+        check_table(sizes_pos, 4 * file_count)
+        check_table(names_pos, 4)
+        name_length = struct.unpack_from('<I', data, names_pos)[0]
+        check_table(names_pos + 4, name_length * file_count)
+
+        offsets = struct.unpack_from(f'<{file_count}I', data, offsets_pos)
+        sizes = struct.unpack_from(f'<{file_count}I', data, sizes_pos)
+        entries = []
+        for i in range(file_count):
+            name_pos = names_pos + 4 + i * name_length
+            name = bytes(data[name_pos:name_pos + name_length]).split(b'\x00', 1)[0].decode('ascii', 'replace')
+            extension_pos = extensions_pos + 4 * i
+            extension = bytes(data[extension_pos:extension_pos + 4]).split(b'\x00', 1)[0].decode('ascii', 'replace')
+            if offsets[i] + sizes[i] > data_len:
+                raise ValueError(f"entry {name} points past the end of the file")
+            entries.append({"name": name, "extension": extension.lower(),
+                            "offset": offsets[i], "size": sizes[i]})
+        return entries
+
+    def list(self):
+        """Returns the names of all entries in table order."""
+        return [entry["name"] for entry in self.entries]
+
+    def open(self, name):
+        """Returns the contents of an entry as a zero-copy memoryview."""
+        entry = self.by_name[name]
+        return memoryview(self.data)[entry["offset"]:entry["offset"] + entry["size"]]
+
+    def extract(self, name, output_dir, output_name=None):
+        """Writes an entry to output_dir under its own name (or output_name) and returns the path."""
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, output_name or name)
+        with self.open(name) as entry_data, open(output_file, 'wb') as out_f:
+            out_f.write(entry_data)
+        return output_file
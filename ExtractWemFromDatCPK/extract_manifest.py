@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "wem_manifest.json"
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_hash(file_path):
+    """Returns a BLAKE2b digest of a file, read in blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(output_dir):
+    """Loads the manifest of output_dir, or returns an empty one if it is missing or outdated."""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"version": MANIFEST_VERSION, "inputs": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "inputs": {}}
+    return manifest
+
+def save_manifest(output_dir, manifest):
+    """Writes the manifest atomically, so an interrupted run keeps the previous one."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def manifest_key(input_dir, file_path):
+    """Returns the manifest key of an input file: its path relative to input_dir with '/' separators."""
+    return os.path.relpath(file_path, input_dir).replace('\\', '/')
+
+def outputs_exist(output_root, record):
+    """Checks that every output file of a record is still on disk."""
+    output_dir = os.path.join(output_root, record["output_dir"])
+    return all(os.path.exists(os.path.join(output_dir, output["name"])) for output in record["outputs"])
+
+def is_unchanged(record, file_path, stat, options, output_root):
+    """Checks an input against its manifest record.
+
+    The record must have been extracted with the same options and its outputs
+    must still exist. Matching size and mtime are then trusted without reading
+    the file. If only the mtime differs the file is hashed, and the record's
+    mtime is refreshed when the contents turn out to be the same.
+    """
+    if record is None or record["size"] != stat.st_size or record.get("options") != options:
+        return False
+    if not outputs_exist(output_root, record):
+        return False
+    if record["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if file_hash(file_path) == record["hash"]:
+        record["mtime_ns"] = stat.st_mtime_ns
+        return True
+    return False
+
+def make_record(stat, result, output_root, options):
+    """Builds the manifest record of an input from its stat, extraction result and extraction options."""
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": result["hash"],
+        "options": options,
+        "output_dir": os.path.relpath(result["output_dir"], output_root).replace('\\', '/'),
+        "outputs": result["outputs"],
+    }
+
+def prune_outputs(output_root, record):
+    """Removes the files written for a manifest record and its directory once it is empty."""
+    output_dir = os.path.join(output_root, record["output_dir"])
+    for output in record["outputs"]:
+        output_file = os.path.join(output_dir, output["name"])
+        if os.path.exists(output_file):
+            os.remove(output_file)
+    if os.path.isdir(output_dir) and not os.listdir(output_dir):
+        os.rmdir(output_dir)
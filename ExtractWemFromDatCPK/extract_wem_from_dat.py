@@ -1,8 +1,30 @@
+import argparse
+import mmap
 import os
+import re
+import shutil
 import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dat_archive import DAT_MAGIC, DatArchive
+from extract_manifest import (file_hash, is_unchanged, load_manifest, make_record,
+                              manifest_key, prune_outputs, save_manifest)
+from wem_store import STORE_DIR_NAME, collect_garbage, link_to_store
+
+RIFF_WAVE_PATTERN = re.compile(rb'RIFF.{4}WAVEfmt ', re.DOTALL)
+# DAT entries written as-is, and entries that are scanned for embedded WEMs
+DIRECT_EXTENSIONS = ("wem", "wai")
+CONTAINER_EXTENSIONS = ("wsp", "bnk")
 
 def find_riff_signature(file_data, start_pos=0):
     """Finds the RIFF signature in binary data."""
+    match = RIFF_WAVE_PATTERN.search(file_data, start_pos)
+    return match.start() if match else -1
+
+def find_riff_signature_bytewise(file_data, start_pos=0):
+    """Original byte-by-byte RIFF search, kept as a reference for --benchmark."""
     riff_signature = b'RIFF'
     wave_signature = b'WAVEfmt '
     while start_pos < len(file_data) - 12:
@@ -12,48 +34,357 @@ def find_riff_signature(file_data, start_pos=0):
         start_pos += 1
     return -1
 
-def extract_wem_file(file_path, output_base_dir):
-    """Extracts WEM files from a file based on RIFF signature."""
+def iter_riff_chunks(file_data):
+    """Yields (offset, size) of every RIFF/WAVE chunk in one pass over file_data.
+
+    Chunks are non-overlapping: a signature inside an already found chunk is
+    skipped, exactly like the original sequential search did.
+    """
+    data_len = len(file_data)
+    next_pos = 0
+    for match in RIFF_WAVE_PATTERN.finditer(file_data):
+        pos = match.start()
+        if pos < next_pos:
+            continue
+        chunk_size = struct.unpack_from('<I', file_data, pos + 4)[0]
+        end_pos = min(pos + 8 + chunk_size, data_len)
+        yield pos, end_pos - pos
+        next_pos = end_pos
+
+def scan_riff_chunks(file_data):
+    """Finds all RIFF/WAVE chunks in one pass and returns a list of (offset, size)."""
+    return list(iter_riff_chunks(file_data))
+
+# Pages of a mapping are released in steps of this many bytes
+RELEASE_STEP = 8 * 1024 * 1024
+
+def release_pages(mapped, start, end):
+    """Drops pages of a read-only mapping in [start, end) from the resident set.
+
+    The range is extended one RELEASE_STEP back because the kernel maps
+    neighbouring pages in around every page fault.
+    """
+    if not hasattr(mapped, 'madvise') or not hasattr(mmap, 'MADV_DONTNEED'):
+        return
+    start = max(0, start - RELEASE_STEP)
+    start -= start % mmap.PAGESIZE
+    if end > start:
+        mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+def write_output(output_dir, output_name, data, result, store_dir=None):
+    """Writes one extracted file and returns its path and manifest record.
+
+    With store_dir the payload goes to the deduplication store and the output
+    becomes a hardlink to it.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, output_name)
+    output = {"name": output_name, "size": len(data)}
+    if store_dir is None:
+        with open(output_file, 'wb') as out_f:
+            out_f.write(data)
+        return output_file, output
+
+    digest, stored, linked = link_to_store(store_dir, output_file, data)
+    output["hash"] = digest
+    if stored:
+        result["stored_bytes"] += len(data)
+    else:
+        result["deduplicated_bytes"] += len(data)
+    warning = f"Warning: Hardlinks are not supported in {output_dir}, writing copies."
+    if not linked and warning not in result["warnings"]:
+        result["warnings"].append(warning)
+    return output_file, output
+
+def write_wem_chunks(file_path, file_data, output_dir, result, mapped=None, verbose=True,
+                     name_prefix="", base_offset=0, store_dir=None):
+    """Writes every RIFF/WAVE chunk of file_data to output_dir as {name_prefix}N.wem and records them in result.
+
+    When mapped is the mmap behind file_data, chunks are written from memoryview
+    slices and pages are released as soon as the scan has passed them.
+    base_offset is the position of file_data in the input file.
+    """
+    released = 0
+    for index, (pos, size) in enumerate(iter_riff_chunks(file_data)):
+        # Chunk size (4 bytes after RIFF) is clipped by the scanner at end of file
+        chunk_size = struct.unpack_from('<I', file_data, pos + 4)[0]
+        if size < 8 + chunk_size:
+            warning = f"Warning: Chunk size exceeds file length in {file_path} at pos {pos}, adjusting to end."
+            result["warnings"].append(warning)
+            if verbose:
+                print(warning)
+
+        # Extract the chunk
+        wem_data = file_data[pos:pos + size]
+        output_file, output = write_output(output_dir, f"{name_prefix}{index}.wem", wem_data, result, store_dir)
+
+        if verbose:
+            print(f"Extracted {output_file} (size: {len(wem_data)} bytes)")
+        result["wem_count"] += 1
+        result["bytes"] += size
+        output["offset"] = base_offset + pos
+        result["outputs"].append(output)
+        if mapped is not None:
+            wem_data.release()
+            if pos + size - released >= RELEASE_STEP:
+                release_pages(mapped, released, pos + size)
+                released = pos + size
+
+def write_dat_entries(archive, output_dir, result, verbose=True, store_dir=None):
+    """Writes the audio entries of a DatArchive to output_dir using the file table.
+
+    WEM and WAI entries are written as-is under their own names. WSP and BNK
+    entries are containers of WEMs without a table of their own, so only the
+    entry itself is scanned and its WEMs are written as {entry}_N.wem.
+    """
+    for entry in archive.entries:
+        name = entry["name"]
+        if entry["extension"] in DIRECT_EXTENSIONS:
+            with archive.open(name) as entry_data:
+                output_file, output = write_output(output_dir, name, entry_data, result, store_dir)
+            if verbose:
+                print(f"Extracted {output_file} (size: {entry['size']} bytes)")
+            output["offset"] = entry["offset"]
+            result["outputs"].append(output)
+            if entry["extension"] == "wem":
+                result["wem_count"] += 1
+                result["bytes"] += entry["size"]
+        elif entry["extension"] in CONTAINER_EXTENSIONS:
+            with archive.open(name) as entry_data:
+                write_wem_chunks(f"{archive.path}:{name}", entry_data, output_dir, result,
+                                 verbose=verbose, name_prefix=f"{os.path.splitext(name)[0]}_",
+                                 base_offset=entry["offset"], store_dir=store_dir)
+
+def extract_wem_data(file_path, file_data, output_base_dir, mapped=None, verbose=True, scan_only=False,
+                     store_dir=None):
+    """Extracts WEM files from the contents of one input file, using its DAT file table when it has one.
+
+    Inputs that are not DAT archives, or whose table cannot be parsed, fall
+    back to the RIFF signature scanner; scan_only forces the scanner. mapped is
+    the mmap behind file_data, if any. With store_dir outputs are hardlinks
+    into a content-addressed store. Returns a dict with the number of
+    extracted WEMs, their total size, the written outputs and any warnings.
+    """
     file_name = os.path.basename(file_path)
     output_dir = os.path.join(output_base_dir, file_name)
-    wem_extracted = False
+    result = {"file": file_path, "output_dir": output_dir, "wem_count": 0, "bytes": 0,
+              "stored_bytes": 0, "deduplicated_bytes": 0, "outputs": [], "warnings": []}
+
+    archive = None
+    if not scan_only and bytes(file_data[:len(DAT_MAGIC)]) == DAT_MAGIC:
+        try:
+            archive = DatArchive(file_data, file_path)
+        except ValueError as e:
+            warning = f"Warning: Cannot parse DAT table of {file_path} ({e}), scanning for RIFF signatures."
+            result["warnings"].append(warning)
+            if verbose:
+                print(warning)
 
+    if archive is not None:
+        write_dat_entries(archive, output_dir, result, verbose, store_dir)
+    else:
+        write_wem_chunks(file_path, file_data, output_dir, result, mapped, verbose, store_dir=store_dir)
+
+    # Remove directory if nothing was extracted (WAI entries count as outputs too)
+    if not result["outputs"] and os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    return result
+
+def extract_wem_file(file_path, output_base_dir, use_mmap=False, verbose=True, scan_only=False,
+                     store_dir=None):
+    """Extracts WEM files from a file, see extract_wem_data.
+
+    With use_mmap the input is mapped instead of read, so memory use does not
+    grow with the size of the .dat file.
+    """
     with open(file_path, 'rb') as f:
+        # Empty files cannot be mapped
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as file_data:
+                    return extract_wem_data(file_path, file_data, output_base_dir, mapped, verbose,
+                                            scan_only, store_dir)
         file_data = f.read()
+    return extract_wem_data(file_path, file_data, output_base_dir, verbose=verbose, scan_only=scan_only,
+                            store_dir=store_dir)
 
-    pos = 0
-    file_count = 0
-    while True:
-        pos = find_riff_signature(file_data, pos)
-        if pos == -1:
-            break
+def extract_wem_job(job, verbose=False):
+    """Extracts one (file_path, output_base_dir, use_mmap, scan_only, store_dir) job and hashes its input.
 
-        # Read chunk size (4 bytes after RIFF)
-        chunk_size = struct.unpack('<I', file_data[pos + 4:pos + 8])[0]
-        end_pos = pos + 8 + chunk_size
+    This is also the process pool entry point, where it runs quietly.
+    """
+    file_path, output_base_dir, use_mmap, scan_only, store_dir = job
+    result = extract_wem_file(file_path, output_base_dir, use_mmap, verbose=verbose, scan_only=scan_only,
+                              store_dir=store_dir)
+    result["hash"] = file_hash(file_path)
+    return result
 
-        if end_pos > len(file_data):
-            print(f"Warning: Chunk size exceeds file length in {file_path} at pos {pos}, adjusting to end.")
-            end_pos = len(file_data)
+def extract_parallel(jobs, max_workers):
+    """Runs extraction jobs on a process pool, largest input files first.
 
-        # Extract the chunk
-        wem_data = file_data[pos:end_pos]
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        output_file = os.path.join(output_dir, f"{file_count}.wem")
-        with open(output_file, 'wb') as out_f:
-            out_f.write(wem_data)
+    Results are returned in the order of jobs, not in completion order.
+    """
+    schedule = sorted(range(len(jobs)), key=lambda i: os.path.getsize(jobs[i][0]), reverse=True)
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(extract_wem_job, jobs[i]): i for i in schedule}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
 
-        print(f"Extracted {output_file} (size: {len(wem_data)} bytes)")
-        file_count += 1
-        pos = end_pos
-        wem_extracted = True
+def print_summary(results):
+    """Prints one line per input file with extracted WEMs, followed by totals."""
+    print("\nSummary:")
+    for result in results:
+        if result["wem_count"]:
+            print(f"{result['file']}: {result['wem_count']} WEM files ({result['bytes']} bytes)")
+        for warning in result["warnings"]:
+            print(f"  {warning}")
+    total_count = sum(result["wem_count"] for result in results)
+    total_bytes = sum(result["bytes"] for result in results)
+    warning_count = sum(len(result["warnings"]) for result in results)
+    print(f"Total: {total_count} WEM files ({total_bytes} bytes) from {len(results)} files, {warning_count} warnings")
 
-    # Remove directory if no WEM files were extracted
-    if not wem_extracted and os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
+def print_dedup_report(results, store_dir, referenced):
+    """Prints how much disk space and write I/O the deduplication store saved, after dropping payloads no manifest record refers to."""
+    stored_bytes = sum(result["stored_bytes"] for result in results)
+    deduplicated_bytes = sum(result["deduplicated_bytes"] for result in results)
+    removed_count, removed_bytes = collect_garbage(store_dir, referenced)
+    print(f"\nDeduplication: wrote {stored_bytes} bytes of new payloads, "
+          f"linked {deduplicated_bytes} bytes of duplicates without writing them.")
+    if removed_count:
+        print(f"Removed {removed_count} unused payloads ({removed_bytes} bytes) from {store_dir}")
+
+def peak_rss_mb():
+    """Returns peak resident set size of this process or its largest worker in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def iter_input_files(input_dir):
+    """Yields (file_path, relative_dir) for every file under input_dir in sorted order."""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.join(root, file), os.path.relpath(root, input_dir)
+
+def benchmark_scanner(input_dir):
+    """Compares the byte-by-byte search against scan_riff_chunks on input_dir."""
+    total_bytes = 0
+    bytewise_time = 0.0
+    scanner_time = 0.0
+    for file_path, _ in iter_input_files(input_dir):
+        with open(file_path, 'rb') as f:
+            file_data = f.read()
+        total_bytes += len(file_data)
+
+        start = time.perf_counter()
+        bytewise_chunks = []
+        pos = find_riff_signature_bytewise(file_data)
+        while pos != -1:
+            chunk_size = struct.unpack_from('<I', file_data, pos + 4)[0]
+            end_pos = min(pos + 8 + chunk_size, len(file_data))
+            bytewise_chunks.append((pos, end_pos - pos))
+            pos = find_riff_signature_bytewise(file_data, end_pos)
+        bytewise_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunks = scan_riff_chunks(file_data)
+        scanner_time += time.perf_counter() - start
+
+        if chunks != bytewise_chunks:
+            print(f"Warning: Scanner results differ from byte-by-byte search in {file_path}")
+
+    mb = total_bytes / (1024 * 1024)
+    print(f"Scanned {mb:.1f} MB")
+    print(f"Byte-by-byte search: {bytewise_time:.2f} s ({mb / max(bytewise_time, 1e-9):.1f} MB/s)")
+    print(f"scan_riff_chunks:    {scanner_time:.2f} s ({mb / max(scanner_time, 1e-9):.1f} MB/s)")
+
+def extract_tree(input_dir, output_dir, max_workers=1, use_mmap=False, scan_only=False, dedup=False, force=False):
+    """Extracts WEMs from every file under input_dir into output_dir and returns the extraction results.
+
+    Inputs recorded as unchanged in the manifest (same contents and options, outputs
+    still on disk) are skipped and outputs of deleted inputs are pruned, so only
+    new or changed files are processed.
+    """
+    # Skip inputs recorded as unchanged in the manifest and prune outputs of deleted ones
+    manifest = load_manifest(output_dir)
+    store_dir = os.path.join(output_dir, STORE_DIR_NAME) if dedup else None
+    records = manifest["inputs"]
+    # Options that change what is written; records extracted with other options are redone
+    options = {"scan_only": scan_only, "dedup": dedup}
+    seen = set()
+    stats = {}
+    jobs = []
+    skipped = 0
+    for file_path, relative_path in iter_input_files(input_dir):
+        key = manifest_key(input_dir, file_path)
+        seen.add(key)
+        stat = os.stat(file_path)
+        if not force and is_unchanged(records.get(key), file_path, stat, options, output_dir):
+            skipped += 1
+            continue
+        if key in records:
+            prune_outputs(output_dir, records.pop(key))
+        stats[file_path] = stat
+        jobs.append((file_path, os.path.join(output_dir, relative_path), use_mmap, scan_only, store_dir))
+    for key in sorted(set(records) - seen):
+        print(f"Removing outputs of deleted input {key}")
+        prune_outputs(output_dir, records.pop(key))
+    if skipped:
+        print(f"Skipping {skipped} unchanged files")
+
+    # Process changed files
+    if max_workers > 1 and jobs:
+        print(f"Processing {len(jobs)} files with {max_workers} workers...")
+        results = extract_parallel(jobs, max_workers)
+        print_summary(results)
+    else:
+        results = []
+        for job in jobs:
+            print(f"Processing {job[0]}")
+            results.append(extract_wem_job(job, verbose=True))
+
+    for result in results:
+        records[manifest_key(input_dir, result["file"])] = make_record(stats[result["file"]], result, output_dir, options)
+    save_manifest(output_dir, manifest)
+
+    # Payloads stay in the store while any manifest record still refers to them; after a run
+    # without --dedup none does, so a store left by earlier runs is removed too
+    referenced = {output["hash"] for record in records.values() for output in record["outputs"] if "hash" in output}
+    if dedup:
+        print_dedup_report(results, store_dir, referenced)
+    elif os.path.isdir(os.path.join(output_dir, STORE_DIR_NAME)):
+        stale_store = os.path.join(output_dir, STORE_DIR_NAME)
+        removed_count, removed_bytes = collect_garbage(stale_store, referenced)
+        if removed_count:
+            print(f"\nRemoved {removed_count} payloads ({removed_bytes} bytes) of an earlier --dedup run from {stale_store}")
+        if not os.listdir(stale_store):
+            os.rmdir(stale_store)
+
+    return results
 
 def main():
+    parser = argparse.ArgumentParser(description="Extracts WEM files from unpacked NieR .dat files.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare the RIFF scanner with the byte-by-byte search instead of extracting")
+    parser.add_argument("--mmap", action="store_true",
+                        help="map input files instead of reading them into memory")
+    parser.add_argument("--scan-only", action="store_true",
+                        help="ignore DAT file tables and only scan for RIFF signatures")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of worker processes (default: 1, extract serially)")
+    parser.add_argument("--dedup", action="store_true",
+                        help=f"store each unique WEM once under {STORE_DIR_NAME} and hardlink it into archive folders")
+    parser.add_argument("--force", action="store_true",
+                        help="re-extract all inputs even if the manifest says they are unchanged")
+    args = parser.parse_args()
+
     # Define input and output directories
     input_dir = "nier_unpacked"
     output_dir = "nier_unpacked_result"
@@ -62,19 +393,17 @@ def main():
         print(f"Error: {input_dir} not found.")
         return
 
-    # Process all files in input directory
-    for root, _, files in os.walk(input_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(root, input_dir)
-            output_base_dir = os.path.join(output_dir, relative_path)
+    if args.benchmark:
+        benchmark_scanner(input_dir)
+        return
 
-            print(f"Processing {file_path}")
-            extract_wem_file(file_path, output_base_dir)
+    extract_tree(input_dir, output_dir, args.jobs, args.mmap, args.scan_only, args.dedup, args.force)
 
     print(f"\nExtraction completed. Check {os.path.abspath(output_dir)} for .wem files.")
+    peak_rss = peak_rss_mb()
+    if peak_rss is not None:
+        print(f"Peak memory usage: {peak_rss:.1f} MB")
     input("\nPress Enter to exit...")
 
 if __name__ == "__main__":
-    import shutil  # Added for rmtree
     main()
\ No newline at end of file
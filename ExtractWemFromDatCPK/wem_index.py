@@ -0,0 +1,213 @@
+import argparse
+import os
+import sqlite3
+import struct
+import time
+
+from extract_manifest import load_manifest
+from wem_store import STORE_DIR_NAME
+
+INDEX_NAME = "wem_index.sqlite"
+
+# fmt format tags used by Wwise
+CODECS = {
+    0x0001: "pcm",
+    0x0002: "adpcm",
+    0xFFFE: "pcm",
+    0xFFFF: "vorbis",
+}
+# Wwise IMA ADPCM stores 64 samples per 0x24-byte block and channel
+ADPCM_SAMPLES_PER_BLOCK = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wem (
+    path TEXT PRIMARY KEY,
+    archive TEXT,
+    grp TEXT,
+    offset INTEGER,
+    size INTEGER,
+    codec TEXT,
+    channels INTEGER,
+    sample_rate INTEGER,
+    sample_count INTEGER,
+    duration REAL,
+    cue_count INTEGER,
+    loop_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS wem_format ON wem (grp, sample_rate, channels, duration);
+CREATE INDEX IF NOT EXISTS wem_archive ON wem (archive);
+"""
+
+def parse_wem_header(file_path):
+    """Reads the RIFF chunk headers of a WEM and returns its audio metadata as a dict.
+
+    Only the small fmt, vorb, cue and smpl chunks are read; the data chunk is
+    skipped with a seek. Raises ValueError for files that are not RIFF/WAVE.
+    """
+    info = {"codec": "unknown", "channels": 0, "sample_rate": 0, "sample_count": None,
+            "duration": None, "cue_count": 0, "loop_count": 0}
+    fmt = None
+    vorb = None
+    data_size = 0
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError("not a RIFF/WAVE file")
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 12
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            chunk_id, chunk_size = struct.unpack('<4sI', f.read(8))
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+            elif chunk_id == b'vorb':
+                vorb = f.read(min(chunk_size, 4))
+            elif chunk_id == b'cue ':
+                info["cue_count"] = struct.unpack('<I', f.read(4))[0]
+            elif chunk_id == b'smpl':
+                smpl = f.read(min(chunk_size, 0x24))
+                if len(smpl) >= 0x20:
+                    info["loop_count"] = struct.unpack_from('<I', smpl, 0x1C)[0]
+            elif chunk_id == b'data':
+                data_size = min(chunk_size, file_size - pos - 8)
+            # Chunks are padded to an even size
+            pos += 8 + chunk_size + (chunk_size & 1)
+
+    if fmt is None or len(fmt) < 16:
+        return info
+    format_tag, channels, sample_rate, avg_bytes, block_align = struct.unpack_from('<HHIIH', fmt, 0)
+    info["codec"] = CODECS.get(format_tag, f"0x{format_tag:04x}")
+    info["channels"] = channels
+    info["sample_rate"] = sample_rate
+
+    if format_tag == 0xFFFF:
+        # Sample count is the first field of the vorb data, either inline in an
+        # extended fmt chunk (at 0x18) or in a separate vorb chunk
+        if vorb is None and len(fmt) >= 0x1C:
+            vorb = fmt[0x18:0x1C]
+        if vorb is not None and len(vorb) >= 4:
+            info["sample_count"] = struct.unpack_from('<I', vorb, 0)[0]
+    elif format_tag == 0x0002 and block_align:
+        info["sample_count"] = data_size // block_align * ADPCM_SAMPLES_PER_BLOCK
+    elif format_tag in (0x0001, 0xFFFE) and block_align:
+        info["sample_count"] = data_size // block_align
+
+    if info["sample_count"] is not None and sample_rate:
+        info["duration"] = info["sample_count"] / sample_rate
+    elif avg_bytes:
+        info["duration"] = data_size / avg_bytes
+    return info
+
+def iter_wem_outputs(output_dir):
+    """Yields (relative_path, archive, offset) for every .wem in the extraction output.
+
+    Source offsets come from the extraction manifest when there is one; the
+    content-addressed store is skipped because its files are linked elsewhere.
+    """
+    offsets = {}
+    for key, record in load_manifest(output_dir)["inputs"].items():
+        for output in record["outputs"]:
+            offsets[f"{record['output_dir']}/{output['name']}"] = (key, output["offset"])
+
+    for root, dirs, files in os.walk(output_dir):
+        if root == output_dir and STORE_DIR_NAME in dirs:
+            dirs.remove(STORE_DIR_NAME)
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith('.wem'):
+                continue
+            relative_path = os.path.relpath(os.path.join(root, file), output_dir).replace('\\', '/')
+            archive_dir = os.path.dirname(relative_path)
+            archive, offset = offsets.get(relative_path, (archive_dir, None))
+            yield relative_path, archive, offset
+
+def build_index(output_dir, index_path=None):
+    """Rebuilds the SQLite index of all extracted WEMs and returns the number of indexed files."""
+    index_path = index_path or os.path.join(output_dir, INDEX_NAME)
+    rows = []
+    for relative_path, archive, offset in iter_wem_outputs(output_dir):
+        file_path = os.path.join(output_dir, relative_path)
+        try:
+            info = parse_wem_header(file_path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Warning: Cannot read WEM header of {file_path}: {e}")
+            continue
+        rows.append((relative_path, archive, relative_path.split('/', 1)[0], offset,
+                     os.path.getsize(file_path), info["codec"], info["channels"], info["sample_rate"],
+                     info["sample_count"], info["duration"], info["cue_count"], info["loop_count"]))
+
+    with sqlite3.connect(index_path) as conn:
+        conn.executescript(SCHEMA)
+        conn.execute("DELETE FROM wem")
+        conn.executemany("INSERT INTO wem VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.close()
+    return len(rows)
+
+def query_index(index_path, group=None, codec=None, channels=None, sample_rate=None,
+                min_duration=None, max_duration=None, archive=None):
+    """Returns index rows (as dicts) matching all given filters, ordered by path."""
+    conditions = []
+    params = []
+    for column, value in (("grp", group), ("codec", codec), ("channels", channels),
+                          ("sample_rate", sample_rate), ("archive", archive)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if min_duration is not None:
+        conditions.append("duration >= ?")
+        params.append(min_duration)
+    if max_duration is not None:
+        conditions.append("duration <= ?")
+        params.append(max_duration)
+
+    sql = "SELECT * FROM wem"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY path"
+    conn = sqlite3.connect(index_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds and queries an index of extracted WEM headers.")
+    parser.add_argument("--output-dir", default="nier_unpacked_result",
+                        help="extraction output to index (default: nier_unpacked_result)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="rebuild the index from the extracted .wem files")
+    query = subparsers.add_parser("query", help="list WEMs matching the given filters")
+    query.add_argument("--group", help="top-level folder, e.g. st1")
+    query.add_argument("--archive", help="source archive, e.g. st1/st1_0000.dat")
+    query.add_argument("--codec", choices=sorted(set(CODECS.values())))
+    query.add_argument("--channels", type=int)
+    query.add_argument("--sample-rate", type=int)
+    query.add_argument("--min-duration", type=float, help="seconds")
+    query.add_argument("--max-duration", type=float, help="seconds")
+    args = parser.parse_args()
+
+    index_path = os.path.join(args.output_dir, INDEX_NAME)
+    if args.command == "build":
+        if not os.path.exists(args.output_dir):
+            print(f"Error: {args.output_dir} not found.")
+            return
+        start = time.perf_counter()
+        count = build_index(args.output_dir, index_path)
+        print(f"Indexed {count} WEM files in {time.perf_counter() - start:.2f} s -> {index_path}")
+        return
+
+    if not os.path.exists(index_path):
+        print(f"Error: {index_path} not found, run 'build' first.")
+        return
+    start = time.perf_counter()
+    rows = query_index(index_path, args.group, args.codec, args.channels, args.sample_rate,
+                       args.min_duration, args.max_duration, args.archive)
+    elapsed = time.perf_counter() - start
+    for row in rows:
+        duration = f"{row['duration']:.2f} s" if row["duration"] is not None else "?"
+        print(f"{row['path']}: {row['codec']}, {row['channels']} ch, {row['sample_rate']} Hz, {duration}")
+    print(f"{len(rows)} WEM files ({elapsed * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import shutil
+
+STORE_DIR_NAME = "_store"
+
+def payload_hash(data):
+    """Returns the BLAKE2b digest that names a payload in the store."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def store_path(store_dir, digest):
+    """Returns the path of a payload in the store, fanned out by the first two hex digits."""
+    return os.path.join(store_dir, digest[:2], f"{digest}.wem")
+
+def link_to_store(store_dir, output_file, data):
+    """Stores data once under its hash and makes output_file a hardlink to it.
+
+    Returns (digest, stored, linked): stored is False when the payload was
+    already in the store, linked is False when the file system refused the
+    hardlink and output_file had to be written as a copy.
+    """
+    digest = payload_hash(data)
+    path = store_path(store_dir, digest)
+    stored = False
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Parallel workers may store the same payload; the rename keeps that safe
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        stored = True
+
+    if os.path.lexists(output_file):
+        os.remove(output_file)
+    try:
+        os.link(path, output_file)
+        linked = True
+    except OSError:
+        shutil.copyfile(path, output_file)
+        linked = False
+    return digest, stored, linked
+
+def collect_garbage(store_dir, referenced):
+    """Removes payloads whose digest is not in referenced and returns (count, bytes) removed.
+
+    Reachability comes from the digests recorded in the manifest, not from link
+    counts: those are not reported by directory scans on Windows, and outputs
+    written as copies never raise them.
+    """
+    removed_count = 0
+    removed_bytes = 0
+    if not os.path.isdir(store_dir):
+        return removed_count, removed_bytes
+    with os.scandir(store_dir) as buckets:
+        for bucket in buckets:
+            if not bucket.is_dir():
+                continue
+            with os.scandir(bucket.path) as payloads:
+                for payload in payloads:
+                    digest, extension = os.path.splitext(payload.name)
+                    if extension == ".wem" and digest in referenced:
+                        continue
+                    # Unreferenced payloads and leftovers of interrupted writes
+                    removed_bytes += payload.stat().st_size
+                    os.remove(payload.path)
+                    removed_count += 1
+            if not os.listdir(bucket.path):
+                os.rmdir(bucket.path)
+    return removed_count, removed_bytes
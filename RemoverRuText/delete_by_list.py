@@ -1,67 +1,168 @@
 import os
 import json
-import shutil
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def delete_items(base_path, structure):
-    try:
-        # Получаем список элементов из JSON
-        items = {item["name"]: item for item in structure["contents"]}
-        
-        # Проходим по содержимому текущей директории
-        for item_name in os.listdir(base_path):
-            item_path = os.path.join(base_path, item_name)
-            
-            # Проверяем, есть ли элемент в списке
-            if item_name not in items:
-                print(f"⏩ Пропущен (не в списке): {item_path}")
-                continue
-            
-            item_info = items[item_name]
-            
-            if item_info["type"] == "directory":
-                # Рекурсивно обрабатываем поддиректорию
-                print(f"📁 Обрабатывается директория: {item_path}")
-                delete_items(item_path, item_info)
-                # Проверяем, пуста ли директория
-                if not os.listdir(item_path):
-                    shutil.rmtree(item_path, ignore_errors=True)
-                    print(f"🗑️ Удалена директория: {item_path}")
+# Сколько файлов удаляется одновременно: удаление в основном ждёт диск
+MAX_WORKERS = min(16, (os.cpu_count() or 1) * 4)
+
+def plan_deletion(base_path, structure, strict=False):
+    """Сравнивает список со снимком живого дерева и возвращает план удаления.
+
+    Обходятся только директории из списка. План — словарь:
+    files — файлы из списка, которые есть на диске (их удаляем);
+    dirs — директории из списка, от самых глубоких (удаляются, если опустеют);
+    skipped — элементы на диске, которых нет в списке (их не трогаем);
+    changed — файлы, размер которых отличается от записанного в списке
+    (при strict они не удаляются); errors — пары (путь, описание проблемы).
+    """
+    plan = {"files": [], "dirs": [], "skipped": [], "changed": [], "errors": []}
+    stack = [("", structure)]
+    while stack:
+        relative_dir, node = stack.pop()
+        dir_path = os.path.join(base_path, relative_dir)
+        try:
+            with os.scandir(dir_path) as entries:
+                live = {entry.name: entry for entry in entries}
+        except FileNotFoundError:
+            continue
+        except PermissionError:
+            plan["errors"].append((dir_path, "нет доступа"))
+            continue
+        except Exception as e:
+            plan["errors"].append((dir_path, str(e)))
+            continue
+
+        items = {item["name"]: item for item in node["contents"]}
+        # Разность множеств: что есть на диске, но не в списке, остаётся на месте
+        plan["skipped"].extend(os.path.join(relative_dir, name) for name in sorted(live.keys() - items.keys()))
+        for name in sorted(live.keys() & items.keys()):
+            entry, item = live[name], items[name]
+            relative_path = os.path.join(relative_dir, name)
+            if item["type"] == "directory":
+                if entry.is_dir():
+                    plan["dirs"].append(relative_path)
+                    stack.append((relative_path, item))
                 else:
-                    print(f"⚠️ Директория не пуста, пропущена: {item_path}")
+                    plan["errors"].append((relative_path, "в списке директория, на диске файл"))
+            elif entry.is_dir():
+                plan["errors"].append((relative_path, "в списке файл, на диске директория"))
             else:
-                # Удаляем файл
-                try:
-                    os.remove(item_path)
-                    print(f"🗑️ Удален файл: {item_path}")
-                except Exception as e:
-                    print(f"❌ Ошибка при удалении файла {item_path}: {str(e)}")
-                    
-    except PermissionError:
-        print(f"⚠️ Нет доступа: {base_path}")
+                if "size" in item:
+                    try:
+                        size_changed = entry.stat().st_size != item["size"]
+                    except OSError as e:
+                        # Размер не узнать (например, ссылка стала битой) — считаем файл изменённым
+                        plan["errors"].append((relative_path, str(e)))
+                        size_changed = True
+                else:
+                    size_changed = False
+                if size_changed:
+                    plan["changed"].append(relative_path)
+                    if strict:
+                        continue
+                plan["files"].append(relative_path)
+
+    # Сначала самые глубокие директории, чтобы родитель освобождался после детей
+    plan["dirs"].sort(key=lambda path: path.count(os.sep), reverse=True)
+    return plan
+
+def print_plan(plan, verbose=False):
+    """Печатает план удаления для пробного запуска."""
+    for path in plan["files"]:
+        print(f"🗑️ Будет удален файл: {path}")
+    for path in plan["dirs"]:
+        print(f"🗑️ Будет удалена директория, если опустеет: {path}")
+    if verbose:
+        for path in plan["skipped"]:
+            print(f"⏩ Пропущен (не в списке): {path}")
+
+def remove_file(path):
+    """Удаляет файл; возвращает None или текст ошибки."""
+    try:
+        os.remove(path)
+        return None
     except Exception as e:
-        print(f"❌ Ошибка при обработке {base_path}: {str(e)}")
+        return str(e)
+
+def execute_plan(base_path, plan, max_workers=MAX_WORKERS, verbose=False):
+    """Удаляет файлы плана в пуле потоков, затем опустевшие директории; возвращает счётчики."""
+    stats = {"files": 0, "dirs": 0, "not_empty": 0, "errors": len(plan["errors"])}
+    paths = [os.path.join(base_path, path) for path in plan["files"]]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for path, error in zip(paths, executor.map(remove_file, paths)):
+            if error is None:
+                stats["files"] += 1
+                if verbose:
+                    print(f"🗑️ Удален файл: {path}")
+            else:
+                stats["errors"] += 1
+                print(f"❌ Ошибка при удалении файла {path}: {error}")
+
+    for relative_path in plan["dirs"]:
+        path = os.path.join(base_path, relative_path)
+        try:
+            if os.listdir(path):
+                stats["not_empty"] += 1
+                if verbose:
+                    print(f"⚠️ Директория не пуста, пропущена: {path}")
+                continue
+            os.rmdir(path)
+            stats["dirs"] += 1
+            if verbose:
+                print(f"🗑️ Удалена директория: {path}")
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"❌ Ошибка при удалении директории {path}: {str(e)}")
+    return stats
 
 def main():
-    json_path = "directory_list.json"
-    
+    parser = argparse.ArgumentParser(description="Удаляет файлы и директории, перечисленные в directory_list.json.")
+    parser.add_argument("--list", default="directory_list.json", help="файл списка (по умолчанию directory_list.json)")
+    parser.add_argument("--base", default=None, help="базовая директория (по умолчанию текущая)")
+    parser.add_argument("--dry-run", action="store_true", help="только показать план, ничего не удаляя")
+    parser.add_argument("--strict", action="store_true",
+                        help="не удалять файлы, размер которых отличается от записанного в списке")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help=f"потоков удаления (по умолчанию {MAX_WORKERS})")
+    parser.add_argument("--verbose", action="store_true", help="выводить каждый удалённый и пропущенный элемент")
+    args = parser.parse_args()
+
     # Проверяем существование JSON-файла
-    if not os.path.exists(json_path):
-        print(f"❌ Файл списка {json_path} не найден")
+    if not os.path.exists(args.list):
+        print(f"❌ Файл списка {args.list} не найден")
         return
-    
+
     # Читаем JSON
-    with open(json_path, "r", encoding="utf-8") as file:
+    with open(args.list, "r", encoding="utf-8") as file:
         structure = json.load(file)
-    
-    # Используем текущую директорию как базовую
-    base_path = os.getcwd()
-    
+
+    # По умолчанию базовая директория — текущая
+    base_path = args.base or os.getcwd()
+
     print(f"\nУдаление элементов в: {base_path}\n")
-    delete_items(base_path, structure)
-    print("\n✅ Удаление завершено")
-    
+    start = time.perf_counter()
+    plan = plan_deletion(base_path, structure, args.strict)
+    for path, problem in plan["errors"]:
+        print(f"❌ Ошибка при обработке {path}: {problem}")
+    for path in plan["changed"]:
+        action = "пропущен" if args.strict else "будет удален"
+        print(f"⚠️ Размер отличается от списка, {action}: {path}")
+
+    if args.dry_run:
+        print_plan(plan, args.verbose)
+        print(f"\n📋 План: файлов {len(plan['files'])}, директорий {len(plan['dirs'])}, "
+              f"пропущено (не в списке) {len(plan['skipped'])}, размер изменён {len(plan['changed'])}, "
+              f"ошибок {len(plan['errors'])}")
+    else:
+        stats = execute_plan(base_path, plan, args.jobs, args.verbose)
+        print(f"\n📊 Удалено файлов: {stats['files']}, директорий: {stats['dirs']}; "
+              f"пропущено (не в списке): {len(plan['skipped'])}; директорий не пусто: {stats['not_empty']}; "
+              f"ошибок: {stats['errors']}; за {time.perf_counter() - start:.2f} с")
+        print("\n✅ Удаление завершено")
+
     # Ожидаем ввода пользователя перед закрытием
     input("\nНажмите Enter для выхода...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,57 +1,101 @@
 import os
 import json
+import argparse
+import time
 
-def list_directory(path, indent="", structure=None):
-    if structure is None:
-        structure = {"path": path, "contents": []}
-    
-    try:
-        # Получаем отсортированный список элементов в директории
-        items = sorted(os.listdir(path))
-        
-        for item in items:
-            item_path = os.path.join(path, item)
-            item_info = {"name": item}
-            
-            if os.path.isdir(item_path):
-                item_info["type"] = "directory"
-                item_info["contents"] = []
-                print(f"{indent}📁 {item}/")
-                list_directory(item_path, indent + "  ", item_info)
-            else:
-                item_info["type"] = "file"
-                print(f"{indent}📄 {item}")
-            
-            structure["contents"].append(item_info)
-                    
-    except PermissionError:
-        print(f"{indent}⚠️ Нет доступа: {path}")
-    except Exception as e:
-        print(f"{indent}❌ Ошибка при обработке {path}: {str(e)}")
-    
+def list_directory(path):
+    """Собирает снимок дерева path: вложенные {"name", "type", "contents"}; у файлов ещё size и mtime_ns.
+
+    Обход итеративный через os.scandir: тип и размер берутся из записи каталога,
+    без лишнего stat на каждый элемент и без рекурсии.
+    """
+    structure = {"path": path, "contents": []}
+    stack = [(path, structure)]
+    while stack:
+        dir_path, node = stack.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                # Отсортированный список элементов директории
+                entries = sorted(entries, key=lambda entry: entry.name)
+            for entry in entries:
+                item_info = {"name": entry.name}
+                if entry.is_dir():
+                    item_info["type"] = "directory"
+                    item_info["contents"] = []
+                    stack.append((entry.path, item_info))
+                else:
+                    item_info["type"] = "file"
+                    try:
+                        stat = entry.stat()
+                        item_info["size"] = stat.st_size
+                        item_info["mtime_ns"] = stat.st_mtime_ns
+                    except OSError as e:
+                        # Например, битая символическая ссылка: файл попадает в список без размера
+                        print(f"⚠️ Не удалось прочитать размер {entry.path}: {str(e)}")
+                node["contents"].append(item_info)
+        except PermissionError:
+            print(f"⚠️ Нет доступа: {dir_path}")
+        except Exception as e:
+            print(f"❌ Ошибка при обработке {dir_path}: {str(e)}")
     return structure
 
+def count_items(structure):
+    """Возвращает (число файлов, число директорий, общий размер файлов) снимка."""
+    files = dirs = size = 0
+    stack = [structure]
+    while stack:
+        for item in stack.pop()["contents"]:
+            if item["type"] == "directory":
+                dirs += 1
+                stack.append(item)
+            else:
+                files += 1
+                size += item.get("size", 0)
+    return files, dirs, size
+
+def print_structure(structure, indent=""):
+    """Печатает снимок деревом, как раньше выводился обход."""
+    for item in structure["contents"]:
+        if item["type"] == "directory":
+            print(f"{indent}📁 {item['name']}/")
+            print_structure(item, indent + "  ")
+        else:
+            print(f"{indent}📄 {item['name']}")
+
 def main():
-    # Запрашиваем путь к директории
-    directory = input("Введите путь к директории (или нажмите Enter для текущей): ").strip()
+    parser = argparse.ArgumentParser(description="Сохраняет снимок дерева файлов в JSON для delete_by_list.py.")
+    parser.add_argument("directory", nargs="?", help="директория (если не указана, будет запрошена)")
+    parser.add_argument("-o", "--output", default="directory_list.json", help="куда сохранить список")
+    parser.add_argument("--verbose", action="store_true", help="вывести всё дерево")
+    args = parser.parse_args()
+
+    directory = args.directory
+    if directory is None:
+        # Запрашиваем путь к директории
+        directory = input("Введите путь к директории (или нажмите Enter для текущей): ").strip()
     if not directory:
         directory = os.getcwd()
-    
+
     # Проверяем существование директории
     if not os.path.exists(directory):
         print(f"❌ Директория {directory} не существует")
         return
-    
+
     # Собираем структуру директории
     print(f"\nСодержимое директории: {directory}\n")
+    start = time.perf_counter()
     structure = list_directory(directory)
-    
+    if args.verbose:
+        print_structure(structure)
+    files, dirs, size = count_items(structure)
+    print(f"📊 Файлов: {files}, директорий: {dirs}, {size / (1024 * 1024):.1f} МБ "
+          f"за {time.perf_counter() - start:.2f} с")
+
     # Сохраняем результат в JSON
-    output_path = "directory_list.json"
-    with open(output_path, "w", encoding="utf-8") as output_file:
+    with open(args.output, "w", encoding="utf-8") as output_file:
         json.dump(structure, output_file, ensure_ascii=False, indent=2)
-    
-    print(f"\n✅ Список сохранен в {output_path}")
+
+    print(f"\n✅ Список сохранен в {args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
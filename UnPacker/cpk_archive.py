@@ -0,0 +1,346 @@
+import argparse
+import glob
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+CPK_MAGIC = b'CPK '
+TOC_MAGIC = b'TOC '
+UTF_MAGIC = b'@UTF'
+CRILAYLA_MAGIC = b'CRILAYLA'
+# First 0x100 bytes of a CRILAYLA file are stored uncompressed after the compressed data
+CRILAYLA_HEADER_SIZE = 0x100
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# @UTF column flags: storage in the high nibble, type in the low nibble
+STORAGE_MASK = 0xF0
+STORAGE_ZERO = 0x10
+STORAGE_CONSTANT = 0x30
+STORAGE_PERROW = 0x50
+TYPE_MASK = 0x0F
+TYPE_STRING = 0x0A
+TYPE_DATA = 0x0B
+UTF_TYPES = {
+    0x00: struct.Struct('>B'),
+    0x01: struct.Struct('>b'),
+    0x02: struct.Struct('>H'),
+    0x03: struct.Struct('>h'),
+    0x04: struct.Struct('>I'),
+    0x05: struct.Struct('>i'),
+    0x06: struct.Struct('>Q'),
+    0x07: struct.Struct('>q'),
+    0x08: struct.Struct('>f'),
+    0x09: struct.Struct('>d'),
+    TYPE_STRING: struct.Struct('>I'),
+    TYPE_DATA: struct.Struct('>II'),
+}
+UTF_HEADER = struct.Struct('>4sIHHIIIHHI')
+
+def decrypt_utf(packet):
+    """Decrypts an @UTF packet stored with CRI's XOR mask; plain packets are returned as-is."""
+    if packet[:4] == UTF_MAGIC:
+        return bytes(packet)
+    result = bytearray(packet)
+    m = 0x5F
+    for i in range(len(result)):
+        result[i] ^= m
+        m = (m * 0x15) & 0xFF
+    if result[:4] != UTF_MAGIC:
+        raise ValueError("not an @UTF table")
+    return bytes(result)
+
+def read_utf_table(packet):
+    """Parses an @UTF table and returns (table_name, rows) with one dict per row.
+
+    String columns are decoded, data columns become bytes and zero-storage
+    columns read as None.
+    """
+    data = decrypt_utf(packet)
+    if len(data) < UTF_HEADER.size:
+        raise ValueError("@UTF table is truncated")
+    (_, _table_size, _unknown, rows_offset, strings_offset, data_offset,
+     name_offset, num_columns, row_length, num_rows) = UTF_HEADER.unpack_from(data, 0)
+    # Offsets are relative to the end of the magic and size fields
+    rows_offset += 8
+    strings_offset += 8
+    data_offset += 8
+
+    def read_string(offset):
+        start = strings_offset + offset
+        end = data.index(b'\x00', start)
+        return data[start:end].decode('utf-8', 'replace')
+
+    def read_value(column_type, pos):
+        value_struct = UTF_TYPES[column_type]
+        value = value_struct.unpack_from(data, pos)
+        if column_type == TYPE_STRING:
+            return read_string(value[0]), value_struct.size
+        if column_type == TYPE_DATA:
+            start = data_offset + value[0]
+            return data[start:start + value[1]], value_struct.size
+        return value[0], value_struct.size
+
+    columns = []
+    pos = UTF_HEADER.size
+    for _ in range(num_columns):
+        flags = data[pos]
+        name = read_string(struct.unpack_from('>I', data, pos + 1)[0])
+        pos += 5
+        constant = None
+        if flags & STORAGE_MASK == STORAGE_CONSTANT:
+            constant, size = read_value(flags & TYPE_MASK, pos)
+            pos += size
+        columns.append((name, flags & STORAGE_MASK, flags & TYPE_MASK, constant))
+
+    rows = []
+    for row_index in range(num_rows):
+        pos = rows_offset + row_index * row_length
+        row = {}
+        for name, storage, column_type, constant in columns:
+            if storage == STORAGE_PERROW:
+                row[name], size = read_value(column_type, pos)
+                pos += size
+            elif storage == STORAGE_CONSTANT:
+                row[name] = constant
+            else:
+                row[name] = None
+        rows.append(row)
+    return read_string(name_offset), rows
+
+def decompress_crilayla(data):
+    """Decompresses a CRILAYLA buffer and returns the original bytes.
+
+    The compressed stream is read bit by bit from its end towards the start
+    and the output is filled from its end towards the start as well.
+    """
+    data = bytes(data)
+    if data[:8] != CRILAYLA_MAGIC:
+        raise ValueError("missing CRILAYLA magic")
+    uncompressed_size, header_offset = struct.unpack_from('<II', data, 8)
+    header_pos = header_offset + 0x10
+    result = bytearray(CRILAYLA_HEADER_SIZE + uncompressed_size)
+    result[:CRILAYLA_HEADER_SIZE] = data[header_pos:header_pos + CRILAYLA_HEADER_SIZE]
+
+    input_offset = len(data) - CRILAYLA_HEADER_SIZE - 1
+    output_end = CRILAYLA_HEADER_SIZE + uncompressed_size - 1
+    bit_pool = 0
+    bits_left = 0
+    bytes_output = 0
+    while bytes_output < uncompressed_size:
+        # Every token starts with one flag bit: 1 for a backreference, 0 for a literal
+        if bits_left == 0:
+            if input_offset < 0x10:
+                raise ValueError("CRILAYLA stream is truncated")
+            bit_pool = data[input_offset]
+            input_offset -= 1
+            bits_left = 8
+        bits_left -= 1
+        is_reference = (bit_pool >> bits_left) & 1
+
+        if not is_reference:
+            while bits_left < 8:
+                if input_offset < 0x10:
+                    raise ValueError("CRILAYLA stream is truncated")
+                bit_pool = ((bit_pool << 8) | data[input_offset]) & 0xFFFF
+                input_offset -= 1
+                bits_left += 8
+            bits_left -= 8
+            result[output_end - bytes_output] = (bit_pool >> bits_left) & 0xFF
+            bytes_output += 1
+            continue
+
+        fields = []
+        for width in (13, 2, 3, 5, 8):
+            while bits_left < width:
+                if input_offset < 0x10:
+                    raise ValueError("CRILAYLA stream is truncated")
+                bit_pool = ((bit_pool << 8) | data[input_offset]) & 0xFFFFFF
+                input_offset -= 1
+                bits_left += 8
+            bits_left -= width
+            value = (bit_pool >> bits_left) & ((1 << width) - 1)
+            fields.append(value)
+            # Length is a variable-length code: each level continues only when saturated
+            if width != 13 and value != (1 << width) - 1:
+                break
+        else:
+            while True:
+                while bits_left < 8:
+                    if input_offset < 0x10:
+                        raise ValueError("CRILAYLA stream is truncated")
+                    bit_pool = ((bit_pool << 8) | data[input_offset]) & 0xFFFF
+                    input_offset -= 1
+                    bits_left += 8
+                bits_left -= 8
+                value = (bit_pool >> bits_left) & 0xFF
+                fields.append(value)
+                if value != 0xFF:
+                    break
+
+        reference = output_end - bytes_output + fields[0] + 3
+        length = 3 + sum(fields[1:])
+        if bytes_output + length > uncompressed_size:
+            raise ValueError("CRILAYLA backreference runs past the output")
+        for _ in range(length):
+            result[output_end - bytes_output] = result[reference]
+            reference -= 1
+            bytes_output += 1
+    return bytes(result)
+
+class CpkArchive:
+    """Reader for CRI CPK archives with a named file table (TOC).
+
+    The CPK header and TOC are @UTF tables; entries are located relative to
+    the smaller of ContentOffset and TocOffset, as CriPakTools does. Entries
+    whose extract size differs from their stored size are CRILAYLA-compressed.
+
+    Raises ValueError if the file is not a CPK with a TOC.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.header = self.read_packet(f, 0, CPK_MAGIC)
+            toc_offset = self.header.get("TocOffset")
+            if not toc_offset:
+                raise ValueError("CPK has no TOC; ID-only archives are not supported")
+            content_offset = self.header.get("ContentOffset") or toc_offset
+            self.base_offset = min(content_offset, toc_offset)
+            _, toc_rows = self.read_table(f, toc_offset, TOC_MAGIC)
+        self.entries = []
+        for row in toc_rows:
+            dir_name = row.get("DirName") or ""
+            name = f"{dir_name}/{row['FileName']}" if dir_name else row["FileName"]
+            self.entries.append({
+                "name": name,
+                "offset": self.base_offset + row["FileOffset"],
+                "size": row["FileSize"],
+                "extract_size": row.get("ExtractSize") or row["FileSize"],
+                "id": row.get("ID"),
+            })
+        self.by_name = {entry["name"]: entry for entry in self.entries}
+
+    @staticmethod
+    def read_table(f, offset, magic):
+        """Reads the @UTF table that follows a 16-byte chunk header with the given magic."""
+        f.seek(offset)
+        chunk_header = f.read(16)
+        if len(chunk_header) < 16 or chunk_header[:4] != magic:
+            raise ValueError(f"missing {magic.decode().strip()} chunk at 0x{offset:x}")
+        packet_size = struct.unpack_from('<I', chunk_header, 8)[0]
+        return read_utf_table(f.read(packet_size))
+
+    @classmethod
+    def read_packet(cls, f, offset, magic):
+        """Reads a single-row @UTF table, such as the CPK header, as a dict."""
+        _, rows = cls.read_table(f, offset, magic)
+        if not rows:
+            raise ValueError(f"empty {magic.decode().strip()} table")
+        return rows[0]
+
+    def list(self):
+        """Returns the names (DirName/FileName) of all entries in TOC order."""
+        return [entry["name"] for entry in self.entries]
+
+    def open(self, name):
+        """Returns the contents of an entry, decompressed if needed."""
+        return read_entry(self.path, self.by_name[name])
+
+    def extract(self, name, output_dir):
+        """Writes an entry under output_dir/DirName/FileName and returns the path."""
+        return extract_entry(self.path, self.by_name[name], output_dir)
+
+def read_entry(cpk_path, entry):
+    """Reads one CPK entry and decompresses it if it is stored as CRILAYLA."""
+    with open(cpk_path, 'rb') as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["size"])
+    if entry["extract_size"] != entry["size"] and data[:8] == CRILAYLA_MAGIC:
+        return decompress_crilayla(data)
+    return data
+
+def extract_entry(cpk_path, entry, output_dir):
+    """Writes one CPK entry to output_dir, copying stored entries in blocks, and returns the path."""
+    output_file = os.path.join(output_dir, *entry["name"].split('/'))
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    if entry["extract_size"] != entry["size"]:
+        data = read_entry(cpk_path, entry)
+        with open(output_file, 'wb') as out_f:
+            out_f.write(data)
+        return output_file
+
+    with open(cpk_path, 'rb') as f, open(output_file, 'wb') as out_f:
+        f.seek(entry["offset"])
+        remaining = entry["size"]
+        while remaining > 0:
+            block = f.read(min(remaining, COPY_BLOCK_SIZE))
+            if not block:
+                raise ValueError(f"{entry['name']} points past the end of {cpk_path}")
+            out_f.write(block)
+            remaining -= len(block)
+    return output_file
+
+def extract_entry_job(job):
+    """Process pool entry point: extracts one (cpk_path, entry, output_dir) job."""
+    cpk_path, entry, output_dir = job
+    extract_entry(cpk_path, entry, output_dir)
+    return entry["extract_size"]
+
+def unpack_cpks(cpk_paths, output_dir, max_workers=1, verbose=True):
+    """Extracts every entry of the given CPKs into output_dir and returns (file_count, bytes).
+
+    With max_workers > 1 entries are decompressed on a process pool, largest
+    first; each worker writes its file straight to disk.
+    """
+    jobs = []
+    for cpk_path in cpk_paths:
+        archive = CpkArchive(cpk_path)
+        if verbose:
+            print(f"Processing {cpk_path} ({len(archive.entries)} files)...")
+        jobs.extend((cpk_path, entry, output_dir) for entry in archive.entries)
+
+    total_bytes = 0
+    if max_workers > 1 and len(jobs) > 1:
+        jobs.sort(key=lambda job: job[1]["size"], reverse=True)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(extract_entry_job, job) for job in jobs]
+            for future in as_completed(futures):
+                total_bytes += future.result()
+    else:
+        for job in jobs:
+            if verbose:
+                print(f"Extracting {job[1]['name']}")
+            total_bytes += extract_entry_job(job)
+    return len(jobs), total_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Unpacks CRI CPK archives (replacement for CriPakTools.exe ALL).")
+    parser.add_argument("cpk", nargs="*", help="CPK files to unpack (default: all *.cpk in the current folder)")
+    parser.add_argument("--output", default="nier_unpacked", help="output folder (default: nier_unpacked)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes for decompression (default: CPU count)")
+    parser.add_argument("--list", action="store_true", help="only list the files in each CPK")
+    args = parser.parse_args()
+
+    cpk_paths = args.cpk or sorted(glob.glob("*.cpk"))
+    if not cpk_paths:
+        print("Error: no .cpk files found.")
+        sys.exit(1)
+
+    if args.list:
+        for cpk_path in cpk_paths:
+            for entry in CpkArchive(cpk_path).entries:
+                compressed = " (CRILAYLA)" if entry["extract_size"] != entry["size"] else ""
+                print(f"{cpk_path}: {entry['name']} {entry['extract_size']} bytes{compressed}")
+        return
+
+    start = time.perf_counter()
+    file_count, total_bytes = unpack_cpks(cpk_paths, args.output, args.jobs, verbose=args.jobs <= 1)
+    elapsed = time.perf_counter() - start
+    print(f"\nAll files have been processed: {file_count} files, {total_bytes} bytes in {elapsed:.2f} s "
+          f"-> {os.path.abspath(args.output)}")
+
+if __name__ == "__main__":
+    main()
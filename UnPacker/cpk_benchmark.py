@@ -0,0 +1,230 @@
+import argparse
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+
+from cpk_archive import (CPK_MAGIC, CRILAYLA_HEADER_SIZE, CRILAYLA_MAGIC, STORAGE_PERROW, TOC_MAGIC,
+                         TYPE_STRING, UTF_HEADER, UTF_MAGIC, UTF_TYPES, CpkArchive, unpack_cpks)
+
+CPK_ALIGN = 0x800
+# Column types used in the synthetic header and TOC
+TYPE_U32 = 0x04
+TYPE_U64 = 0x06
+CPK_HEADER_COLUMNS = (("ContentOffset", TYPE_U64), ("ContentSize", TYPE_U64), ("TocOffset", TYPE_U64),
+                      ("TocSize", TYPE_U64), ("Files", TYPE_U32), ("Align", TYPE_U32))
+TOC_COLUMNS = (("DirName", TYPE_STRING), ("FileName", TYPE_STRING), ("FileSize", TYPE_U32),
+               ("ExtractSize", TYPE_U32), ("FileOffset", TYPE_U64), ("ID", TYPE_U32))
+VLE_WIDTHS = (2, 3, 5, 8)
+MIN_MATCH = 3
+MAX_DISTANCE = (1 << 13) - 1 + 3
+
+class BitWriter:
+    """Collects bits most significant first, in the order the decoder consumes them."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.pool = 0
+        self.count = 0
+
+    def write(self, value, width):
+        self.pool = (self.pool << width) | value
+        self.count += width
+        while self.count >= 8:
+            self.count -= 8
+            self.data.append((self.pool >> self.count) & 0xFF)
+        self.pool &= (1 << self.count) - 1
+
+    def getvalue(self):
+        if self.count:
+            return bytes(self.data) + bytes([(self.pool << (8 - self.count)) & 0xFF])
+        return bytes(self.data)
+
+def compress_crilayla(data):
+    """Compresses data as CRILAYLA with a greedy LZ77 matcher; only meant for building fixtures.
+
+    The decoder fills the output from its end, so the payload is matched in
+    reverse and the bit stream is stored reversed in front of the raw header.
+    """
+    header = data[:CRILAYLA_HEADER_SIZE]
+    payload = data[CRILAYLA_HEADER_SIZE:][::-1]
+    bits = BitWriter()
+    last_seen = {}
+    indexed = 0
+    pos = 0
+    while pos < len(payload):
+        # Backreferences reach at least 3 bytes back, so only index positions up to there
+        while indexed <= pos - MIN_MATCH:
+            last_seen[payload[indexed:indexed + MIN_MATCH]] = indexed
+            indexed += 1
+        key = payload[pos:pos + MIN_MATCH]
+        candidate = last_seen.get(key)
+        length = 0
+        if candidate is not None and len(key) == MIN_MATCH and pos - candidate <= MAX_DISTANCE:
+            length = MIN_MATCH
+            while pos + length < len(payload) and payload[candidate + length] == payload[pos + length]:
+                length += 1
+        if length >= MIN_MATCH:
+            bits.write(1, 1)
+            bits.write(pos - candidate - 3, 13)
+            extra = length - MIN_MATCH
+            for width in VLE_WIDTHS:
+                value = min(extra, (1 << width) - 1)
+                bits.write(value, width)
+                extra -= value
+                if value != (1 << width) - 1:
+                    break
+            else:
+                while True:
+                    value = min(extra, 0xFF)
+                    bits.write(value, 8)
+                    extra -= value
+                    if value != 0xFF:
+                        break
+        else:
+            bits.write(0, 1)
+            bits.write(payload[pos], 8)
+            length = 1
+        pos += length
+
+    stream = bits.getvalue()[::-1]
+    return CRILAYLA_MAGIC + struct.pack('<II', len(payload), len(stream)) + stream + header
+
+def write_utf_table(table_name, columns, rows):
+    """Builds an unencrypted @UTF table with every column stored per row."""
+    strings = bytearray(b'<NULL>\x00')
+    string_offsets = {}
+
+    def add_string(text):
+        if text not in string_offsets:
+            string_offsets[text] = len(strings)
+            strings.extend(text.encode('utf-8') + b'\x00')
+        return string_offsets[text]
+
+    name_offset = add_string(table_name)
+    schema = bytearray()
+    for name, column_type in columns:
+        schema += struct.pack('>BI', STORAGE_PERROW | column_type, add_string(name))
+    row_data = bytearray()
+    for row in rows:
+        for name, column_type in columns:
+            value = row[name]
+            if column_type == TYPE_STRING:
+                value = add_string(value)
+            row_data += UTF_TYPES[column_type].pack(value)
+    row_length = len(row_data) // len(rows) if rows else 0
+
+    rows_offset = UTF_HEADER.size + len(schema)
+    strings_offset = rows_offset + len(row_data)
+    data_offset = strings_offset + len(strings)
+    table = bytearray(UTF_HEADER.pack(UTF_MAGIC, 0, 1, rows_offset - 8, strings_offset - 8, data_offset - 8,
+                                      name_offset, len(columns), row_length, len(rows)))
+    table += schema + row_data + strings
+    table += b'\x00' * (-len(table) % 8)
+    struct.pack_into('>I', table, 4, len(table) - 8)
+    return bytes(table)
+
+def chunk(magic, packet):
+    """Wraps a @UTF packet in a 16-byte CPK chunk header."""
+    return magic + struct.pack('<IQ', 0xFF, len(packet)) + packet
+
+def align(value):
+    return value + (-value % CPK_ALIGN)
+
+def build_cpk(cpk_path, files, compress=True):
+    """Writes a CPK with a TOC for files, a list of (DirName, FileName, bytes).
+
+    Files larger than the CRILAYLA header are stored compressed when that
+    makes them smaller.
+    """
+    stored = []
+    for dir_name, file_name, data in files:
+        packed = compress_crilayla(data) if compress and len(data) > CRILAYLA_HEADER_SIZE else data
+        if len(packed) >= len(data):
+            packed = data
+        stored.append((dir_name, file_name, data, packed))
+
+    toc_offset = CPK_ALIGN
+    toc_rows = []
+    # The TOC size is needed for the content offset, and the other way round; file
+    # offsets are relative to TocOffset, so build the TOC once to get its size
+    for _ in range(2):
+        content_offset = align(toc_offset + len(chunk(TOC_MAGIC, write_utf_table("CpkTocInfo", TOC_COLUMNS, toc_rows))))
+        toc_rows = []
+        position = content_offset
+        for file_id, (dir_name, file_name, data, packed) in enumerate(stored):
+            toc_rows.append({"DirName": dir_name, "FileName": file_name, "FileSize": len(packed),
+                             "ExtractSize": len(data), "FileOffset": position - toc_offset, "ID": file_id})
+            position = align(position + len(packed))
+    toc = chunk(TOC_MAGIC, write_utf_table("CpkTocInfo", TOC_COLUMNS, toc_rows))
+
+    header = chunk(CPK_MAGIC, write_utf_table("CpkHeader", CPK_HEADER_COLUMNS, [{
+        "ContentOffset": content_offset, "ContentSize": position - content_offset, "TocOffset": toc_offset,
+        "TocSize": len(toc), "Files": len(stored), "Align": CPK_ALIGN}]))
+    with open(cpk_path, 'wb') as f:
+        f.write(header.ljust(toc_offset, b'\x00'))
+        f.write(toc.ljust(content_offset - toc_offset, b'\x00'))
+        for _, _, _, packed in stored:
+            f.write(packed)
+            f.write(b'\x00' * (-len(packed) % CPK_ALIGN))
+    return cpk_path
+
+def synthetic_files(file_count, file_size, seed=0):
+    """Generates (DirName, FileName, bytes) entries shaped like NieR .dat files: a mix of repeated and random data."""
+    rng = random.Random(seed)
+    groups = ("ba", "bh", "pl", "st1")
+    files = []
+    for i in range(file_count):
+        parts = []
+        size = 0
+        while size < file_size:
+            if rng.random() < 0.5:
+                part = rng.randbytes(rng.randint(16, 512))
+            else:
+                part = rng.choice((b'RIFF', b'WAVEfmt ', b'\x00' * 64, b'DAT\x00')) * rng.randint(1, 32)
+            parts.append(part)
+            size += len(part)
+        group = groups[i % len(groups)]
+        files.append((group, f"{group}{i:04d}.dat", b''.join(parts)[:file_size]))
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks cpk_archive on a synthetic CPK.")
+    parser.add_argument("--files", type=int, default=32, help="number of files in the CPK (default: 32)")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="size of each file in bytes (default: 256 KB)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for the parallel run (default: CPU count)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="cpk_benchmark_")
+    try:
+        files = synthetic_files(args.files, args.size)
+        cpk_path = os.path.join(work_dir, "synthetic.cpk")
+        start = time.perf_counter()
+        build_cpk(cpk_path, files)
+        print(f"Built {cpk_path}: {args.files} files, {os.path.getsize(cpk_path)} bytes "
+              f"in {time.perf_counter() - start:.2f} s")
+
+        mb = args.files * args.size / (1024 * 1024)
+        for jobs in sorted({1, args.jobs}):
+            output_dir = os.path.join(work_dir, f"out_{jobs}")
+            start = time.perf_counter()
+            unpack_cpks([cpk_path], output_dir, jobs, verbose=False)
+            elapsed = time.perf_counter() - start
+            print(f"{jobs} worker(s): {elapsed:.2f} s ({mb / elapsed:.2f} MB/s)")
+
+            for dir_name, file_name, data in files:
+                with open(os.path.join(output_dir, dir_name, file_name), 'rb') as f:
+                    if f.read() != data:
+                        print(f"Error: {dir_name}/{file_name} does not match the original.")
+
+        archive = CpkArchive(cpk_path)
+        compressed = sum(1 for entry in archive.entries if entry["extract_size"] != entry["size"])
+        print(f"{compressed} of {len(archive.entries)} files were CRILAYLA-compressed")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    main()
@@ -9,4 +9,5 @@ for %%F in (*.cpk) do (
 echo All files have been processed.
 pause
 
-rem https://github.com/esperknight/CriPakTools
\ No newline at end of file
+rem https://github.com/esperknight/CriPakTools
+rem Without Windows: python cpk_archive.py --output nier_unpacked
\ No newline at end of file
@@ -0,0 +1,600 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Folders whose scripts the benchmark cases import
+TOOL_DIRS = ("UnPacker", "ExtractWemFromDatCPK", "ExtractText", os.path.join("ExtractText", "nier_json"))
+BASELINE_VERSION = 1
+CORPUS_MARKER = "corpus.json"
+
+# Corpus size at --scale 1; every count is multiplied by the scale
+CORPUS_SIZES = {"dat_files": 6, "blob_files": 6, "dat_size": 1024 * 1024, "text_files": 120,
+                "entries_per_file": 50, "audio_lines_per_file": 50}
+# Share of text entries repeated in a later file (for the duplicate removal cases)
+DUPLICATE_SHARE = 0.05
+# Share of text entries that also appear in the audio corpus (for the voice linking cases)
+VOICED_SHARE = 0.4
+TEXT_FOLDERS = ("core", "quest", "subtitle", "txtmess")
+WORDS = ("machine", "android", "pod", "bunker", "resistance", "camp", "city", "forest", "desert", "park",
+         "commander", "operator", "emil", "pascal", "village", "tower", "factory", "amusement", "flooded", "copied")
+AUDIO_FOLDERS = {"en": "stream/English(US)", "jp": "stream/Japanese"}
+
+def sentence(rng, low=4, high=14):
+    """Returns a random English-looking line with some punctuation."""
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+    return text + rng.choice((".", "!", "?", "...", ","))
+
+def riff_chunk(rng, payload_size):
+    """Returns a RIFF/WAVE chunk with a Wwise-style fmt header and random sample data."""
+    fmt = struct.pack('<HHIIHH', 0xFFFF, rng.choice((1, 2)), 48000, 48000 * 4, 4, 16)
+    body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', payload_size)
+    body += rng.randbytes(payload_size)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+def decoy(rng):
+    """Returns bytes that partially look like a RIFF chunk, to keep the scanners honest."""
+    return rng.choice((
+        b'RIFF' + rng.randbytes(4) + b'WAVX',
+        b'RIFF' + rng.randbytes(4) + b'WAVEfmX ',
+        b'WAVEfmt ' + rng.randbytes(8),
+        b'RIF' + rng.randbytes(13),
+        b'\x00' * rng.randint(16, 256),
+    ))
+
+def riff_blob(rng, size, chunk_count):
+    """Returns about size bytes of random data, decoys and chunk_count embedded RIFF/WAVE chunks."""
+    parts = []
+    total = 0
+    chunk_size = max(256, size // (chunk_count * 2)) if chunk_count else 0
+    for _ in range(chunk_count):
+        filler = rng.randbytes(rng.randint(64, 4096)) + decoy(rng) + rng.randbytes(rng.randint(0, 512))
+        chunk = riff_chunk(rng, rng.randint(chunk_size // 2, chunk_size))
+        parts += [filler, chunk]
+        total += len(filler) + len(chunk)
+    while total < size:
+        filler = rng.randbytes(rng.randint(256, 8192)) + decoy(rng)
+        parts.append(filler)
+        total += len(filler)
+    return b''.join(parts)
+
+def build_dat(dat_path, entries):
+    """Writes a DAT archive readable by DatArchive from (name, extension, bytes) entries."""
+    count = len(entries)
+    name_length = max(len(name) for name, _, _ in entries) + 1
+    offsets_pos = 0x20
+    extensions_pos = offsets_pos + 4 * count
+    names_pos = extensions_pos + 4 * count
+    sizes_pos = names_pos + 4 + name_length * count
+    hashes_pos = sizes_pos + 4 * count
+    position = hashes_pos + 4
+    offsets = []
+    for _, _, data in entries:
+        position += -position % 16
+        offsets.append(position)
+        position += len(data)
+
+    with open(dat_path, 'wb') as f:
+        f.write(struct.pack('<4s6I', b'DAT\x00', count, offsets_pos, extensions_pos, names_pos, sizes_pos,
+                            hashes_pos).ljust(offsets_pos, b'\x00'))
+        f.write(struct.pack(f'<{count}I', *offsets))
+        f.write(b''.join(extension.encode('ascii').ljust(4, b'\x00') for _, extension, _ in entries))
+        f.write(struct.pack('<I', name_length))
+        f.write(b''.join(name.encode('ascii').ljust(name_length, b'\x00') for name, _, _ in entries))
+        f.write(struct.pack(f'<{count}I', *(len(data) for _, _, data in entries)))
+        f.write(b'\x00' * 4)
+        for offset, (_, _, data) in zip(offsets, entries):
+            f.write(b'\x00' * (offset - f.tell()))
+            f.write(data)
+    return dat_path
+
+def generate_dat_files(dat_dir, sizes, rng):
+    """Writes DAT archives (wem, wsp and other entries) and raw .wsp blobs that are found by scanning."""
+    os.makedirs(dat_dir, exist_ok=True)
+    size = sizes["dat_size"]
+    for i in range(sizes["dat_files"]):
+        entries = []
+        total = 0
+        while total < size:
+            kind = rng.random()
+            if kind < 0.4:
+                entry = (f"{len(entries):08d}.wem", "wem", riff_chunk(rng, rng.randint(1024, 32768)))
+            elif kind < 0.7:
+                entry = (f"bgm_{len(entries):04d}.wsp", "wsp", riff_blob(rng, 65536, rng.randint(1, 6)))
+            else:
+                entry = (f"model_{len(entries):04d}.bxm", "bxm", riff_blob(rng, 16384, 0))
+            entries.append(entry)
+            total += len(entry[2])
+        build_dat(os.path.join(dat_dir, f"snd_{i:04d}.dat"), entries)
+    for i in range(sizes["blob_files"]):
+        with open(os.path.join(dat_dir, f"stream_{i:04d}.wsp"), 'wb') as f:
+            f.write(riff_blob(rng, size, max(1, size // 65536)))
+
+def generate_text_entries(sizes, rng):
+    """Returns {relative name without extension: [text entries]} shaped like nier_text_json.
+
+    Some entries repeat an earlier (id, en) pair in a later file, like the
+    duplicates remove_duplicates.py deals with.
+    """
+    files = {}
+    pool = []
+    for i in range(sizes["text_files"]):
+        folder = TEXT_FOLDERS[i % len(TEXT_FOLDERS)]
+        entries = []
+        for j in range(sizes["entries_per_file"]):
+            if pool and rng.random() < DUPLICATE_SHARE:
+                entries.append(dict(rng.choice(pool)))
+                continue
+            en = sentence(rng)
+            entry = {"id": f"M{i:04d}_S{j:04d}_G0000_001_a2b", "jp": f"テキスト{i}の{j}、{en[:8]}。", "en": en,
+                     "ru": f"Перевод {i}.{j}: {en.lower()}"}
+            entries.append(entry)
+            pool.append(entry)
+        files[f"{folder}/{folder}_{i:04d}.bin"] = entries
+    return files
+
+def generate_audio_lines(text_files, sizes, rng):
+    """Returns {language: {relative name without extension: [(wav, text)]}} for a share of the text entries."""
+    unique = {(entry["id"], entry["en"]): entry for entries in text_files.values() for entry in entries}
+    voiced = [entry for entry in unique.values() if rng.random() < VOICED_SHARE]
+    per_file = sizes["audio_lines_per_file"]
+    audio = {}
+    for lang, folder in AUDIO_FOLDERS.items():
+        audio[lang] = {}
+        for start in range(0, len(voiced), per_file):
+            name = f"{folder}/vo_{start // per_file:04d}"
+            audio[lang][name] = [(f"{n:04d}.wav", entry[lang]) for n, entry in enumerate(voiced[start:start + per_file])]
+    return audio
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, ensure_ascii=False, indent=4))
+
+def write_text(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def generate_corpus(corpus_dir, scale=1.0, seed=0):
+    """Builds a synthetic NieR-shaped corpus in corpus_dir and returns its description.
+
+    Layout: dat/ (DAT archives and raw .wsp blobs), att_export/ and att_export_ru/
+    (att subtitle dumps, the second with the translation in its EN lines),
+    att_audio/ (att audio dumps), nier_text_json/ and nier_audio_json/.
+    """
+    rng = random.Random(seed)
+    sizes = {name: value if name == "dat_size" else max(1, round(value * scale))
+             for name, value in CORPUS_SIZES.items()}
+    sizes["entries_per_file"] = CORPUS_SIZES["entries_per_file"]
+    sizes["audio_lines_per_file"] = CORPUS_SIZES["audio_lines_per_file"]
+    generate_dat_files(os.path.join(corpus_dir, "dat"), sizes, rng)
+
+    text_files = generate_text_entries(sizes, rng)
+    for name, entries in text_files.items():
+        write_json(os.path.join(corpus_dir, "nier_text_json", name + ".json"), entries)
+        write_text(os.path.join(corpus_dir, "att_export", name + ".txt"), "".join(
+            f"ID: {entry['id']}\nJP: {entry['jp']}\nEN: {entry['en']}\nRU: \n\n" for entry in entries))
+        write_text(os.path.join(corpus_dir, "att_export_ru", name + ".txt"), "".join(
+            f"ID: {entry['id']}\nJP: {entry['jp']}\nEN: {entry['ru']}\nRU: \n\n" for entry in entries))
+
+    audio = generate_audio_lines(text_files, sizes, rng)
+    for lang, files in audio.items():
+        for name, lines in files.items():
+            write_json(os.path.join(corpus_dir, "nier_audio_json", name + ".json"),
+                       [{"wav": wav, "text": text} for wav, text in lines])
+            if lang == "en":
+                write_text(os.path.join(corpus_dir, "att_audio", name + ".txt"),
+                           "".join(f"{wav}\n{text}\n" for wav, text in lines))
+
+    description = {"scale": scale, "seed": seed, "sizes": sizes,
+                   "entries": sum(map(len, text_files.values())),
+                   "audio_lines": sum(map(len, audio["en"].values()))}
+    with open(os.path.join(corpus_dir, CORPUS_MARKER), 'w', encoding='utf-8') as f:
+        json.dump(description, f, indent=1)
+    return description
+
+def load_corpus(corpus_dir, scale, seed):
+    """Returns the description of an existing corpus built with the same scale and seed, or None."""
+    try:
+        with open(os.path.join(corpus_dir, CORPUS_MARKER), 'r', encoding='utf-8') as f:
+            description = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if description.get("scale") != scale or description.get("seed") != seed:
+        return None
+    return description
+
+def is_corpus_dir(corpus_dir):
+    """Checks that corpus_dir is an empty folder or one holding a corpus built by this script."""
+    if not os.path.isdir(corpus_dir):
+        return False
+    names = os.listdir(corpus_dir)
+    return not names or CORPUS_MARKER in names
+
+def list_files(root_dir, extension=""):
+    """Returns the sorted paths of all files under root_dir ending with extension."""
+    paths = []
+    for root, _, files in os.walk(root_dir):
+        paths += [os.path.join(root, name) for name in files if name.endswith(extension)]
+    return sorted(paths)
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def count_entries(json_files):
+    """Returns the number of records in JSON list files."""
+    count = 0
+    for path in json_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            count += len(json.load(f))
+    return count
+
+def file_megabytes(paths):
+    return sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+# Benchmark cases. Each one prepares its inputs outside the measurement and returns
+# (operations, units, unit): operations are zero-argument callables timed one by one,
+# units is the amount of work in one pass over them (for the throughput).
+
+def case_find_riff_signature(corpus_dir, work_dir):
+    """Sequential find_riff_signature search over the raw .wsp blobs, as the extractor walks them."""
+    from extract_wem_from_dat import find_riff_signature
+    paths = list_files(os.path.join(corpus_dir, "dat"), ".wsp")
+    blobs = [read_bytes(path) for path in paths]
+
+    def search(data):
+        def operation():
+            pos = find_riff_signature(data)
+            while pos != -1:
+                chunk_size = struct.unpack_from('<I', data, pos + 4)[0]
+                pos = find_riff_signature(data, min(pos + 8 + chunk_size, len(data)))
+        return operation
+    return [search(data) for data in blobs], file_megabytes(paths), "MB"
+
+def case_scan_riff_chunks(corpus_dir, work_dir):
+    """scan_riff_chunks over every DAT archive and raw blob."""
+    from extract_wem_from_dat import scan_riff_chunks
+    paths = list_files(os.path.join(corpus_dir, "dat"))
+    blobs = [read_bytes(path) for path in paths]
+    return [lambda data=data: scan_riff_chunks(data) for data in blobs], file_megabytes(paths), "MB"
+
+def case_extract_wem(corpus_dir, work_dir):
+    """extract_wem_file on every input file: DAT tables for archives, scanning for blobs, writing the WEMs."""
+    from extract_wem_from_dat import extract_wem_file
+    paths = list_files(os.path.join(corpus_dir, "dat"))
+    output_dir = os.path.join(work_dir, "nier_unpacked_result")
+    return ([lambda path=path: extract_wem_file(path, output_dir, verbose=False) for path in paths],
+            file_megabytes(paths), "MB")
+
+def case_parse_txt(corpus_dir, work_dir):
+    """parse_txt_lines on every att subtitle and audio dump."""
+    from convert_txt_to_json import parse_txt_lines
+    paths = list_files(os.path.join(corpus_dir, "att_export"), ".txt") + list_files(os.path.join(corpus_dir, "att_audio"), ".txt")
+
+    def parse(path):
+        def operation():
+            with open(path, 'r', encoding='utf-8') as f:
+                return list(parse_txt_lines(f, path)[1])
+        return operation
+    return [parse(path) for path in paths], file_megabytes(paths), "MB"
+
+def case_merge_text(corpus_dir, work_dir):
+    """merge_file for every subtitle dump with its translation; after the warm-up the targets are unchanged."""
+    from merge_text import merge_file
+    source_dir = os.path.join(corpus_dir, "att_export")
+    operations = []
+    paths = list_files(source_dir, ".txt")
+    for source_path in paths:
+        relative_path = os.path.relpath(source_path, source_dir)
+        result_path = os.path.join(work_dir, "merged", relative_path)
+        os.makedirs(os.path.dirname(result_path), exist_ok=True)
+        ru_path = os.path.join(corpus_dir, "att_export_ru", relative_path)
+        operations.append(lambda args=(source_path, ru_path, result_path): merge_file(*args))
+    return operations, file_megabytes(paths), "MB"
+
+def case_deduplicate_entries(corpus_dir, work_dir):
+    """In-memory deduplicate_entries over all records of nier_text_json."""
+    from remove_duplicates import collect_json_files, deduplicate_entries, load_all_entries
+    all_entries = load_all_entries(collect_json_files(os.path.join(corpus_dir, "nier_text_json")))
+    return [lambda: deduplicate_entries(all_entries)], len(all_entries), "entries"
+
+def case_scan_duplicates(corpus_dir, work_dir):
+    """Streaming scan_duplicates over nier_text_json, reading the files and writing the log."""
+    from remove_duplicates import collect_json_files, scan_duplicates
+    json_files = collect_json_files(os.path.join(corpus_dir, "nier_text_json"))
+    entries = count_entries(json_files)
+
+    def operation():
+        with open(os.devnull, 'w', encoding='utf-8') as log:
+            scan_duplicates(json_files, log)
+    return [operation], entries, "entries"
+
+def audio_phrases(corpus_dir, lang="en"):
+    """Returns the texts of the audio corpus of one language."""
+    phrases = []
+    for path in list_files(os.path.join(corpus_dir, "nier_audio_json", AUDIO_FOLDERS[lang]), ".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            phrases += [item["text"] for item in json.load(f)]
+    return phrases
+
+def case_voice_index_build(corpus_dir, work_dir):
+    """Building the English VoiceIndex from nier_audio_json without a cache."""
+    from update_voice_from_audio import clean_text_en
+    from voice_index import VoiceIndex
+    audio_path = os.path.join(corpus_dir, "nier_audio_json")
+    return ([lambda: VoiceIndex(audio_path, clean_text_en, AUDIO_FOLDERS["en"])],
+            len(audio_phrases(corpus_dir)), "lines")
+
+def case_voice_lookup(corpus_dir, work_dir):
+    """Exact VoiceIndex.lookup of every audio line, the per-phrase step of search_audio_match."""
+    from update_voice_from_audio import clean_text_en
+    from voice_index import VoiceIndex
+    index = VoiceIndex(os.path.join(corpus_dir, "nier_audio_json"), clean_text_en, AUDIO_FOLDERS["en"])
+    phrases = audio_phrases(corpus_dir)
+    return [lambda phrase=phrase: index.lookup(phrase) for phrase in phrases], len(phrases), "lookups"
+
+def case_voice_fuzzy_lookup(corpus_dir, work_dir):
+    """VoiceIndex.fuzzy_lookup of audio lines with one character dropped, threshold 0.9."""
+    from update_voice_from_audio import clean_text_en
+    from voice_index import VoiceIndex
+    index = VoiceIndex(os.path.join(corpus_dir, "nier_audio_json"), clean_text_en, AUDIO_FOLDERS["en"])
+    index.build_ngram_index()
+    rng = random.Random(1)
+    phrases = audio_phrases(corpus_dir)
+    phrases = rng.sample(phrases, min(200, len(phrases)))
+    phrases = [phrase[:i] + phrase[i + 1:] for phrase in phrases for i in [rng.randrange(len(phrase))]]
+    return [lambda phrase=phrase: index.fuzzy_lookup(phrase, 0.9) for phrase in phrases], len(phrases), "lookups"
+
+def case_search_audio_match(corpus_dir, work_dir):
+    """search_audio_match as called by older scripts: the index is rebuilt for every phrase."""
+    from update_en_voice_from_audio import search_audio_match
+    audio_path = os.path.join(corpus_dir, "nier_audio_json")
+    phrases = audio_phrases(corpus_dir)[:5]
+    return [lambda phrase=phrase: search_audio_match(phrase, audio_path) for phrase in phrases], len(phrases), "lookups"
+
+def case_excel_export(corpus_dir, work_dir):
+    """export_workbook of nier_text_json into a rows-layout workbook."""
+    from parse_nier_json_to_excel import export_workbook
+    text_path = os.path.join(corpus_dir, "nier_text_json")
+    entries = count_entries(list_files(text_path, ".json"))
+    excel_file = os.path.join(work_dir, "nier_subtitles.xlsx")
+    return [lambda: export_workbook(text_path, excel_file)], entries, "entries"
+
+def case_excel_load(corpus_dir, work_dir):
+    """load_excel_records of the exported workbook with the fastest installed engine."""
+    from parse_nier_json_to_excel import export_workbook
+    from update_json_from_excel import load_excel_records
+    excel_file = os.path.join(work_dir, "nier_subtitles_load.xlsx")
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        export_workbook(os.path.join(corpus_dir, "nier_text_json"), excel_file)
+    entries = sum(map(len, load_excel_records(excel_file).values()))
+    return [lambda: load_excel_records(excel_file)], entries, "entries"
+
+def case_cpk_unpack(corpus_dir, work_dir):
+    """unpack_cpks of a CRILAYLA-compressed CPK built from the DAT archives, in one process."""
+    from cpk_archive import unpack_cpks
+    from cpk_benchmark import build_cpk
+    paths = list_files(os.path.join(corpus_dir, "dat"), ".dat")[:2]
+    # The fixture compressor is pure Python, so only a slice of each archive is packed
+    files = [("sound", os.path.basename(path), read_bytes(path)[:256 * 1024]) for path in paths]
+    cpk_path = os.path.join(work_dir, "synthetic.cpk")
+    build_cpk(cpk_path, files)
+    output_dir = os.path.join(work_dir, "nier_unpacked")
+    return ([lambda: unpack_cpks([cpk_path], output_dir, 1, verbose=False)],
+            sum(len(data) for _, _, data in files) / (1024 * 1024), "MB")
+
+CASES = {
+    "find_riff_signature": case_find_riff_signature,
+    "scan_riff_chunks": case_scan_riff_chunks,
+    "extract_wem": case_extract_wem,
+    "cpk_unpack": case_cpk_unpack,
+    "parse_txt": case_parse_txt,
+    "merge_text": case_merge_text,
+    "deduplicate_entries": case_deduplicate_entries,
+    "scan_duplicates": case_scan_duplicates,
+    "voice_index_build": case_voice_index_build,
+    "voice_lookup": case_voice_lookup,
+    "voice_fuzzy_lookup": case_voice_fuzzy_lookup,
+    "search_audio_match": case_search_audio_match,
+    "excel_export": case_excel_export,
+    "excel_load": case_excel_load,
+}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = math.ceil(fraction * len(sorted_values)) - 1
+    return sorted_values[min(len(sorted_values) - 1, max(0, index))]
+
+def measure(operations, units, repeat=5, warmup=1):
+    """Times every operation over repeat passes after warmup passes, then runs one pass under tracemalloc.
+
+    Returns throughput (units per second of the median pass), latency percentiles
+    of single operations in milliseconds and the peak of Python allocations
+    during one pass in MB.
+    """
+    for _ in range(warmup):
+        for operation in operations:
+            operation()
+    latencies = []
+    pass_times = []
+    for _ in range(repeat):
+        pass_start = time.perf_counter()
+        for operation in operations:
+            start = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - start)
+        pass_times.append(time.perf_counter() - pass_start)
+
+    tracemalloc.start()
+    try:
+        for operation in operations:
+            operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    median_pass = sorted(pass_times)[len(pass_times) // 2]
+    return {"operations": len(operations), "units": units,
+            "throughput": units / max(median_pass, 1e-9),
+            "p50_ms": percentile(latencies, 0.50) * 1000, "p90_ms": percentile(latencies, 0.90) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000, "max_ms": latencies[-1] * 1000,
+            "peak_mb": peak / (1024 * 1024)}
+
+def run_cases(corpus_dir, names, repeat=5, warmup=1):
+    """Runs the named cases on corpus_dir and returns {case: result}; cases that cannot run are skipped."""
+    for tool_dir in TOOL_DIRS:
+        path = os.path.join(TOOLS_DIR, tool_dir)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    results = {}
+    for name in names:
+        work_dir = tempfile.mkdtemp(prefix=f"nier_benchmark_{name}_")
+        try:
+            # The tools report every file and entry; that output is not part of the measurement
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+                try:
+                    operations, units, unit = CASES[name](corpus_dir, work_dir)
+                except ImportError as e:
+                    print(f"{name}: skipped, {e}", file=sys.stderr)
+                    continue
+                result = measure(operations, units, repeat, warmup)
+            result["unit"] = unit
+            results[name] = result
+            print(format_result(name, result), flush=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def format_result(name, result):
+    throughput = f"{result['throughput']:,.1f} {result['unit']}/s"
+    return (f"{name:<20} {throughput:>22} {result['p50_ms']:>10.3f} {result['p90_ms']:>10.3f} "
+            f"{result['p99_ms']:>10.3f} {result['peak_mb']:>9.1f}")
+
+def compare_results(results, baseline, tolerance):
+    """Compares results with a saved baseline and returns a list of regression descriptions.
+
+    A case regresses when its throughput drops, or its p90 latency or peak memory
+    grows, by more than tolerance (a fraction). Cases missing on either side are ignored.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:,.1f} {result['unit']}/s, "
+                               f"baseline {base['throughput']:,.1f}")
+        if result["p90_ms"] > base["p90_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p90 latency {result['p90_ms']:.3f} ms, baseline {base['p90_ms']:.3f} ms")
+        if result["peak_mb"] > base["peak_mb"] * (1 + tolerance) and result["peak_mb"] - base["peak_mb"] >= 1:
+            regressions.append(f"{name}: peak memory {result['peak_mb']:.1f} MB, baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+def save_baseline(baseline_path, results, settings):
+    """Writes the results with the settings and machine they were measured on."""
+    baseline = {"version": BASELINE_VERSION, "settings": settings,
+                "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+                "results": results}
+    temp_path = baseline_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+    os.replace(temp_path, baseline_path)
+
+def load_baseline(baseline_path):
+    """Reads a baseline file; raises ValueError if it has another format version."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{baseline_path} has baseline format {baseline.get('version')}, expected {BASELINE_VERSION}")
+    return baseline
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the hot paths of the NieR tools on a synthetic corpus.",
+        epilog="Typical use: save a baseline before a change with --save-baseline base.json, "
+               "then run with --baseline base.json after it; the exit code is 1 if a case regressed.")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the corpus (default: 0)")
+    parser.add_argument("--corpus", metavar="DIR",
+                        help="keep the corpus in DIR and reuse it while scale and seed match; DIR must be missing, "
+                             "empty or a corpus built earlier (only then is it cleared for a rebuild)")
+    parser.add_argument("--generate-only", action="store_true", help="only build the corpus (needs --corpus)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="measured passes per case (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured passes before them (default: 1)")
+    parser.add_argument("--save-baseline", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown or memory growth against the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+    if args.generate_only and not args.corpus:
+        parser.error("--generate-only needs --corpus")
+
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = load_baseline(args.baseline)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot use baseline: {e}")
+
+    if args.corpus:
+        corpus_dir = os.path.abspath(args.corpus)
+        if os.path.exists(corpus_dir) and not is_corpus_dir(corpus_dir):
+            parser.error(f"{corpus_dir} is neither an empty folder nor a corpus with {CORPUS_MARKER}; "
+                         "pick an empty or new folder")
+    else:
+        corpus_dir = tempfile.mkdtemp(prefix="nier_corpus_")
+    try:
+        description = load_corpus(corpus_dir, args.scale, args.seed)
+        if description is None:
+            start = time.perf_counter()
+            # Only a folder that is empty or holds an earlier corpus gets here, so clearing it is safe
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+            os.makedirs(corpus_dir)
+            # Marks the folder as a corpus right away, so an interrupted build can be replaced next time
+            with open(os.path.join(corpus_dir, CORPUS_MARKER), 'w', encoding='utf-8') as f:
+                json.dump({}, f)
+            description = generate_corpus(corpus_dir, args.scale, args.seed)
+            print(f"Generated corpus in {corpus_dir} in {time.perf_counter() - start:.1f} s")
+        print(f"Corpus: {description['entries']} text entries, {description['audio_lines']} audio lines, "
+              f"{file_megabytes(list_files(os.path.join(corpus_dir, 'dat'))):.1f} MB of .dat/.wsp data")
+        if args.generate_only:
+            return
+
+        print(f"\n{'case':<20} {'throughput':>22} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'peak MB':>9}")
+        results = run_cases(corpus_dir, args.cases, args.repeat, args.warmup)
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    settings = {"scale": args.scale, "seed": args.seed, "repeat": args.repeat, "warmup": args.warmup}
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, settings)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if baseline is not None:
+        if baseline["settings"] != settings:
+            print(f"\nWarning: the baseline was measured with {baseline['settings']}, this run with {settings}.")
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_NAME = ".pipeline_state.json"
+STATE_VERSION = 1
+LOG_DIR_NAME = "pipeline_logs"
+HASH_BLOCK_SIZE = 1024 * 1024
+# Digest of a path that does not exist
+MISSING = "missing"
+# Command value for a stage that is run outside the pipeline: its outputs are taken as they are on disk
+EXTERNAL = "external"
+
+# The toolchain as a list of stages in run order. Paths are relative to the workspace.
+# A stage depends on every earlier stage that writes a path it reads or writes, or reads a
+# path it writes; stages without such a link run concurrently. Stages either have a Python
+# runner (called in a separate process) or a command template for an external tool, which
+# --command can replace with a local stand-in.
+STAGES = [
+    {"name": "unpack", "inputs": ["cpk"], "outputs": ["nier_unpacked"], "runner": "run_unpack"},
+    {"name": "export_text", "inputs": ["nier_unpacked"], "outputs": ["nier_unpacked_extracted"],
+     "command": "{tools}/ExtractText/att.exe export {input} {output}"},
+    {"name": "extract_wem", "inputs": ["nier_unpacked"], "outputs": ["nier_unpacked_result"],
+     "runner": "run_extract_wem"},
+    {"name": "merge_text", "inputs": ["nier_unpacked_extracted", "nier_unpacked_extracted_ru"],
+     "outputs": ["nier_unpacked_extracted_result"], "runner": "run_merge_text"},
+    {"name": "convert_text", "inputs": ["nier_unpacked_extracted_result"], "outputs": ["nier_text_json"],
+     "runner": "run_convert_text"},
+    {"name": "remove_duplicates", "inputs": ["nier_text_json"], "outputs": ["nier_text_json"],
+     "runner": "run_remove_duplicates"},
+    {"name": "link_voices", "inputs": ["nier_text_json", "nier_audio_json"], "outputs": ["nier_text_json"],
+     "runner": "run_link_voices", "options": ["languages", "fuzzy"]},
+    {"name": "excel_import", "inputs": ["nier_text_json", "nier_subtitles.xlsx"], "outputs": ["nier_text_json"],
+     "runner": "run_excel_import", "options": ["fields"]},
+    {"name": "excel_export", "inputs": ["nier_text_json"], "outputs": ["nier_subtitles_export.xlsx"],
+     "runner": "run_excel_export", "options": ["layout"]},
+]
+
+def run_unpack(context):
+    """Unpacks the .cpk files of the input folder; after a partial change only the changed archives."""
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "UnPacker"))
+    from cpk_archive import unpack_cpks
+    cpk_dir = context["inputs"][0]
+    changed = context["changed"][0]
+    names = os.listdir(cpk_dir) if changed is None else [name for name in changed if "/" not in name]
+    cpk_paths = [os.path.join(cpk_dir, name) for name in sorted(names) if name.lower().endswith(".cpk")]
+    file_count, total_bytes = unpack_cpks(cpk_paths, context["outputs"][0], context["jobs"], verbose=False)
+    print(f"Unpacked {len(cpk_paths)} archives: {file_count} files, {total_bytes} bytes")
+
+def run_extract_wem(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractWemFromDatCPK"))
+    from extract_wem_from_dat import extract_tree
+    results = extract_tree(context["inputs"][0], context["outputs"][0], context["jobs"])
+    print(f"Extracted WEMs from {len(results)} changed files")
+
+def run_merge_text(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractText"))
+    from merge_text import merge_texts
+    source_dir, ru_dir = context["inputs"]
+    if not os.path.exists(ru_dir):
+        print(f"Warning: {ru_dir} not found, proceeding with only source data.")
+        ru_dir = None
+    rewritten, unchanged = merge_texts(source_dir, ru_dir, context["outputs"][0], context["jobs"])
+    print(f"Rewrote {rewritten} text files, {unchanged} were already up to date.")
+
+def run_convert_text(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractText"))
+    from convert_txt_to_json import convert_tree
+    converted, skipped = convert_tree(context["inputs"][0], context["outputs"][0], context["jobs"])
+    print(f"Converted {converted} files, {skipped} up-to-date files skipped.")
+
+def run_remove_duplicates(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractText", "nier_json"))
+    from remove_duplicates import LOG_FILE, apply_changes, collect_json_files, scan_duplicates
+    json_files = collect_json_files(context["inputs"][0])
+    with open(os.path.join(context["workspace"], LOG_FILE), "w", encoding="utf-8") as log:
+        drops, donations, stats = scan_duplicates(json_files, log)
+    changed_files = apply_changes(drops, donations)
+    print(f"Removed {stats['duplicates']} duplicates, rewrote {len(changed_files)} files")
+
+def run_link_voices(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractText", "nier_json"))
+    from update_voice_from_audio import CACHE_DIR_NAME, link_voices
+    text_path, audio_path = context["inputs"]
+    if not os.path.exists(audio_path):
+        print(f"Warning: {audio_path} not found, nothing to link.")
+        return
+    options = context["options"]
+    saved = link_voices(text_path, audio_path, options["languages"], options["fuzzy"],
+                        os.path.join(context["workspace"], CACHE_DIR_NAME))
+    print(f"Linked voices, rewrote {saved} files")
+
+def run_excel_import(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractText", "nier_json"))
+    from id_index import INDEX_FILE_NAME
+    from update_json_from_excel import update_json_files
+    text_path, excel_file = context["inputs"]
+    if not os.path.exists(excel_file):
+        print(f"Warning: {excel_file} not found, nothing to import.")
+        return
+    update_json_files(excel_file, text_path, context["options"]["fields"],
+                      os.path.join(context["workspace"], INDEX_FILE_NAME))
+
+def run_excel_export(context):
+    sys.path.insert(0, os.path.join(TOOLS_DIR, "ExtractText", "nier_json"))
+    from parse_nier_json_to_excel import export_workbook
+    export_workbook(context["inputs"][0], context["outputs"][0], context["options"]["layout"])
+
+def paths_overlap(a, b):
+    """Checks whether two workspace paths are the same or one contains the other."""
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/")
+
+def stage_dependencies(stages):
+    """Returns {stage name: names of earlier stages it has to wait for}."""
+    dependencies = {}
+    for i, stage in enumerate(stages):
+        touched = stage["inputs"] + stage["outputs"]
+        dependencies[stage["name"]] = [
+            earlier["name"] for earlier in stages[:i]
+            if any(paths_overlap(a, b) for a in earlier["outputs"] for b in touched)
+            or any(paths_overlap(a, b) for a in earlier["inputs"] for b in stage["outputs"])]
+    return dependencies
+
+def input_producers(stages):
+    """Returns {stage name: {input path: name of the last earlier stage writing it}}; source inputs are absent."""
+    producers = {}
+    writers = {}
+    for stage in stages:
+        producers[stage["name"]] = {path: writers[path] for path in stage["inputs"] if path in writers}
+        for path in stage["outputs"]:
+            writers[path] = stage["name"]
+    return producers
+
+def final_writers(stages):
+    """Returns {path: name of the last stage writing it}; only that stage's record must match the disk."""
+    return {path: stage["name"] for stage in stages for path in stage["outputs"]}
+
+def file_hash(file_path):
+    """Returns a BLAKE2b digest of a file, read in blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FileHasher:
+    """Content hashes of workspace files, cached by size and mtime.
+
+    Files whose size and mtime match the cache are not read; the rest are hashed
+    in a thread pool (hashlib releases the GIL while hashing large blocks).
+    """
+
+    def __init__(self, workspace, records, max_workers=8):
+        self.workspace = workspace
+        self.records = records
+        self.max_workers = max_workers
+        self.hashed = 0
+
+    def path_files(self, path):
+        """Returns {name relative to path: absolute file} for a file or folder; empty if it does not exist."""
+        full_path = os.path.join(self.workspace, path)
+        if os.path.isfile(full_path):
+            return {os.path.basename(path): full_path}
+        files = {}
+        for root, _, names in os.walk(full_path):
+            for name in names:
+                file_path = os.path.join(root, name)
+                files[os.path.relpath(file_path, full_path).replace('\\', '/')] = file_path
+        return files
+
+    def digest(self, path):
+        """Returns (digest of path, {name relative to path: file hash})."""
+        full_path = os.path.join(self.workspace, path)
+        if not os.path.exists(full_path):
+            return MISSING, {}
+        is_dir = os.path.isdir(full_path)
+        hashes = {}
+        stale = []
+        for name, file_path in self.path_files(path).items():
+            key = f"{path}/{name}" if is_dir else path
+            stat = os.stat(file_path)
+            record = self.records.get(key)
+            if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+                hashes[name] = record["hash"]
+            else:
+                stale.append((name, key, file_path, stat))
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                digests = executor.map(file_hash, [file_path for _, _, file_path, _ in stale])
+                for (name, key, file_path, stat), digest in zip(stale, digests):
+                    self.records[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+                    hashes[name] = digest
+            self.hashed += len(stale)
+        digest = hashlib.blake2b(digest_size=16)
+        for name in sorted(hashes):
+            digest.update(f"{name}\0{hashes[name]}\n".encode('utf-8'))
+        return digest.hexdigest(), hashes
+
+def load_state(workspace):
+    """Loads the pipeline state of workspace, or returns an empty one if it is missing or outdated."""
+    try:
+        with open(os.path.join(workspace, STATE_NAME), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        state = {}
+    if state.get("version") != STATE_VERSION:
+        state = {"version": STATE_VERSION, "files": {}, "stages": {}, "outputs": {}}
+    return state
+
+def save_state(workspace, state):
+    """Writes the state atomically, so an interrupted run keeps the previous one."""
+    state_path = os.path.join(workspace, STATE_NAME)
+    temp_path = state_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+def record_stage(state, name, record):
+    """Stores the record of a finished stage; its output digests become what the disk should hold."""
+    state["stages"][name] = record
+    state["outputs"].update(record["outputs"])
+
+def stage_signature(stage, command, options):
+    """Describes what a stage runs with; a different signature makes the stage run again."""
+    return json.dumps({"run": command or stage["runner"],
+                       "options": {name: options[name] for name in stage.get("options", [])}}, sort_keys=True)
+
+def evaluate_stage(stage, state, hasher, producers, writers, signature, force):
+    """Decides whether a stage has to run.
+
+    Inputs written by an earlier stage are compared by that stage's recorded output
+    digest, so an upstream rerun that produced the same files does not propagate;
+    source inputs are hashed on disk. Outputs are checked on disk only for the
+    last stage writing them, against the digest recorded by whichever stage wrote
+    them most recently, so an upstream in-place rerun is not mistaken for an edit.
+    Returns {"reasons", "inputs", "input_files", "changed"}; no reasons means up to date.
+    """
+    name = stage["name"]
+    record = state["stages"].get(name)
+    inputs = {}
+    input_files = {}
+    reasons = []
+    for path in stage["inputs"]:
+        producer = producers[name].get(path)
+        if producer:
+            inputs[path] = state["stages"].get(producer, {}).get("outputs", {}).get(path, MISSING)
+        else:
+            inputs[path], input_files[path] = hasher.digest(path)
+        if record and record["inputs"].get(path) != inputs[path]:
+            reasons.append(f"{path} changed")
+
+    # Without a usable record or with tampered outputs the stage reprocesses everything
+    full_run = force or record is None or record["signature"] != signature
+    if force:
+        reasons.insert(0, "forced")
+    if record is None:
+        reasons.insert(0, "first run")
+    elif record["signature"] != signature:
+        reasons.insert(0, "settings changed")
+    else:
+        for path in stage["outputs"]:
+            if writers[path] == name and hasher.digest(path)[0] != state["outputs"].get(path):
+                reasons.append(f"{path} changed outside the pipeline")
+                full_run = True
+
+    # Which files of each source input changed, so a stage can limit itself to them
+    changed = []
+    for path in stage["inputs"]:
+        if full_run or path not in input_files:
+            changed.append(None)
+        else:
+            previous = record.get("input_files", {}).get(path, {})
+            changed.append(sorted(file for file, digest in input_files[path].items() if previous.get(file) != digest))
+    return {"reasons": reasons, "inputs": inputs, "input_files": input_files, "changed": changed}
+
+def stage_command(stage, commands):
+    """Returns the command template of a stage (None for Python runners), honouring --command overrides."""
+    return commands.get(stage["name"], stage.get("command"))
+
+def launch_stage(stage, command, workspace, context):
+    """Runs one stage in a separate process with its output in pipeline_logs/<stage>.log; returns (code, log path)."""
+    log_dir = os.path.join(workspace, LOG_DIR_NAME)
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{stage['name']}.log")
+    if command:
+        values = {"tools": TOOLS_DIR, "workspace": workspace,
+                  "input": context["inputs"][0], "output": context["outputs"][0]}
+        arguments = [token.format(**values) for token in shlex.split(command)]
+    else:
+        context_path = os.path.join(log_dir, f"{stage['name']}.context.json")
+        with open(context_path, 'w', encoding='utf-8') as f:
+            json.dump(context, f, ensure_ascii=False, indent=1)
+        arguments = [sys.executable, os.path.abspath(__file__), "--run-stage", context_path]
+    for path in context["outputs"]:
+        if not os.path.splitext(path)[1]:
+            os.makedirs(path, exist_ok=True)
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    with open(log_path, 'w', encoding='utf-8') as log:
+        try:
+            code = subprocess.run(arguments, cwd=workspace, stdin=subprocess.DEVNULL, stdout=log,
+                                  stderr=subprocess.STDOUT, env=env).returncode
+        except OSError as e:
+            log.write(f"Error: cannot start {arguments[0]}: {e}\n")
+            code = -1
+    return code, log_path
+
+def print_log_tail(log_path, lines=10):
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f.readlines()[-lines:]:
+            print(f"    {line.rstrip()}")
+
+def run_pipeline(workspace, stages, commands, options, parallel=2, jobs=1, force=(), dry_run=False):
+    """Runs the stages that are out of date, independent ones concurrently; returns {stage name: status}.
+
+    Status is "ran", "up to date", "external", "failed", "blocked" (an upstream stage
+    failed) or, with dry_run, "would run".
+    """
+    state = load_state(workspace)
+    hasher = FileHasher(workspace, state["files"])
+    dependencies = stage_dependencies(stages)
+    producers = input_producers(stages)
+    writers = final_writers(stages)
+    status = {}
+    pending = list(stages)
+    running = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        while pending or running:
+            for stage in list(pending):
+                name = stage["name"]
+                if any(dependency not in status for dependency in dependencies[name]):
+                    continue
+                pending.remove(stage)
+                upstream = [dependency for dependency in dependencies[name]
+                            if status[dependency] in ("failed", "blocked")]
+                if upstream:
+                    status[name] = "blocked"
+                    print(f"[{name}] blocked: {', '.join(upstream)} did not finish")
+                    continue
+
+                command = stage_command(stage, commands)
+                signature = stage_signature(stage, command, options)
+                if command == EXTERNAL:
+                    # Outputs of an external stage are recorded as found, for the stages that read them
+                    record_stage(state, name, {
+                        "signature": signature, "inputs": {}, "input_files": {},
+                        "outputs": {path: hasher.digest(path)[0] for path in stage["outputs"]},
+                    })
+                    status[name] = "external"
+                    print(f"[{name}] external: using {', '.join(stage['outputs'])} as found")
+                    continue
+
+                evaluation = evaluate_stage(stage, state, hasher, producers, writers, signature,
+                                            "all" in force or name in force)
+                reasons = evaluation["reasons"]
+                if dry_run:
+                    reasons += [f"{dependency} will run" for dependency in dependencies[name]
+                                if status[dependency] == "would run"]
+                if not reasons:
+                    status[name] = "up to date"
+                    print(f"[{name}] up to date")
+                    continue
+                if dry_run:
+                    status[name] = "would run"
+                    print(f"[{name}] would run: {'; '.join(reasons)}")
+                    continue
+                if command and ".exe" in command and os.name != "nt" and name not in commands:
+                    status[name] = "failed"
+                    print(f"[{name}] failed: {os.path.basename(command.split()[0])} needs Windows; pass --command "
+                          f"{name}=\"<stand-in command>\" or --command {name}={EXTERNAL}")
+                    continue
+
+                context = {"stage": name, "runner": stage.get("runner"), "workspace": workspace, "jobs": jobs,
+                           "inputs": [os.path.join(workspace, path) for path in stage["inputs"]],
+                           "outputs": [os.path.join(workspace, path) for path in stage["outputs"]],
+                           "changed": evaluation["changed"], "options": options}
+                print(f"[{name}] running: {'; '.join(reasons)}")
+                future = executor.submit(launch_stage, stage, command, workspace, context)
+                running[future] = (stage, signature, evaluation, time.perf_counter())
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, signature, evaluation, stage_start = running.pop(future)
+                name = stage["name"]
+                code, log_path = future.result()
+                elapsed = time.perf_counter() - stage_start
+                if code != 0:
+                    status[name] = "failed"
+                    print(f"[{name}] failed with exit code {code} after {elapsed:.1f} s, see {log_path}:")
+                    print_log_tail(log_path)
+                    continue
+                record_stage(state, name, {
+                    "signature": signature, "inputs": evaluation["inputs"],
+                    "input_files": evaluation["input_files"],
+                    "outputs": {path: hasher.digest(path)[0] for path in stage["outputs"]},
+                })
+                save_state(workspace, state)
+                status[name] = "ran"
+                print(f"[{name}] done in {elapsed:.1f} s")
+
+    if not dry_run:
+        save_state(workspace, state)
+    counts = {}
+    for value in status.values():
+        counts[value] = counts.get(value, 0) + 1
+    print(f"\nPipeline finished in {time.perf_counter() - start:.1f} s: "
+          + ", ".join(f"{count} {value}" for value, count in counts.items())
+          + f"; hashed {hasher.hashed} files")
+    return status
+
+def run_stage_process(context_path):
+    """Entry point of a stage process: calls the stage's Python runner with its context."""
+    with open(context_path, 'r', encoding='utf-8') as f:
+        context = json.load(f)
+    globals()[context["runner"]](context)
+
+def parse_commands(values):
+    """Parses --command STAGE=TEMPLATE values into {stage: template}."""
+    names = {stage["name"] for stage in STAGES}
+    commands = {}
+    for value in values:
+        name, separator, template = value.partition("=")
+        if not separator or name not in names:
+            raise argparse.ArgumentTypeError(f"expected STAGE=COMMAND with STAGE one of {', '.join(sorted(names))}")
+        commands[name] = template
+    return commands
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs the NieR modding toolchain as a pipeline of stages, re-running only what changed.",
+        epilog="Workspace layout: cpk/ (input .cpk files), nier_unpacked_extracted_ru/ (translation), "
+               "nier_audio_json/, nier_subtitles.xlsx (edited workbook); everything else is produced. "
+               "Command templates may use {input}, {output}, {tools} and {workspace}, e.g. "
+               "--command export_text=\"wine {tools}/ExtractText/att.exe export {input} {output}\".")
+    parser.add_argument("--run-stage", metavar="CONTEXT", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", default=".", help="folder with the pipeline inputs and outputs (default: .)")
+    parser.add_argument("--command", action="append", default=[], metavar="STAGE=COMMAND",
+                        help=f"replace the command of a stage, e.g. an .exe with a local stand-in; "
+                             f"'{EXTERNAL}' takes the stage outputs as they are on disk")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE",
+                        help="run a stage even if it is up to date ('all' for every stage)")
+    parser.add_argument("--parallel", type=int, default=2, help="how many independent stages run at once (default: 2)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes inside each stage (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="only show which stages would run")
+    parser.add_argument("--list", action="store_true", help="list the stages and their dependencies")
+    parser.add_argument("--lang", nargs="+", default=["en", "jp"], help="voice languages to link (default: en jp)")
+    parser.add_argument("--fuzzy", type=float, nargs="?", const=0.9, help="fuzzy voice matching threshold")
+    parser.add_argument("--fields", nargs="+", default=["en_voice"], help="fields imported from Excel (default: en_voice)")
+    parser.add_argument("--layout", choices=("rows", "columns"), default="rows", help="exported Excel layout")
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage_process(args.run_stage)
+        return
+
+    if args.list:
+        for name, dependencies in stage_dependencies(STAGES).items():
+            print(f"{name}: after {', '.join(dependencies) or 'nothing'}")
+        return
+
+    try:
+        commands = parse_commands(args.command)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    workspace = os.path.abspath(args.workspace)
+    options = {"languages": args.lang, "fuzzy": args.fuzzy, "fields": args.fields, "layout": args.layout}
+    status = run_pipeline(workspace, STAGES, commands, options, args.parallel, args.jobs, set(args.force), args.dry_run)
+    if any(value in ("failed", "blocked") for value in status.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()